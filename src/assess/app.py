@@ -1,15 +1,41 @@
 import sys
 import os
 
-# Add current directory to sys.path to allow imports from src
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Add src to sys.path to allow imports from sibling phases
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+import hashlib
+import threading
+from collections import OrderedDict
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
 import uvicorn
-import shutil
-import tempfile
-from predict import load_model, predict_file
+from model.predict import decode_source, predict_content
+from model.registry import ModelRegistry
+from assess.metrics import MetricsRegistry, PROBABILITY_BUCKETS, CONTENT_TYPE
+from assess.jobs import JobManager, FINAL_STATES
+from assess.scheduling import RateLimiter, FairScheduler, client_id, parse_client_config, parse_limit, scan_cost
+
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", "0"))
+# Serve the memory-mapped layout from models/shared/ (one physical copy for all workers)
+SHARED_MODEL = os.environ.get("SHARED_MODEL", "0") == "1"
+# Score pickled forests with the vectorised NumPy engine (the shared layout always does)
+COMPILED_MODEL = os.environ.get("COMPILED_MODEL", "0") == "1"
+MAX_CONCURRENT_SCANS = int(os.environ.get("MAX_CONCURRENT_SCANS", "4"))
+SCAN_CACHE_SIZE = int(os.environ.get("SCAN_CACHE_SIZE", "1024"))
+# Repository scan jobs: how many run at once, and where local targets may live (none if unset)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_ROOT = os.environ.get("JOB_ROOT")
+# Per-client token buckets (requests/second and burst; 0 disables) and fair-queuing weights.
+# Clients are identified as "key:<sha256(X-API-Key)[:8]>" when that id is configured below, else "ip:<address>".
+RATE_LIMIT_RPS = float(os.environ.get("RATE_LIMIT_RPS", "10"))
+RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", "20"))
+CLIENT_LIMITS = parse_client_config(os.environ.get("CLIENT_LIMITS"), cast=parse_limit)   # "client=rate:burst,..."
+CLIENT_WEIGHTS = parse_client_config(os.environ.get("CLIENT_WEIGHTS"))                   # "client=weight,..."
+KNOWN_CLIENTS = set(CLIENT_LIMITS) | set(CLIENT_WEIGHTS)
 
 app = FastAPI(
     title="Vulnerability Detection API",
@@ -17,8 +43,75 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Load model on startup
-model, vectorizer = load_model()
+# Load model on startup. A missing or invalid model no longer kills the server:
+# /scan answers 503 until a valid model is loaded through /admin/reload.
+registry = ModelRegistry(shared=SHARED_MODEL, compiled=COMPILED_MODEL)
+try:
+    registry.load()
+except Exception as e:
+    print(f"⚠️  Starting without a model: {e}")
+
+if MODEL_WATCH_INTERVAL > 0:
+    registry.watch(MODEL_WATCH_INTERVAL)
+
+class ResultCache:
+    """Small LRU of scan results keyed by (content hash, model version)."""
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def put(self, key, value):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+scheduler = FairScheduler(MAX_CONCURRENT_SCANS, weights=CLIENT_WEIGHTS)
+rate_limiter = RateLimiter(RATE_LIMIT_RPS, RATE_LIMIT_BURST, limits=CLIENT_LIMITS)
+result_cache = ResultCache(SCAN_CACHE_SIZE)
+job_manager = JobManager(registry.get, max_running=JOB_WORKERS, slots=scheduler, allowed_root=JOB_ROOT)
+
+# --- Telemetry (Prometheus text format on /metrics) ---
+metrics = MetricsRegistry()
+REQUESTS = metrics.counter("scanner_requests_total", "HTTP requests by endpoint and status code.", ["endpoint", "status"])
+IN_FLIGHT = metrics.gauge("scanner_requests_in_flight", "HTTP requests currently being handled.")
+QUEUE_DEPTH = metrics.gauge("scanner_queue_depth", "Scans waiting for an inference slot.",
+                            function=lambda: {(): scheduler.waiting})
+QUEUE_DEPTH_BY_CLIENT = metrics.gauge("scanner_client_queue_depth", "Scans waiting for an inference slot, per client.", ["client"],
+                                      function=lambda: {(c,): n for c, n in dict(scheduler.waiting_by_client).items()})
+THROTTLED = metrics.counter("scanner_throttled_total", "Requests rejected by the per-client rate limiter.", ["client", "endpoint"])
+STAGE_SECONDS = metrics.histogram("scanner_stage_duration_seconds", "Time spent per scan pipeline stage.", ["stage"])
+CACHE_LOOKUPS = metrics.counter("scanner_cache_lookups_total", "Result cache lookups by outcome.", ["result"])
+
+def _cache_hit_ratio():
+    hits = CACHE_LOOKUPS.get(result="hit")
+    total = hits + CACHE_LOOKUPS.get(result="miss")
+    return {(): hits / total if total else 0.0}
+
+CACHE_HIT_RATIO = metrics.gauge("scanner_cache_hit_ratio", "Fraction of scans answered from the result cache.",
+                                function=_cache_hit_ratio)
+MODEL_INFO = metrics.gauge("scanner_model_info", "Model version currently served (value is always 1).", ["version"],
+                           function=lambda: {(registry.get().version,): 1} if registry.get() else {})
+JOBS = metrics.gauge("scanner_jobs", "Repository scan jobs by state.", ["state"],
+                     function=lambda: {(state,): sum(1 for j in list(job_manager.jobs.values()) if j.status == state)
+                                       for state in ("queued", "running") + tuple(sorted(FINAL_STATES))})
+PREDICTED_PROBABILITY = metrics.histogram("scanner_predicted_probability", "Predicted probability of the vulnerable class.",
+                                          buckets=PROBABILITY_BUCKETS)
+
+class JobRequest(BaseModel):
+    target: str
+    ref: Optional[str] = None
 
 class PredictionResult(BaseModel):
     filename: str
@@ -26,40 +119,151 @@ class PredictionResult(BaseModel):
     confidence: float
     details: dict
     message: str
+    model_version: str
+
+def identify_client(request):
+    return client_id(request.headers.get("x-api-key"), request.client.host if request.client else None, KNOWN_CLIENTS)
+
+def enforce_rate_limit(request, endpoint):
+    """Raises 429 with Retry-After when the caller's token bucket is empty."""
+    client = identify_client(request)
+    allowed, retry_after = rate_limiter.check(client)
+    if not allowed:
+        THROTTLED.inc(client=client, endpoint=endpoint)
+        raise HTTPException(status_code=429, detail="Rate limit exceeded.",
+                            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))})
+    return client
+
+def check_admin(token):
+    if ADMIN_TOKEN and token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+@app.middleware("http")
+async def record_request(request: Request, call_next):
+    IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        IN_FLIGHT.dec()
+        # Label by route template to keep cardinality bounded
+        route = request.scope.get("route")
+        REQUESTS.inc(endpoint=route.path if route else "unmatched", status=status)
 
 @app.get("/")
 def read_root():
     return {"message": "Vulnerability Detection API is running. Use /scan to check files."}
 
 @app.post("/scan", response_model=PredictionResult)
-async def scan_file(file: UploadFile = File(...)):
+def scan_file(request: Request, file: UploadFile = File(...)):
     """
     Scans an uploaded file for vulnerabilities.
     """
+    client = enforce_rate_limit(request, "/scan")
+
+    # Grab the served model once so a concurrent reload cannot mix versions
+    active = registry.get()
+    if active is None:
+        raise HTTPException(status_code=503, detail="No model loaded. Train a model and call /admin/reload.")
+
     try:
-        # Save temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as tmp:
-            shutil.copyfileobj(file.file, tmp)
-            tmp_path = tmp.name
-            
-        # Predict
-        pred, prob, details = predict_file(tmp_path, model, vectorizer)
-        
-        # Cleanup
-        os.unlink(tmp_path)
-        
+        with STAGE_SECONDS.time(stage="upload_read"):
+            raw = file.file.read()
+
+        key = (hashlib.sha256(raw).hexdigest(), active.version)
+        cached = result_cache.get(key)
+        CACHE_LOOKUPS.inc(result="hit" if cached else "miss")
+        if cached:
+            pred, prob, details = cached
+        else:
+            # Predict
+            timings = {}
+            with scheduler.acquire(client, scan_cost(len(raw))):
+                pred, prob, details = predict_content(decode_source(raw), active.model, active.vectorizer, timings)
+            for stage, seconds in timings.items():
+                STAGE_SECONDS.observe(seconds, stage=stage)
+            result_cache.put(key, (pred, prob, details))
+
+        PREDICTED_PROBABILITY.observe(float(prob))
         status = "VULNERABLE" if pred == 1 else "SAFE"
-        
+
         return {
             "filename": file.filename,
             "status": status,
             "confidence": float(prob),
             "details": details,
-            "message": f"File is {status} with {prob:.2f} confidence."
+            "message": f"File is {status} with {prob:.2f} confidence.",
+            "model_version": active.version
         }
-        
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/jobs", status_code=202)
+def create_job(request: Request, job_request: JobRequest):
+    """
+    Queues a scan of a local directory or a git URL (cloned shallowly, optionally at `ref`).
+    Poll GET /jobs/{id} for progress or follow GET /jobs/{id}/events.
+    """
+    client = enforce_rate_limit(request, "/jobs")
+    try:
+        job = job_manager.submit(job_request.target, job_request.ref, client=client)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_dict()
+
+def get_job_or_404(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@app.get("/jobs/{job_id}")
+def read_job(job_id: str, results: bool = False):
+    """Job status and progress (files done/total, ETA). `?results=true` adds per-file results."""
+    return get_job_or_404(job_id).to_dict(include_results=results)
+
+@app.get("/jobs/{job_id}/events")
+def stream_job(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """Server-sent events: progress, one `result` per scanned file and a final `done`."""
+    job = get_job_or_404(job_id)
+    start = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return StreamingResponse(job.stream(start), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@app.delete("/jobs/{job_id}", status_code=202)
+def cancel_job(job_id: str):
+    """Cancels a queued or running job; running jobs stop before their next file."""
+    get_job_or_404(job_id)
+    return job_manager.cancel(job_id).to_dict()
+
+@app.get("/metrics")
+def read_metrics():
+    """Operational telemetry in the Prometheus text exposition format."""
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
+
+@app.get("/admin/model")
+def model_status():
+    """Reports the model currently being served and the state of the last reload."""
+    active = registry.get()
+    return {
+        "model_version": active.version if active else None,
+        "loaded_at": active.loaded_at if active else None,
+        "reloading": registry.reloading,
+        "last_error": registry.last_error
+    }
+
+@app.post("/admin/reload", status_code=202)
+def reload_model(x_admin_token: Optional[str] = Header(None)):
+    """
+    Loads the artifacts in models/ in the background, validates and warms them up,
+    then swaps them in. Requests keep being served by the current model meanwhile.
+    """
+    check_admin(x_admin_token)
+    started = registry.reload_async()
+    return {"status": "reloading" if started else "already_reloading"}
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -6,7 +6,10 @@ import numpy as np
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from sample.data_loader import load_data
-from modify.preprocessing import preprocess_data, extract_features
+from modify.preprocessing import preprocess_data
+from modify.feature_pipeline import NUMERIC_COLUMNS
+from model.bundle import BUNDLE_FILE, bundle_feature_names, read_bundle_header, vectorizer_schema_hash
+from model.incremental import featurise_frame
 
 MODEL_DIR = "models"
 OUTPUT_DIR = "reports/figures"
@@ -18,7 +21,6 @@ def explain_model():
     # Load data and model
     df = load_data()
     X_train, X_test, y_train, y_test = preprocess_data(df)
-    X_train_vec, X_test_vec = extract_features(X_train, X_test)
     
     try:
         model = joblib.load(os.path.join(MODEL_DIR, "rf_model.pkl"))
@@ -26,6 +28,8 @@ def explain_model():
     except FileNotFoundError:
         print("Model not found. Train first.")
         return
+    # Transform with the served vectorizer; refitting it here would change the columns
+    X_test_vec = featurise_frame(X_test, vectorizer).toarray()
 
     # SHAP Explainer
     # We use a summary of X_train to speed up calculation if dataset is large
@@ -33,28 +37,24 @@ def explain_model():
     explainer = shap.TreeExplainer(model)
     shap_values = explainer.shap_values(X_test_vec)
     
-    # Feature Names
-    feature_names = vectorizer.get_feature_names_out()
-    # Add complexity feature name
-    feature_names = np.append(feature_names, "Cyclomatic_Complexity")
+    # Feature Names, in model column order. The bundle stores them with a schema
+    # hash, so a vectorizer that does not belong to the model is caught here.
+    bundle_path = os.path.join(MODEL_DIR, BUNDLE_FILE)
+    if os.path.exists(bundle_path):
+        feature_names = np.array(bundle_feature_names(bundle_path))
+        if vectorizer_schema_hash(vectorizer) != read_bundle_header(bundle_path)["schema_hash"]:
+            print("❌ tfidf_vectorizer.pkl does not match the model bundle. Retrain or re-export first.")
+            return
+    else:
+        feature_names = np.append(vectorizer.get_feature_names_out(), NUMERIC_COLUMNS)
     
     print(f"Data shape: {X_test_vec.shape}")
     print(f"Feature names length: {len(feature_names)}")
     
-    if X_test_vec.shape[1] != len(feature_names):
-        print("Shape mismatch! Adjusting feature names...")
-        # If mismatch, likely TF-IDF produced fewer features than max_features
-        # But get_feature_names_out() should match the vectorizer's output.
-        # Wait, did we save the vectorizer AFTER fitting on train? Yes.
-        # Did we load the SAME vectorizer? Yes.
-        # Maybe CodeBERT was enabled in preprocessing but not here?
-        # No, we commented it out.
-        # Let's just truncate or pad feature names if needed to avoid crash
-        if len(feature_names) < X_test_vec.shape[1]:
-            diff = X_test_vec.shape[1] - len(feature_names)
-            feature_names = np.append(feature_names, [f"Unknown_{i}" for i in range(diff)])
-        elif len(feature_names) > X_test_vec.shape[1]:
-            feature_names = feature_names[:X_test_vec.shape[1]]
+    if X_test_vec.shape[1] != len(feature_names) or model.n_features_in_ != len(feature_names):
+        print(f"❌ Feature mismatch: data has {X_test_vec.shape[1]} columns, model expects "
+              f"{model.n_features_in_}, schema names {len(feature_names)}.")
+        return
             
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urlparse, unquote
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model.predict import iter_source_files, read_source, predict_content
+from assess.scheduling import DEFAULT_CLIENT, scan_cost
+
+MAX_RUNNING_JOBS = 2
+MAX_FINISHED_JOBS = 100
+
+FINAL_STATES = {"completed", "failed", "cancelled"}
+GIT_URL_PREFIXES = ("http://", "https://", "git://", "ssh://", "file://", "git@")
+
+def is_git_url(target):
+    return target.startswith(GIT_URL_PREFIXES)
+
+def clone_repository(url, target_dir, ref=None):
+    """Shallow-clones `url` (optionally at branch/tag `ref`) into target_dir."""
+    cmd = ["git", "clone", "--depth", "1", "--quiet"]
+    if ref:
+        cmd += ["--branch", ref]
+    subprocess.run(cmd + [url, target_dir], check=True, capture_output=True, text=True)
+
+class ScanJob:
+    """State of one repository scan, plus the event log streamed to subscribers."""
+    def __init__(self, target, ref=None, client=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.target = target
+        self.ref = ref
+        self.client = client
+        self.status = "queued"
+        self.error = None
+        self.model_version = None
+        self.files_total = 0
+        self.files_done = 0
+        self.vulnerable_files = 0
+        self.results = []
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel = threading.Event()
+        self._events = []
+        self._cond = threading.Condition()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def progress(self):
+        eta = None
+        if self.status == "running" and self.files_done and self.files_total:
+            elapsed = time.time() - self.started_at
+            eta = elapsed / self.files_done * (self.files_total - self.files_done)
+        return {
+            "files_done": self.files_done,
+            "files_total": self.files_total,
+            "percent": round(100.0 * self.files_done / self.files_total, 1) if self.files_total else 0.0,
+            "eta_seconds": round(eta, 2) if eta is not None else None
+        }
+
+    def to_dict(self, include_results=False):
+        data = {
+            "job_id": self.id,
+            "target": self.target,
+            "ref": self.ref,
+            "status": self.status,
+            "error": self.error,
+            "model_version": self.model_version,
+            "progress": self.progress(),
+            "vulnerable_files": self.vulnerable_files,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+        if include_results:
+            data["results"] = self.results
+        return data
+
+    def finish(self, status, error=None):
+        # Status change and the final event are published together so a
+        # subscriber never sees a finished job without its "done" event
+        with self._cond:
+            self.status = status
+            self.error = error
+            self.finished_at = time.time()
+            self.emit("done", self.to_dict())
+
+    def emit(self, event, data):
+        with self._cond:
+            self._events.append((len(self._events) + 1, event, data))
+            self._cond.notify_all()
+
+    def events_after(self, last_id, timeout=15.0):
+        """Returns events newer than last_id, waiting up to `timeout` for one to arrive."""
+        with self._cond:
+            if len(self._events) <= last_id and self.status not in FINAL_STATES:
+                self._cond.wait(timeout)
+            return self._events[last_id:]
+
+    def stream(self, last_id=0, keepalive=15.0):
+        """Yields Server-Sent Events until the job reaches a final state."""
+        while True:
+            events = self.events_after(last_id, keepalive)
+            if not events:
+                if self.status in FINAL_STATES:
+                    return
+                yield ": keepalive\n\n"
+                continue
+            for event_id, event, data in events:
+                last_id = event_id
+                yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+                if event == "done":
+                    return
+
+class JobManager:
+    """
+    Runs repository scans on a bounded worker pool. At most `max_running` jobs
+    scan at once; the rest stay queued. `get_model` returns the served model
+    snapshot and `slots` (optional) is the FairScheduler shared with /scan, so
+    every file a job scans queues fairly against its submitter's other work.
+    """
+    def __init__(self, get_model, max_running=MAX_RUNNING_JOBS, slots=None,
+                 scan_content=predict_content, allowed_root=None):
+        self.get_model = get_model
+        self.slots = slots
+        self.scan_content = scan_content
+        self.allowed_root = os.path.realpath(allowed_root) if allowed_root else None
+        self.max_running = max_running
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix="scan-job")
+
+    def validate_target(self, target):
+        """
+        Raises ValueError for targets the service must not scan. Local paths,
+        file:// URLs included, are only scanned inside allowed_root, and not
+        at all when no root is configured.
+        """
+        if is_git_url(target) and not target.startswith("file://"):
+            return
+        path = unquote(urlparse(target).path) if target.startswith("file://") else target
+        if not self.allowed_root:
+            raise ValueError("Local targets are disabled; set JOB_ROOT to allow scanning a directory")
+        if not os.path.isdir(path):
+            raise ValueError(f"Target is neither a git URL nor an existing directory: {target}")
+        real = os.path.realpath(path)
+        if os.path.commonpath([real, self.allowed_root]) != self.allowed_root:
+            raise ValueError(f"Local targets must be inside {self.allowed_root}")
+
+    def submit(self, target, ref=None, client=None):
+        self.validate_target(target)
+        job = ScanJob(target, ref, client)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        job.emit("queued", job.to_dict())
+        job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            # Never started: finish it here since no worker will
+            job.finish("cancelled")
+        return job
+
+    def queue_depth(self):
+        return sum(1 for job in list(self.jobs.values()) if job.status == "queued")
+
+    def running(self):
+        return sum(1 for job in list(self.jobs.values()) if job.status == "running")
+
+    def _prune(self):
+        finished = [j for j in self.jobs.values() if j.status in FINAL_STATES]
+        finished.sort(key=lambda j: j.finished_at or 0)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+
+    def _run(self, job):
+        if job.cancel_requested:
+            job.finish("cancelled")
+            return
+        active = self.get_model()
+        if active is None:
+            job.finish("failed", "No model loaded.")
+            return
+
+        job.status = "running"
+        job.started_at = time.time()
+        job.model_version = active.version
+        workdir = None
+        try:
+            path = job.target
+            if is_git_url(job.target):
+                workdir = tempfile.mkdtemp(prefix="scan_job_")
+                path = os.path.join(workdir, "repo")
+                job.emit("cloning", {"target": job.target})
+                clone_repository(job.target, path, job.ref)
+
+            files = list(iter_source_files(path))
+            job.files_total = len(files)
+            job.emit("progress", job.progress())
+
+            for filepath in files:
+                if job.cancel_requested:
+                    job.finish("cancelled")
+                    return
+                result = self._scan_file(job, active, path, filepath)
+                job.files_done += 1
+                if result is not None:
+                    job.results.append(result)
+                    if result["status"] == "VULNERABLE":
+                        job.vulnerable_files += 1
+                    job.emit("result", result)
+                job.emit("progress", job.progress())
+
+            job.finish("completed")
+        except subprocess.CalledProcessError as e:
+            job.finish("failed", f"git failed: {(e.stderr or '').strip()}")
+        except Exception as e:
+            job.finish("failed", str(e))
+        finally:
+            if workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    def _scan_file(self, job, active, root, filepath):
+        try:
+            content = read_source(filepath)
+            cost = scan_cost(len(content))
+            with (self.slots.acquire(job.client or DEFAULT_CLIENT, cost) if self.slots else nullcontext()):
+                pred, prob, details = self.scan_content(content, active.model, active.vectorizer)
+        except Exception as e:
+            job.emit("file_error", {"file": os.path.relpath(filepath, root), "error": str(e)})
+            return None
+        status = "VULNERABLE" if pred == 1 else "SAFE"
+        return {
+            "file": os.path.relpath(filepath, root),
+            "status": status,
+            "confidence": float(prob),
+            "details": details,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+        }
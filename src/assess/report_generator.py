@@ -26,6 +26,7 @@ def generate_html_report(scan_results_file="scan_report.json", shap_image_path="
         return
 
     # Load SHAP Image as Base64
+    shap_b64 = None
     if os.path.exists(shap_image_path):
         with open(shap_image_path, "rb") as img_file:
             shap_b64 = base64.b64encode(img_file.read()).decode('utf-8')
@@ -35,6 +36,14 @@ def generate_html_report(scan_results_file="scan_report.json", shap_image_path="
     vulnerable_files = results.get("vulnerable_files", 0)
     safe_files = total_files - vulnerable_files
     scan_duration = results.get("scan_duration", "N/A")
+    # Git-object scans report how many results came from the blob cache
+    cache_card = ""
+    cache_stats = results.get("cache")
+    if cache_stats:
+        cache_card = f"""<div class="stat-card">
+                    <div class="stat-number" style="color: #8e44ad">{cache_stats['reused']} / {cache_stats['reused'] + cache_stats['computed']}</div>
+                    <div class="stat-label">Resultados Reutilizados (caché)</div>
+                </div>"""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     # --- Calculate Statistics for Dashboard ---
@@ -197,6 +206,7 @@ def generate_html_report(scan_results_file="scan_report.json", shap_image_path="
                     <div class="stat-number">{scan_duration}s</div>
                     <div class="stat-label">Duración</div>
                 </div>
+                {cache_card}
             </div>
 
             <!-- Charts Row -->
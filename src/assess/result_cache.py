@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modify.rules import RULESET_VERSION
+
+MODEL_DIR = "models"
+CACHE_ENV = "VULNSCAN_CACHE"
+CACHE_FILE = "scan_results.sqlite"
+# SQLite caps the number of bound parameters per statement
+LOOKUP_CHUNK = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    blob TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    prediction INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    details TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (blob, model_version)
+) WITHOUT ROWID
+"""
+
+def default_cache_path():
+    """$VULNSCAN_CACHE, else the user's cache directory: shared by every repo, fork and commit scanned."""
+    if os.environ.get(CACHE_ENV):
+        return os.environ[CACHE_ENV]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "vulnscan", CACHE_FILE)
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def model_version(model_dir=MODEL_DIR):
+    """
+    Identifies the artifact load_model() serves from `model_dir` (same
+    active_artifact lookup) plus the rule set. A result cached under another
+    version is never reused.
+    """
+    from model.predict import PIPELINE_FILE, active_artifact
+    from model.bundle import BUNDLE_FILE, read_bundle_header
+    kind = active_artifact(model_dir)
+    if kind == "pipeline":
+        artifact = "pipeline-" + _file_digest(os.path.join(model_dir, PIPELINE_FILE))
+    elif kind == "bundle":
+        header = read_bundle_header(os.path.join(model_dir, BUNDLE_FILE))
+        artifact = f"bundle-{header['version']}-{header['schema_hash']}"
+    else:
+        artifact = "pickles-" + "-".join(_file_digest(os.path.join(model_dir, name))
+                                         for name in ("rf_model.pkl", "tfidf_vectorizer.pkl"))
+    return f"{artifact}+rules-{RULESET_VERSION}"
+
+class ResultCache:
+    """
+    Persistent (blob OID, model version) -> scan result map in SQLite. Git
+    names every file version by the hash of its contents, so a blob scored
+    once is never featurised again: not in the next commit, another branch or
+    a fork. Only the prediction, confidence and details are stored; the path
+    and timestamp belong to each scan.
+    """
+    def __init__(self, model_version, path=None):
+        self.model_version = model_version
+        self.path = path or default_cache_path()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        # WAL lets concurrent scans read while one of them writes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+
+    def get_many(self, oids):
+        """{oid: (prediction, confidence, details)} for the OIDs scored by this model version."""
+        oids = list(dict.fromkeys(oids))
+        found = {}
+        for i in range(0, len(oids), LOOKUP_CHUNK):
+            chunk = oids[i:i + LOOKUP_CHUNK]
+            rows = self.conn.execute(
+                f"SELECT blob, prediction, confidence, details FROM results "
+                f"WHERE model_version = ? AND blob IN ({','.join('?' * len(chunk))})",
+                [self.model_version] + chunk)
+            for blob, prediction, confidence, details in rows:
+                found[blob] = (prediction, confidence, json.loads(details))
+        return found
+
+    def put_many(self, results):
+        """Stores {oid: (prediction, confidence, details)} in one transaction."""
+        created_at = time.strftime("%Y-%m-%d %H:%M:%S")
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                [(oid, self.model_version, int(pred), float(prob), json.dumps(details), created_at)
+                 for oid, (pred, prob, details) in results.items()])
+
+    def stats(self):
+        """Number of cached results per model version."""
+        return dict(self.conn.execute("SELECT model_version, COUNT(*) FROM results GROUP BY model_version"))
+
+    def prune(self):
+        """Drops results of every other model version. Returns how many rows were removed."""
+        with self.conn:
+            removed = self.conn.execute("DELETE FROM results WHERE model_version != ?", (self.model_version,)).rowcount
+        self.conn.execute("VACUUM")
+        return removed
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or prune the blob-level scan result cache.")
+    parser.add_argument("command", choices=["stats", "prune"])
+    parser.add_argument("--cache", help=f"Cache file (default: ${CACHE_ENV} or ~/.cache/vulnscan/{CACHE_FILE})")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args()
+
+    with ResultCache(model_version(args.model_dir), args.cache) as cache:
+        if args.command == "stats":
+            print(f"Cache: {cache.path}")
+            for version, count in cache.stats().items():
+                marker = "*" if version == cache.model_version else " "
+                print(f" {marker} {version}: {count} results")
+        else:
+            print(f"✅ Removed {cache.prune()} results of other model versions.")
@@ -1,76 +1,135 @@
 import os
 import sys
-import shutil
 import subprocess
 import argparse
-import stat
 
 # Add src to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from model.predict import load_model, scan_directory, generate_report
+from model.predict import (load_model, scan_directory, generate_report, scan_file_content, report_entry, decode_source,
+                           is_source_path, predict_content)
 from assess.report_generator import generate_html_report
+from assess.result_cache import ResultCache, model_version
+from sample.mirror_cache import MirrorCache
+from sample.git_objects import list_blobs, CatFileBatch, resolve_commit, is_git_repository, GitError
 
-def remove_readonly(func, path, excinfo):
+def scan_git_tree(repo, rev, model, vectorizer, scan_content=predict_content, cache=None):
     """
-    Error handler for shutil.rmtree to remove read-only files (like .git objects) on Windows.
+    Scans the source files of commit `rev` straight from the object database of
+    `repo` (bare or not): `git ls-tree` lists the blobs and one `git cat-file
+    --batch` process streams their contents into the scanner. Nothing is
+    checked out. Each result also records the blob OID.
+
+    With a ResultCache, blobs already scored by this model version are not read
+    or featurised at all; identical blobs within the commit are scored once.
+    Each result records whether it was reused ("cached").
     """
-    os.chmod(path, stat.S_IWRITE)
-    func(path)
+    commit = resolve_commit(repo, rev)
+    print(f"Scanning {repo} at {commit[:12]} (git objects, no checkout)")
+    blobs = list_blobs(repo, commit, include=is_source_path)
+    known = cache.get_many(oid for _, oid, _ in blobs) if cache is not None else {}
+    fresh = {}
+    results = []
+    with CatFileBatch(repo) as batch:
+        for path, oid, _ in blobs:
+            try:
+                scored = known.get(oid) or fresh.get(oid)
+                if scored is not None:
+                    result = report_entry(path, *scored)
+                    result["cached"] = True
+                else:
+                    result = scan_file_content(path, decode_source(batch.read(oid)), model, vectorizer, scan_content)
+                    fresh[oid] = (int(result["status"] == "VULNERABLE"), result["confidence"], result["details"])
+                    result["cached"] = False
+                result["blob"] = oid
+                results.append(result)
+            except Exception as e:
+                print(f"Error scanning {path}: {e}")
+    if cache is not None:
+        cache.put_many(fresh)
+    reused = sum(1 for r in results if r["cached"])
+    print(f"♻️  {reused} results reused, {len(results) - reused} computed")
+    return results
 
-def scan_external_repo(repo_url):
+def _scan_mirror(repo_url, rev, checkout, model, vectorizer, cache=None):
     """
-    Clones a repo, scans it, generates reports, and cleans up.
+    Remote repositories (and --checkout scans) go through the mirror cache: the
+    first scan clones a bare mirror, later ones only fetch what changed. The
+    objects are read in place, or checked out into a temporary worktree.
     """
-    repo_name = repo_url.split("/")[-1].replace(".git", "")
-    temp_dir = f"temp_scan_{repo_name}"
+    mirrors = MirrorCache()
+    try:
+        if checkout:
+            with mirrors.worktree(repo_url, rev) as path:
+                print(f"🔍 Scanning files in a worktree of {rev}...")
+                results = scan_directory(path, model, vectorizer)
+            for result in results:
+                result["file"] = os.path.relpath(result["file"], path)
+            return results
+        with mirrors.mirror(repo_url) as path:
+            return scan_git_tree(path, rev, model, vectorizer, cache=cache)
+    except (subprocess.CalledProcessError, GitError) as e:
+        print(f"❌ Error: Failed to read repository: {getattr(e, 'stderr', None) or e}")
+        return None
+
+def open_result_cache(cache_path=None):
+    """The result cache for the served model, or None (with a warning) if it can't be opened."""
+    try:
+        return ResultCache(model_version(), cache_path)
+    except Exception as e:
+        print(f"⚠️  Result cache disabled: {e}")
+        return None
+
+def scan_external_repo(repo_url, rev="HEAD", checkout=False, open_report=True, use_cache=True, cache_path=None):
+    """
+    Scans a repo and generates reports. A local repository (bare or not) is read
+    in place; a remote one is read from its mirror in the cache (see
+    mirror_cache.py). checkout=True walks a temporary worktree instead.
+    Git-object scans reuse cached results by blob OID unless use_cache=False.
+    """
+    repo_name = repo_url.rstrip("/").split("/")[-1].replace(".git", "")
     
     print(f"\n🚀 Starting Security Scan for: {repo_name}")
     print(f"🔗 URL: {repo_url}")
     
-    # 1. Clone Repository
-    if os.path.exists(temp_dir):
-        print(f"🧹 Removing existing temp directory: {temp_dir}")
-        shutil.rmtree(temp_dir, onerror=remove_readonly)
-    
-    print("⬇️  Cloning repository (shallow clone)...")
-    try:
-        subprocess.check_call(["git", "clone", "--depth", "1", repo_url, temp_dir])
-    except subprocess.CalledProcessError:
-        print("❌ Error: Failed to clone repository. Check the URL and your internet connection.")
-        return
-
-    # 2. Load Model
+    # Load Model
     print("🧠 Loading AI Model...")
     try:
         model, vectorizer = load_model()
     except Exception as e:
         print(f"❌ Error loading model: {e}")
         return
-
-    # 3. Scan Directory
-    print(f"🔍 Scanning files in {temp_dir}...")
-    results = scan_directory(temp_dir, model, vectorizer)
     
-    # 4. Generate Reports
+    cache = open_result_cache(cache_path) if use_cache and not checkout else None
+    try:
+        if is_git_repository(repo_url) and not checkout:
+            try:
+                results = scan_git_tree(repo_url, rev, model, vectorizer, cache=cache)
+            except (subprocess.CalledProcessError, GitError) as e:
+                print(f"❌ Error: Failed to read repository: {getattr(e, 'stderr', None) or e}")
+                results = None
+        else:
+            results = _scan_mirror(repo_url, rev, checkout, model, vectorizer, cache)
+    finally:
+        if cache is not None:
+            cache.close()
+    if results is None:
+        return
+    
+    # Generate Reports
     json_report = f"report_{repo_name}.json"
     html_report = f"report_{repo_name}.html"
     
     print("📊 Generating reports...")
     generate_report(results, output_file=json_report)
     generate_html_report(scan_results_file=json_report, output_file=html_report)
-    
-    # 5. Cleanup
-    print("🧹 Cleaning up temporary files...")
-    try:
-        shutil.rmtree(temp_dir, onerror=remove_readonly)
-    except Exception as e:
-        print(f"⚠️ Warning: Could not fully remove temp dir: {e}")
 
     print(f"\n✅ Scan Complete!")
     print(f"📄 JSON Report: {os.path.abspath(json_report)}")
     print(f"🌐 HTML Report: {os.path.abspath(html_report)}")
     
+    if not open_report:
+        return results
     # Open HTML report
     if sys.platform == 'win32':
         os.startfile(os.path.abspath(html_report))
@@ -78,18 +137,27 @@ def scan_external_repo(repo_url):
         subprocess.call(('open', html_report))
     else:
         subprocess.call(('xdg-open', html_report))
+    return results
 
 if __name__ == "__main__":
     print("=============================================")
     print("   🛡️  AI-Powered Security Scanner  🛡️")
     print("=============================================")
     
-    if len(sys.argv) > 1:
-        url = sys.argv[1]
-    else:
-        url = input("👉 Enter GitHub Repository URL to scan: ").strip()
+    parser = argparse.ArgumentParser(description="Scan a git repository for vulnerabilities.")
+    parser.add_argument("url", nargs="?", help="Repository URL or local repository path")
+    parser.add_argument("--rev", default="HEAD", help="Commit, branch or tag to scan (default: HEAD)")
+    parser.add_argument("--checkout", action="store_true",
+                        help="Check out a temporary worktree and walk it from disk instead of reading git objects")
+    parser.add_argument("--no-open", action="store_true", help="Don't open the HTML report")
+    parser.add_argument("--no-cache", action="store_true", help="Score every blob, ignoring the result cache")
+    parser.add_argument("--cache", help="Result cache file (default: $VULNSCAN_CACHE or ~/.cache/vulnscan/)")
+    args = parser.parse_args()
+    
+    url = args.url or input("👉 Enter GitHub Repository URL to scan: ").strip()
     
     if url:
-        scan_external_repo(url)
+        scan_external_repo(url, args.rev, args.checkout, open_report=not args.no_open,
+                           use_cache=not args.no_cache, cache_path=args.cache)
     else:
         print("❌ No URL provided.")
@@ -0,0 +1,167 @@
+import time
+import heapq
+import hashlib
+import itertools
+import threading
+from contextlib import contextmanager
+
+DEFAULT_CLIENT = "anonymous"
+# Fair-queuing cost of a scan: one unit per started 64 KB of source
+COST_UNIT_BYTES = 64 * 1024
+# How often the rate limiter drops the buckets of idle clients
+SWEEP_SECONDS = 60
+
+def scan_cost(n_bytes):
+    return 1 + n_bytes // COST_UNIT_BYTES
+
+def api_key_id(api_key):
+    """Client id of an API key, as written in CLIENT_LIMITS / CLIENT_WEIGHTS."""
+    # Never keep raw keys in memory maps or metric labels
+    return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8]
+
+def client_id(api_key=None, host=None, known=()):
+    """
+    Identifies the caller: the hashed API key if it is one of the `known`
+    client ids (those configured in CLIENT_LIMITS / CLIENT_WEIGHTS), otherwise
+    the client IP. Unknown keys are ignored, so sending a fresh key per
+    request never buys a fresh bucket or queue share.
+    """
+    if api_key and api_key_id(api_key) in known:
+        return api_key_id(api_key)
+    return f"ip:{host}" if host else DEFAULT_CLIENT
+
+def parse_client_config(value, cast=float):
+    """Parses 'client=value,client2=value2' (as used in CLIENT_WEIGHTS / CLIENT_LIMITS)."""
+    config = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        client, raw = item.rsplit("=", 1)
+        config[client.strip()] = cast(raw.strip())
+    return config
+
+def parse_limit(raw):
+    """'rate:burst' -> (rate, burst)."""
+    rate, _, burst = raw.partition(":")
+    return float(rate), float(burst or rate)
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def try_acquire(self, cost=1.0):
+        """Takes `cost` tokens if available. Returns (allowed, seconds until allowed)."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return True, 0.0
+        if self.rate <= 0:
+            return False, float("inf")
+        return False, (cost - self.tokens) / self.rate
+
+class RateLimiter:
+    """
+    Per-client token buckets kept in a local dict. Buckets that have refilled
+    are dropped every `sweep_seconds` (and whenever max_clients is reached).
+    """
+    def __init__(self, rate, burst, limits=None, max_clients=10000, sweep_seconds=SWEEP_SECONDS):
+        self.rate = rate
+        self.burst = burst
+        self.limits = limits or {}
+        self.max_clients = max_clients
+        self.sweep_seconds = sweep_seconds
+        self._buckets = {}
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    def check(self, client, cost=1.0):
+        """Returns (allowed, retry_after_seconds) and consumes tokens when allowed."""
+        if self.rate <= 0 and client not in self.limits:
+            return True, 0.0 # Rate limiting disabled
+        with self._lock:
+            if time.monotonic() - self._last_sweep >= self.sweep_seconds:
+                self._evict_idle()
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    self._evict_idle()
+                rate, burst = self.limits.get(client, (self.rate, self.burst))
+                bucket = self._buckets[client] = TokenBucket(rate, burst)
+            return bucket.try_acquire(cost)
+
+    def _evict_idle(self):
+        # A bucket that would be full again carries no state worth keeping
+        now = self._last_sweep = time.monotonic()
+        for client, bucket in list(self._buckets.items()):
+            if bucket.tokens + (now - bucket.updated) * bucket.rate >= bucket.burst:
+                del self._buckets[client]
+
+class FairScheduler:
+    """
+    Weighted fair queuing (start-time fair queuing) in front of a fixed number of
+    inference slots. Each request gets a virtual start tag
+        S = max(V, F[client]),  F[client] = S + cost / weight
+    and free slots go to the waiting request with the smallest S. A client that
+    floods the queue only pushes its own tags forward, so other clients keep
+    getting their weighted share of the slots.
+    """
+    def __init__(self, slots, weights=None, default_weight=1.0):
+        self.slots = slots
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self._free = slots
+        self._virtual_time = 0.0
+        self._finish = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self.waiting_by_client = {}
+
+    @property
+    def waiting(self):
+        return len(self._heap)
+
+    def weight(self, client):
+        return self.weights.get(client, self.default_weight)
+
+    @contextmanager
+    def acquire(self, client=DEFAULT_CLIENT, cost=1.0):
+        with self._cond:
+            start = max(self._virtual_time, self._finish.get(client, 0.0))
+            self._finish[client] = start + cost / self.weight(client)
+            ticket = [start, next(self._seq), client, False]
+            heapq.heappush(self._heap, ticket)
+            self.waiting_by_client[client] = self.waiting_by_client.get(client, 0) + 1
+            self._dispatch()
+            while not ticket[3]:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._free += 1
+                self._dispatch()
+
+    def _dispatch(self):
+        granted = False
+        while self._free > 0 and self._heap:
+            ticket = heapq.heappop(self._heap)
+            ticket[3] = True
+            self._free -= 1
+            self._virtual_time = ticket[0]
+            client = ticket[2]
+            self.waiting_by_client[client] -= 1
+            if not self.waiting_by_client[client]:
+                del self.waiting_by_client[client]
+            granted = True
+        if granted:
+            self._cond.notify_all()
+        if len(self._finish) > 1024:
+            # Tags at or behind virtual time are equivalent to having none
+            self._finish = {c: f for c, f in self._finish.items() if f > self._virtual_time}
@@ -7,8 +7,8 @@ from data_loader import load_data
 OUTPUT_DIR = "reports/figures"
 
 def perform_eda():
-    """Performs basic exploratory data analysis."""
-    df = load_data()
+    """Performs basic exploratory data analysis (labels only: the code column is never loaded)."""
+    df = load_data(columns=["is_vulnerable", "cwe_id"])
     
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
@@ -26,7 +26,9 @@ def perform_eda():
         plt.figure(figsize=(10, 6))
         vuln_df = df[df["is_vulnerable"] == 1]
         if not vuln_df.empty:
-            sns.countplot(y="cwe_id", data=vuln_df, order=vuln_df["cwe_id"].value_counts().index)
+            counts = vuln_df["cwe_id"].value_counts()
+            # Parquet datasets load cwe_id as a categorical: drop categories only the safe rows use
+            sns.countplot(y="cwe_id", data=vuln_df, order=counts[counts > 0].index)
             plt.title("Distribution of CWE IDs")
             plt.xlabel("Count")
             plt.ylabel("CWE ID")
@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+import numpy as np
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model.compiled_forest import FOREST_ARRAYS, CompiledForest, flatten_forest
+from model.shared_model import export_vectorizer, rebuild_vectorizer
+from modify.feature_pipeline import NUMERIC_COLUMNS
+from modify.static_vectorizer import StaticVectorizer
+from modify.rules import WARMUP_SNIPPET
+
+MODEL_DIR = "models"
+BUNDLE_FILE = "model.bundle"
+# The pickle pair a bundle is exported from
+SOURCE_FILES = ("rf_model.pkl", "tfidf_vectorizer.pkl")
+MAGIC = b"SEMMABDL"
+FORMAT_VERSION = 1
+# Every array starts on a 64-byte boundary (cache line / SIMD friendly when memory-mapped)
+ALIGNMENT = 64
+# Magic + little-endian uint64 header length
+PREFIX = struct.Struct("<8sQ")
+
+class BundleError(ValueError):
+    """The bundle is corrupt, from another format version, or its features do not line up."""
+
+def compute_model_version(*paths):
+    """Short content hash identifying a set of model artifacts."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def feature_schema_hash(terms, vectorizer_params):
+    """
+    Hash of everything that decides which column a feature lands in: the
+    vocabulary in column order, the tokenisation settings and the extra
+    numeric columns appended after the TF-IDF block.
+    """
+    schema = {"terms": [str(t) for t in terms], "vectorizer": vectorizer_params, "extra": NUMERIC_COLUMNS}
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def vectorizer_schema_hash(vectorizer):
+    arrays, params = export_vectorizer(vectorizer)
+    return feature_schema_hash(arrays["vocabulary"], params)
+
+def write_bundle(model, vectorizer, path=os.path.join(MODEL_DIR, BUNDLE_FILE), version=None, metadata=None,
+                 source_version=None):
+    """
+    Writes model + vectorizer as one file: magic, JSON header, then every array
+    uncompressed at a 64-byte aligned offset. Accepts a fitted RandomForest or
+    a CompiledForest (e.g. a compressed one). Written to a temp file and renamed.
+    source_version (compute_model_version of the rf_model.pkl/tfidf_vectorizer.pkl
+    pair it was exported from) lets stale_bundle notice pickles retrained since.
+    """
+    if isinstance(model, CompiledForest):
+        forest = {name: np.asarray(getattr(model, name)) for name in FOREST_ARRAYS}
+    else:
+        forest = flatten_forest(model)
+    vec_arrays, vec_params = export_vectorizer(vectorizer)
+    arrays = dict(forest, **vec_arrays)
+
+    n_features = int(model.n_features_in_)
+    expected = len(vec_arrays["vocabulary"]) + len(NUMERIC_COLUMNS)
+    if n_features != expected:
+        raise BundleError(f"Model expects {n_features} features but the vectorizer produces {expected}.")
+
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset = _align(offset + array.nbytes)
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "version": version or time.strftime("%Y%m%d%H%M%S"),
+        "source_version": source_version,
+        "schema_hash": feature_schema_hash(vec_arrays["vocabulary"], vec_params),
+        "n_features": n_features,
+        "n_estimators": len(forest["tree_offsets"]) - 1,
+        "vectorizer_params": vec_params,
+        "metadata": metadata or {},
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "arrays": layout
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _align(PREFIX.size + len(header_bytes))
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(PREFIX.pack(MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    print(f"✅ Model bundle {header['version']} written to {path}")
+    return header
+
+def read_header(buffer):
+    """Parses and checks the bundle prefix. Returns (header, data_start)."""
+    if len(buffer) < PREFIX.size:
+        raise BundleError("File too short to be a model bundle.")
+    magic, header_len = PREFIX.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise BundleError("Not a model bundle (bad magic).")
+    try:
+        header = json.loads(bytes(buffer[PREFIX.size:PREFIX.size + header_len]).decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise BundleError(f"Corrupt bundle header: {e}")
+    if header.get("format_version") != FORMAT_VERSION:
+        raise BundleError(f"Bundle format {header.get('format_version')} is not supported (expected {FORMAT_VERSION}).")
+    return header, _align(PREFIX.size + header_len)
+
+def _views(buffer, header, data_start):
+    """Zero-copy NumPy views of every array; bounds are checked against the file size."""
+    arrays = {}
+    for name, info in header["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        count = int(np.prod(info["shape"], dtype=np.int64))
+        start = data_start + info["offset"]
+        if start + count * dtype.itemsize > len(buffer):
+            raise BundleError(f"Array '{name}' runs past the end of the bundle (truncated file?).")
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=start).reshape(info["shape"])
+    return arrays
+
+def verify_bundle(header, arrays):
+    """Recomputes the feature schema and checks the forest arrays fit together."""
+    missing = [name for name in FOREST_ARRAYS + ["vocabulary", "idf"] if name not in arrays]
+    if missing:
+        raise BundleError(f"Bundle is missing arrays: {missing}")
+    schema_hash = feature_schema_hash(arrays["vocabulary"], header["vectorizer_params"])
+    if schema_hash != header["schema_hash"]:
+        raise BundleError(f"Feature schema hash mismatch: header {header['schema_hash']}, data {schema_hash}.")
+    expected = len(arrays["vocabulary"]) + len(NUMERIC_COLUMNS)
+    if header["n_features"] != expected or len(arrays["idf"]) != len(arrays["vocabulary"]):
+        raise BundleError(f"Model expects {header['n_features']} features but the vocabulary gives {expected}.")
+    n_nodes = len(arrays["children_left"])
+    offsets = arrays["tree_offsets"]
+    if offsets[-1] != n_nodes or any(len(arrays[name]) != n_nodes for name in FOREST_ARRAYS[1:5]):
+        raise BundleError("Forest node arrays have inconsistent lengths.")
+    if n_nodes and int(np.asarray(arrays["feature"]).max()) >= header["n_features"]:
+        raise BundleError("A split uses a feature outside the schema.")
+
+def load_bundle(path=os.path.join(MODEL_DIR, BUNDLE_FILE), use_mmap=True, verify=True):
+    """
+    Loads a bundle as (CompiledForest, vectorizer, header). With use_mmap the
+    arrays are read-only views of the mapped file, so nothing is copied until
+    a page is touched. With verify the feature schema is checked before use.
+    """
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if use_mmap else f.read()
+    header, data_start = read_header(buffer)
+    arrays = _views(buffer, header, data_start)
+    if verify:
+        verify_bundle(header, arrays)
+    model = CompiledForest(arrays, header["n_features"])
+    params = header["vectorizer_params"]
+    if StaticVectorizer.supports(params):
+        # Same rows as TfidfVectorizer, without importing sklearn on the scanning path
+        vectorizer = StaticVectorizer(arrays["vocabulary"], arrays["idf"], params)
+    else:
+        vectorizer = rebuild_vectorizer(arrays, params)
+    return model, vectorizer, header
+
+def read_bundle_header(path=os.path.join(MODEL_DIR, BUNDLE_FILE)):
+    """Header only (version, schema hash, training metadata); the arrays are not read."""
+    with open(path, "rb") as f:
+        prefix = f.read(PREFIX.size)
+        if len(prefix) < PREFIX.size:
+            raise BundleError("File too short to be a model bundle.")
+        return read_header(prefix + f.read(PREFIX.unpack(prefix)[1]))[0]
+
+def stale_bundle(model_dir=MODEL_DIR):
+    """
+    Why the bundle in model_dir no longer matches the pickles next to it (they
+    were retrained after it was exported), or None. Pickles older than the
+    bundle are not hashed, so the usual check is two stat calls.
+    """
+    bundle_path = os.path.join(model_dir, BUNDLE_FILE)
+    sources = [os.path.join(model_dir, name) for name in SOURCE_FILES]
+    if not all(os.path.exists(path) for path in sources):
+        return None
+    if max(os.path.getmtime(path) for path in sources) <= os.path.getmtime(bundle_path):
+        return None
+    recorded = read_bundle_header(bundle_path).get("source_version")
+    current = compute_model_version(*sources)
+    if recorded == current:
+        return None
+    return f"{bundle_path} was exported from model {recorded or 'unknown'} but the pickles are now {current}"
+
+def bundle_feature_names(path=os.path.join(MODEL_DIR, BUNDLE_FILE)):
+    """Column names in model order (verified): the TF-IDF terms, then the numeric features."""
+    _, vectorizer, _ = load_bundle(path)
+    return sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get) + list(NUMERIC_COLUMNS)
+
+def benchmark_load(model_dir=MODEL_DIR, repeats=5):
+    """Best-of-N load time (and load + first prediction) of the pickle pair vs the bundle."""
+    import joblib
+    from model.predict import predict_content
+
+    def pickles():
+        return (joblib.load(os.path.join(model_dir, "rf_model.pkl")),
+                joblib.load(os.path.join(model_dir, "tfidf_vectorizer.pkl")))
+
+    def bundle():
+        return load_bundle(os.path.join(model_dir, BUNDLE_FILE))[:2]
+
+    rows = []
+    print(f"{'format':<10} {'size (MB)':>10} {'load (ms)':>10} {'load + 1st scan (ms)':>21}")
+    for name, loader, files in (("pickles", pickles, ["rf_model.pkl", "tfidf_vectorizer.pkl"]),
+                                ("bundle", bundle, [BUNDLE_FILE])):
+        load_ms, first_ms = [], []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model, vectorizer = loader()
+            load_ms.append((time.perf_counter() - start) * 1000)
+            predict_content(WARMUP_SNIPPET, model, vectorizer)
+            first_ms.append((time.perf_counter() - start) * 1000)
+        size_mb = sum(os.path.getsize(os.path.join(model_dir, f)) for f in files) / 1024 ** 2
+        rows.append({"format": name, "size_mb": size_mb, "load_ms": min(load_ms), "first_scan_ms": min(first_ms)})
+        print(f"{name:<10} {size_mb:>10.2f} {min(load_ms):>10.1f} {min(first_ms):>21.1f}")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write, inspect or benchmark the single-file model bundle.")
+    parser.add_argument("command", choices=["export", "info", "benchmark"])
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args()
+
+    bundle_path = os.path.join(args.model_dir, BUNDLE_FILE)
+    if args.command == "export":
+        import joblib
+        from model.predict import set_active_artifact
+        sources = [os.path.join(args.model_dir, name) for name in SOURCE_FILES]
+        write_bundle(joblib.load(sources[0]), joblib.load(sources[1]), bundle_path,
+                     source_version=compute_model_version(*sources))
+        set_active_artifact("bundle", args.model_dir)
+    elif args.command == "info":
+        _, _, header = load_bundle(bundle_path)
+        print(json.dumps({k: v for k, v in header.items() if k != "arrays"}, indent=4))
+    else:
+        benchmark_load(args.model_dir)
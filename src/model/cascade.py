@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import argparse
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.metrics import accuracy_score, f1_score
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modify.preprocessing import get_dangerous_details
+from model.predict import featurise_content
+
+MODEL_DIR = "models"
+LINEAR_MODEL_FILE = "linear_model.pkl"
+FOREST_MODEL_FILE = "rf_model.pkl"
+
+# Linear-model probabilities inside (low, high) are not trusted and go to the RF
+DEFAULT_BAND = (0.2, 0.8)
+# Any finding of this severity decides the file without running a model
+CRITICAL_SEVERITY = "Critical"
+
+class CascadeModel:
+    """
+    Two model tiers behind the predict_proba interface: the linear scorer rates
+    every row, and only rows whose probability falls inside `band` are re-scored
+    by the forest. score() also reports which tier decided each row.
+    """
+    # The linear tier reads the sparse TF-IDF row; the forest gets dense rows
+    accepts_sparse = True
+
+    def __init__(self, linear, forest, band=DEFAULT_BAND):
+        low, high = band
+        if not 0.0 <= low <= 0.5 <= high <= 1.0:
+            raise ValueError(f"Uncertainty band must contain 0.5, got {band}")
+        self.linear = linear
+        self.forest = forest
+        self.band = (low, high)
+        self.classes_ = np.asarray(forest.classes_ if hasattr(forest, "classes_") else forest.classes)
+        self.n_features_in_ = linear.n_features_in_
+
+    def score(self, X):
+        """Returns (P(vulnerable) per row, tier name per row)."""
+        low, high = self.band
+        proba = self.linear.predict_proba(X)[:, 1]
+        uncertain = (proba > low) & (proba < high)
+        tiers = np.where(uncertain, "forest", "linear")
+        if uncertain.any():
+            rows = X[uncertain]
+            if sparse.issparse(rows):
+                rows = rows.toarray()
+            proba[uncertain] = self.forest.predict_proba(rows)[:, 1]
+        return proba, tiers
+
+    def predict_proba(self, X):
+        proba, _ = self.score(X)
+        return np.column_stack((1.0 - proba, proba))
+
+    def predict(self, X):
+        proba, _ = self.score(X)
+        return self.classes_[(proba > 0.5).astype(int)]
+
+def cascade_predict_content(content, model, vectorizer, timings=None):
+    """
+    Drop-in replacement for predict_content that scores through the tiers:
+    1. rules: a Critical rule finding marks the file vulnerable right away,
+    2. linear: the cheap linear model decides when it is confident,
+    3. forest: the RandomForest only sees the files left in the uncertainty band.
+    The deciding tier is stored in details["tier"].
+    """
+    start = time.perf_counter()
+    findings = get_dangerous_details(content)
+    rules_done = time.perf_counter()
+    if timings is not None:
+        timings["rule_scan"] = rules_done - start
+
+    if any(f["severity"] == CRITICAL_SEVERITY for f in findings):
+        details = {"complexity": None, "ast_depth": None, "dangerous_calls": findings, "tier": "rules"}
+        return model.classes_[1], 1.0, details
+
+    features, complexity, ast_depth = featurise_content(content, vectorizer, len(findings), sparse_row=True)
+    featurised = time.perf_counter()
+    proba, tiers = model.score(features)
+    if timings is not None:
+        timings["featurisation"] = featurised - rules_done
+        timings["inference"] = time.perf_counter() - featurised
+
+    details = {
+        "complexity": complexity,
+        "ast_depth": ast_depth,
+        "dangerous_calls": findings,
+        "tier": str(tiers[0])
+    }
+    return model.classes_[int(proba[0] > 0.5)], float(proba[0]), details
+
+def _per_file_seconds(model, X):
+    """Scores the rows one at a time, like scan_directory does."""
+    start = time.perf_counter()
+    for i in range(X.shape[0]):
+        model.predict_proba(X[i:i + 1])
+    return time.perf_counter() - start
+
+def evaluate_cascade(cascade, X_test, y_test):
+    """
+    Compares the forest alone with the cascade on a held-out matrix: accuracy, F1,
+    share of rows that reached the forest and files/s when scoring file by file.
+    The rule tier needs the source text, so it is not part of this comparison.
+    """
+    X_sparse = sparse.csr_matrix(X_test)
+    X_dense = X_sparse.toarray()
+    y_test = np.asarray(y_test)
+
+    forest_pred = cascade.classes_[np.argmax(cascade.forest.predict_proba(X_dense), axis=1)]
+    proba, tiers = cascade.score(X_sparse)
+    cascade_pred = cascade.classes_[(proba > 0.5).astype(int)]
+
+    forest_s = _per_file_seconds(cascade.forest, X_dense)
+    cascade_s = _per_file_seconds(cascade, X_sparse)
+
+    rows = [
+        {"mode": "forest", "accuracy": accuracy_score(y_test, forest_pred),
+         "f1": f1_score(y_test, forest_pred, zero_division=0), "forest_share": 1.0,
+         "files_per_s": len(y_test) / forest_s},
+        {"mode": "cascade", "accuracy": accuracy_score(y_test, cascade_pred),
+         "f1": f1_score(y_test, cascade_pred, zero_division=0), "forest_share": float(np.mean(tiers == "forest")),
+         "files_per_s": len(y_test) / cascade_s},
+    ]
+    print(f"Uncertainty band: {cascade.band}, {len(y_test)} held-out files")
+    print(f"{'mode':<8} {'accuracy':>9} {'f1':>6} {'sent to RF':>11} {'files/s':>10}")
+    for row in rows:
+        print(f"{row['mode']:<8} {row['accuracy']:>9.3f} {row['f1']:>6.3f} "
+              f"{row['forest_share']:>10.1%} {row['files_per_s']:>10.0f}")
+    print(f"Throughput gain: {rows[1]['files_per_s'] / rows[0]['files_per_s']:.1f}x")
+    return rows
+
+def load_cascade(model_dir=MODEL_DIR, band=DEFAULT_BAND):
+    linear = joblib.load(os.path.join(model_dir, LINEAR_MODEL_FILE))
+    forest = joblib.load(os.path.join(model_dir, FOREST_MODEL_FILE))
+    return CascadeModel(linear, forest, band)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate cascade scoring on models/test_data.pkl.")
+    parser.add_argument("--band", nargs=2, type=float, default=DEFAULT_BAND, metavar=("LOW", "HIGH"))
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args()
+
+    X_test, y_test = joblib.load(os.path.join(args.model_dir, "test_data.pkl"))
+    evaluate_cascade(load_cascade(args.model_dir, tuple(args.band)), X_test, y_test)
@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+MODEL_DIR = "models"
+
+# Flat node arrays shared by every tree (see flatten_forest)
+FOREST_ARRAYS = ["children_left", "children_right", "feature", "threshold", "value", "tree_offsets", "classes"]
+
+def flatten_forest(model):
+    """Concatenates every tree of a fitted RandomForest into flat node arrays."""
+    left, right, feature, threshold, value = [], [], [], [], []
+    offsets = [0]
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        base = offsets[-1]
+        # Children become global node ids; leaves keep -1
+        tree_left = tree.children_left.astype(np.int64)
+        tree_right = tree.children_right.astype(np.int64)
+        left.append(np.where(tree_left >= 0, tree_left + base, -1))
+        right.append(np.where(tree_right >= 0, tree_right + base, -1))
+        feature.append(tree.feature.astype(np.int32))
+        threshold.append(tree.threshold.astype(np.float64))
+        # Class distribution per node, normalised like DecisionTreeClassifier.predict_proba
+        counts = tree.value[:, 0, :]
+        totals = counts.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1.0
+        value.append(counts / totals)
+        offsets.append(base + tree.node_count)
+
+    return {
+        "children_left": np.concatenate(left),
+        "children_right": np.concatenate(right),
+        "feature": np.concatenate(feature),
+        "threshold": np.concatenate(threshold),
+        "value": np.ascontiguousarray(np.concatenate(value)),
+        "tree_offsets": np.array(offsets, dtype=np.int64),
+        "classes": np.asarray(model.classes_),
+    }
+
+class CompiledForest:
+    """
+    RandomForest inference on flat (optionally memory-mapped) node arrays.
+    All trees are walked together for the whole batch, one level per step:
+    every still-active (sample, tree) pair advances one node with a handful of
+    vectorised gathers, and pairs that reach a leaf drop out of the active set.
+    Results match RandomForestClassifier.predict_proba.
+    """
+    def __init__(self, arrays, n_features):
+        for name in FOREST_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.n_features_in_ = n_features
+        self.n_estimators = len(self.tree_offsets) - 1
+        self.roots = np.asarray(self.tree_offsets[:-1])
+        # sklearn's depth-first builder always stores the left child right after its
+        # parent, which saves one gather per level. Verify instead of assuming.
+        internal = np.nonzero(np.asarray(self.children_left) != -1)[0]
+        self.left_is_next = bool(np.all(self.children_left[internal] == internal + 1))
+
+    @classmethod
+    def from_model(cls, model):
+        return cls(flatten_forest(model), int(model.n_features_in_))
+
+    def apply(self, X):
+        """Returns the global leaf id reached in every tree, shape (n_samples, n_estimators)."""
+        # sklearn evaluates splits on float32 inputs; do the same to get identical leaves
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_samples, n_features = X.shape
+        flat_X = X.ravel()
+        leaves = np.empty(n_samples * self.n_estimators, dtype=np.int64)
+
+        # One entry per (sample, tree) pair still walking: its slot in `leaves`,
+        # the current node and the offset of its sample's row in flat_X
+        position = np.arange(leaves.size)
+        current = np.tile(self.roots, n_samples)
+        row_base = np.repeat(np.arange(n_samples, dtype=np.int64) * n_features, self.n_estimators)
+
+        while position.size:
+            # Pairs sitting on a leaf are done: record them and drop them
+            at_leaf = self.children_left[current] == -1
+            if at_leaf.any():
+                leaves[position[at_leaf]] = current[at_leaf]
+                walking = ~at_leaf
+                position, current, row_base = position[walking], current[walking], row_base[walking]
+                if not position.size:
+                    break
+            go_left = flat_X[row_base + self.feature[current]] <= self.threshold[current]
+            left = current + 1 if self.left_is_next else self.children_left[current]
+            current = np.where(go_left, left, self.children_right[current])
+        return leaves.reshape(n_samples, self.n_estimators)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        return self.value[leaves].mean(axis=1)
+
+    def predict(self, X):
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+def benchmark(model, batch_sizes=(1, 64, 4096), repeats=20, seed=0):
+    """Compares sklearn predict_proba with CompiledForest on random batches."""
+    compiled = CompiledForest.from_model(model)
+    rng = np.random.RandomState(seed)
+    rows = []
+    print(f"{'batch':>6} {'sklearn (ms)':>13} {'compiled (ms)':>14} {'speedup':>8} {'max |diff|':>11}")
+    for batch in batch_sizes:
+        X = rng.rand(batch, model.n_features_in_)
+        # Keep the sparse TF-IDF look: most columns zero
+        X[rng.rand(*X.shape) < 0.95] = 0.0
+        n = max(1, repeats if batch < 1000 else repeats // 4)
+
+        model.predict_proba(X)
+        start = time.perf_counter()
+        for _ in range(n):
+            expected = model.predict_proba(X)
+        sklearn_ms = (time.perf_counter() - start) / n * 1000
+
+        compiled.predict_proba(X)
+        start = time.perf_counter()
+        for _ in range(n):
+            got = compiled.predict_proba(X)
+        compiled_ms = (time.perf_counter() - start) / n * 1000
+
+        diff = float(np.abs(expected - got).max())
+        rows.append({"batch": batch, "sklearn_ms": sklearn_ms, "compiled_ms": compiled_ms, "max_diff": diff})
+        print(f"{batch:>6} {sklearn_ms:>13.3f} {compiled_ms:>14.3f} {sklearn_ms / compiled_ms:>7.1f}x {diff:>11.2e}")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the compiled forest against sklearn.")
+    parser.add_argument("--model", default=os.path.join(MODEL_DIR, "rf_model.pkl"))
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    import joblib
+    benchmark(joblib.load(args.model), repeats=args.repeats)
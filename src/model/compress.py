@@ -0,0 +1,239 @@
+import os
+import sys
+import copy
+import time
+import argparse
+import tempfile
+import joblib
+import numpy as np
+from scipy import sparse
+from sklearn.metrics import roc_auc_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.tree._tree import Tree, TREE_LEAF, TREE_UNDEFINED
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model.compiled_forest import CompiledForest, flatten_forest
+
+MODEL_DIR = "models"
+COMPRESSED_FILE = "rf_compressed.pkl"
+# Half of test_data.pkl picks the trees to keep, the other half scores the variants
+SELECTION_FRACTION = 0.5
+
+# Variants compared by --report: (name, trees kept, ccp_alpha, max_depth, float32)
+DEFAULT_VARIANTS = [
+    ("original", None, 0.0, None, False),
+    ("float32", None, 0.0, None, True),
+    ("trees=100", 100, 0.0, None, False),
+    ("trees=50", 50, 0.0, None, False),
+    ("trees=25", 25, 0.0, None, False),
+    ("ccp=1e-3", None, 1e-3, None, False),
+    ("depth=10", None, 0.0, 10, False),
+    ("trees=50+ccp=1e-3+f32", 50, 1e-3, None, True),
+]
+
+def split_holdout(X, y, fraction=SELECTION_FRACTION, random_state=42):
+    """Splits the held-out data into a tree-selection half and an evaluation half."""
+    return train_test_split(X, np.asarray(y), train_size=fraction, stratify=y, random_state=random_state)
+
+def rank_trees(model, X_val, y_val):
+    """
+    Orders the estimators from most to least useful by their own validation AUC;
+    ties go to the smaller tree.
+    """
+    positive = list(model.classes_).index(1) if 1 in model.classes_ else -1
+    scores = []
+    for i, estimator in enumerate(model.estimators_):
+        proba = estimator.predict_proba(X_val)[:, positive]
+        auc = roc_auc_score(y_val, proba) if len(np.unique(y_val)) > 1 else 0.0
+        scores.append((-auc, estimator.tree_.node_count, i))
+    return [i for _, _, i in sorted(scores)]
+
+def select_trees(model, X_val, y_val, n_keep):
+    """Copy of the forest with only its n_keep most useful estimators."""
+    keep = rank_trees(model, X_val, y_val)[:n_keep]
+    pruned = copy.copy(model)
+    pruned.estimators_ = [model.estimators_[i] for i in sorted(keep)]
+    pruned.n_estimators = len(pruned.estimators_)
+    return pruned
+
+def prune_tree(tree, ccp_alpha=0.0, max_depth=None):
+    """
+    Minimal cost-complexity subtree of a fitted sklearn Tree for ccp_alpha
+    (the same criterion as DecisionTreeClassifier(ccp_alpha=...), applied after
+    training), optionally cut at max_depth. Collapsed nodes become leaves with
+    the class distribution they already store. Returns a new compacted Tree.
+    """
+    state = tree.__getstate__()
+    nodes, values = state["nodes"], state["values"]
+    left, right = nodes["left_child"], nodes["right_child"]
+    n_nodes = len(nodes)
+
+    # Parents always precede their children in sklearn's node order
+    depth = np.zeros(n_nodes, dtype=np.int64)
+    for i in range(n_nodes):
+        if left[i] != TREE_LEAF:
+            depth[left[i]] = depth[right[i]] = depth[i] + 1
+
+    # Bottom-up: keep a split only if its subtree costs less than the node as a leaf
+    risk = nodes["weighted_n_node_samples"] / nodes["weighted_n_node_samples"][0] * nodes["impurity"]
+    best_cost = risk + ccp_alpha
+    collapse = np.zeros(n_nodes, dtype=bool)
+    for i in range(n_nodes - 1, -1, -1):
+        if left[i] == TREE_LEAF:
+            continue
+        subtree_cost = best_cost[left[i]] + best_cost[right[i]]
+        if (max_depth is not None and depth[i] >= max_depth) or risk[i] + ccp_alpha <= subtree_cost:
+            collapse[i] = True
+        else:
+            best_cost[i] = subtree_cost
+
+    # Renumber the kept nodes depth-first, left child right after its parent
+    order, stack = [], [0]
+    while stack:
+        i = stack.pop()
+        order.append(i)
+        if left[i] != TREE_LEAF and not collapse[i]:
+            stack.append(right[i])
+            stack.append(left[i])
+    order = np.array(order, dtype=np.int64)
+    new_id = np.full(n_nodes, TREE_LEAF, dtype=np.int64)
+    new_id[order] = np.arange(len(order))
+
+    kept = nodes[order].copy()
+    is_leaf = (kept["left_child"] == TREE_LEAF) | collapse[order]
+    kept["left_child"] = np.where(is_leaf, TREE_LEAF, new_id[kept["left_child"]])
+    kept["right_child"] = np.where(is_leaf, TREE_LEAF, new_id[kept["right_child"]])
+    kept["feature"][is_leaf] = TREE_UNDEFINED
+    kept["threshold"][is_leaf] = TREE_UNDEFINED
+
+    state = dict(state, nodes=kept, values=values[order].copy(), node_count=len(order),
+                 max_depth=int(depth[order].max()))
+    pruned = Tree(tree.n_features, tree.n_classes, tree.n_outputs)
+    pruned.__setstate__(state)
+    return pruned
+
+def prune_forest(model, ccp_alpha=0.0, max_depth=None):
+    """Copy of the forest with every tree pruned by prune_tree."""
+    pruned = copy.copy(model)
+    pruned.estimators_ = []
+    for estimator in model.estimators_:
+        estimator = copy.copy(estimator)
+        estimator.tree_ = prune_tree(estimator.tree_, ccp_alpha, max_depth)
+        pruned.estimators_.append(estimator)
+    return pruned
+
+def compact_forest(model):
+    """
+    CompiledForest with narrow dtypes: int32 children, int16/int32 features,
+    float32 leaf distributions and float32 thresholds. Thresholds are rounded
+    down to the nearest float32, which keeps every split exact because sklearn
+    compares float32 inputs (x <= t holds for a float32 x exactly when it holds
+    for t rounded down). Only the leaf probabilities lose precision (~1e-7).
+    """
+    arrays = flatten_forest(model)
+    threshold = arrays["threshold"].astype(np.float32)
+    above = threshold.astype(np.float64) > arrays["threshold"]
+    threshold[above] = np.nextafter(threshold[above], np.float32(-np.inf))
+    feature_dtype = np.int16 if model.n_features_in_ < np.iinfo(np.int16).max else np.int32
+    arrays.update({
+        "children_left": arrays["children_left"].astype(np.int32),
+        "children_right": arrays["children_right"].astype(np.int32),
+        "feature": arrays["feature"].astype(feature_dtype),
+        "threshold": threshold,
+        "value": arrays["value"].astype(np.float32),
+    })
+    return CompiledForest(arrays, int(model.n_features_in_))
+
+def compress_model(model, X_val=None, y_val=None, n_trees=None, ccp_alpha=0.0, max_depth=None, float32=False):
+    """Applies tree selection, pruning and float32 quantisation, in that order."""
+    if n_trees is not None and n_trees < len(model.estimators_):
+        if X_val is None:
+            raise ValueError("Dropping trees needs validation data to rank them.")
+        model = select_trees(model, X_val, y_val, n_trees)
+    if ccp_alpha > 0 or max_depth is not None:
+        model = prune_forest(model, ccp_alpha, max_depth)
+    return compact_forest(model) if float32 else model
+
+def count_nodes(model):
+    if isinstance(model, CompiledForest):
+        return len(model.children_left)
+    return sum(estimator.tree_.node_count for estimator in model.estimators_)
+
+def measure_variant(model, X_eval, y_eval, n_rows=200):
+    """Size on disk, joblib.load time, per-file latency, AUC and F1 of one model."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.pkl")
+        joblib.dump(model, path)
+        size_kb = os.path.getsize(path) / 1024
+        start = time.perf_counter()
+        joblib.load(path)
+        load_ms = (time.perf_counter() - start) * 1000
+
+    rows = [X_eval[i:i + 1] for i in range(min(n_rows, X_eval.shape[0]))]
+    model.predict_proba(rows[0])
+    start = time.perf_counter()
+    for row in rows:
+        model.predict_proba(row)
+    latency_ms = (time.perf_counter() - start) / len(rows) * 1000
+
+    classes = list(model.classes_) if hasattr(model, "classes_") else list(model.classes)
+    proba = model.predict_proba(X_eval)[:, classes.index(1)]
+    return {
+        "trees": len(model.roots) if isinstance(model, CompiledForest) else len(model.estimators_),
+        "nodes": count_nodes(model),
+        "size_kb": size_kb,
+        "load_ms": load_ms,
+        "latency_ms": latency_ms,
+        "auc": roc_auc_score(y_eval, proba),
+        "f1": f1_score(y_eval, (proba > 0.5).astype(int), zero_division=0)
+    }
+
+def compression_report(model, X_test, y_test, variants=DEFAULT_VARIANTS):
+    """
+    Builds every variant and prints size, load time, per-file latency and AUC/F1
+    on the evaluation half of the held-out data.
+    """
+    if sparse.issparse(X_test):
+        X_test = X_test.toarray()
+    X_val, X_eval, y_val, y_eval = split_holdout(X_test, y_test)
+    print(f"{len(y_val)} rows rank the trees, {len(y_eval)} rows score the variants")
+    print(f"{'variant':<24} {'trees':>5} {'nodes':>8} {'size (KB)':>10} {'load (ms)':>10} "
+          f"{'latency (ms)':>13} {'AUC':>6} {'F1':>6}")
+    rows = []
+    for name, n_trees, ccp_alpha, max_depth, float32 in variants:
+        if n_trees is not None and n_trees >= len(model.estimators_):
+            continue
+        variant = compress_model(model, X_val, y_val, n_trees, ccp_alpha, max_depth, float32)
+        row = dict(measure_variant(variant, X_eval, y_eval), variant=name)
+        rows.append(row)
+        print(f"{name:<24} {row['trees']:>5} {row['nodes']:>8} {row['size_kb']:>10.1f} {row['load_ms']:>10.1f} "
+              f"{row['latency_ms']:>13.3f} {row['auc']:>6.3f} {row['f1']:>6.3f}")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress a trained RandomForest and report the trade-offs.")
+    parser.add_argument("--model", default=os.path.join(MODEL_DIR, "rf_model.pkl"))
+    parser.add_argument("--test-data", default=os.path.join(MODEL_DIR, "test_data.pkl"))
+    parser.add_argument("--report", action="store_true", help="Compare the default variants instead of writing one")
+    parser.add_argument("--trees", type=int, help="Keep only the N most useful trees")
+    parser.add_argument("--ccp-alpha", type=float, default=0.0, help="Cost-complexity pruning strength")
+    parser.add_argument("--max-depth", type=int, help="Collapse every node below this depth")
+    parser.add_argument("--float32", action="store_true",
+                        help="Write a CompiledForest with float32 thresholds/leaves instead of a sklearn model")
+    parser.add_argument("--output", default=os.path.join(MODEL_DIR, COMPRESSED_FILE))
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    X_test, y_test = joblib.load(args.test_data)
+    if args.report:
+        compression_report(model, X_test, y_test)
+    else:
+        X_test = X_test.toarray() if sparse.issparse(X_test) else X_test
+        X_val, X_eval, y_val, y_eval = split_holdout(X_test, y_test)
+        compressed = compress_model(model, X_val, y_val, args.trees, args.ccp_alpha, args.max_depth, args.float32)
+        joblib.dump(compressed, args.output)
+        row = measure_variant(compressed, X_eval, y_eval)
+        print(f"✅ Compressed model saved to {args.output}: {row['trees']} trees, {row['nodes']} nodes, "
+              f"{row['size_kb']:.1f} KB, AUC {row['auc']:.3f}, F1 {row['f1']:.3f}")
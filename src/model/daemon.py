@@ -0,0 +1,195 @@
+import io
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+from contextlib import redirect_stdout, redirect_stderr
+
+try:
+    import fcntl
+except ImportError: # Windows: no advisory locks, a live socket is told apart by pinging it
+    fcntl = None
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model.predict import (build_parser, load_model, prepare_scanner, run_scan, predict_content,
+                           MODEL_DIR, PIPELINE_FILE, ACTIVE_FILE)
+from model.bundle import BUNDLE_FILE
+from modify.rules import WARMUP_SNIPPET
+from model.scan_client import default_socket_path, send_request, make_socket_dir, check_owner, CONNECT_TIMEOUT
+
+# An auto-started daemon exits after this long without requests
+IDLE_TIMEOUT = 30 * 60
+# Files whose change makes the daemon reload the model before the next scan
+WATCHED_FILES = (ACTIVE_FILE, PIPELINE_FILE, BUNDLE_FILE, "rf_model.pkl", "tfidf_vectorizer.pkl", "linear_model.pkl")
+
+class ScanDaemon:
+    """
+    Keeps the model, vectorizer and compiled rules loaded and serves scans over a
+    Unix domain socket, one JSON line per request and reply. Requests are handled
+    one at a time, in the client's working directory, and the reply carries the
+    exact stdout/stderr predict.py would have printed.
+    """
+    def __init__(self, socket_path, model_dir=MODEL_DIR, idle_timeout=IDLE_TIMEOUT, loader=load_model):
+        self.socket_path = socket_path
+        self.model_dir = os.path.abspath(model_dir)
+        self.idle_timeout = idle_timeout
+        self.loader = loader
+        self._base = None
+        self._base_mtimes = None
+        self._load_messages = ""
+        self._prepared = {}
+        self._lock_handle = None
+        self.running = False
+
+    def _artifact_mtimes(self):
+        mtimes = []
+        for name in WATCHED_FILES:
+            try:
+                mtimes.append(os.path.getmtime(os.path.join(self.model_dir, name)))
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def scanner(self, args):
+        """(model, vectorizer, scan_content) for these options, reloaded when the artifacts change."""
+        mtimes = self._artifact_mtimes()
+        if self._base is None or mtimes != self._base_mtimes:
+            # Kept so every reply carries the "Using ... model" line an in-process scan prints
+            messages = io.StringIO()
+            with redirect_stderr(messages):
+                self._base = self.loader(self.model_dir)
+            self._load_messages = messages.getvalue()
+            self._base_mtimes = mtimes
+            self._prepared = {}
+        key = (args.engine, args.cascade, tuple(args.band or ()))
+        if key not in self._prepared:
+            model, vectorizer = self._base
+            model, scan_content = prepare_scanner(args, model, vectorizer, self.model_dir)
+            self._prepared[key] = (model, vectorizer, scan_content)
+        return self._prepared[key]
+
+    def warm_up(self):
+        model, vectorizer, scan_content = self.scanner(build_parser().parse_args(["-"]))
+        scan_content(WARMUP_SNIPPET, model, vectorizer)
+
+    def handle(self, request):
+        command = request.get("command", "scan")
+        if command == "ping":
+            return {"pong": True, "pid": os.getpid()}
+        if command == "shutdown":
+            self.running = False
+            return {"stopped": True}
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        exit_code = 0
+        previous_cwd = os.getcwd()
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                args = build_parser().parse_args(request.get("argv", []))
+                model, vectorizer, scan_content = self.scanner(args)
+                sys.stderr.write(self._load_messages)
+                # Relative paths and scan_report.json resolve like they would for the client
+                os.chdir(request.get("cwd") or previous_cwd)
+                run_scan(args, model, vectorizer, scan_content, request.get("content"))
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else 1
+            except Exception as e:
+                print(f"❌ Scan failed: {e}", file=sys.stderr)
+                exit_code = 1
+            finally:
+                os.chdir(previous_cwd)
+        return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "exit_code": exit_code}
+
+    def _bind(self):
+        """
+        Listens on socket_path, or returns None if another daemon owns it. The
+        owner holds an exclusive lock on socket_path + ".lock" for its whole life,
+        so a daemon still warming up (too busy to answer a ping) keeps its socket.
+        Raises PermissionError for a socket or directory of another user.
+        """
+        make_socket_dir(self.socket_path)
+        if fcntl is not None:
+            handle = open(self.socket_path + ".lock", "a")
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                return None # Another daemon already serves this socket
+            if os.path.lexists(self.socket_path):
+                try:
+                    check_owner(self.socket_path)
+                except PermissionError:
+                    handle.close()
+                    raise
+                os.unlink(self.socket_path) # Stale socket of a daemon that died
+            self._lock_handle = handle
+        elif os.path.exists(self.socket_path):
+            try:
+                send_request({"command": "ping"}, self.socket_path, timeout=CONNECT_TIMEOUT)
+                return None
+            except (OSError, ValueError):
+                os.unlink(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        server.listen(16)
+        server.settimeout(self.idle_timeout)
+        return server
+
+    def serve_forever(self):
+        try:
+            server = self._bind()
+        except PermissionError as e:
+            print(f"❌ Not serving on {self.socket_path}: {e}")
+            return
+        if server is None:
+            print(f"Scan daemon already running on {self.socket_path}")
+            return
+        start = time.perf_counter()
+        try:
+            self.warm_up()
+        except SystemExit:
+            pass # No model yet: every scan reports it until one is trained
+        print(f"✅ Scan daemon ready on {self.socket_path} ({time.perf_counter() - start:.2f}s warm-up)")
+        self.running = True
+        try:
+            while self.running:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    print("Idle timeout reached, exiting.")
+                    break
+                with conn:
+                    conn.settimeout(None)
+                    try:
+                        with conn.makefile("rb") as reader:
+                            request = json.loads(reader.readline() or b"{}")
+                        reply = self.handle(request)
+                        conn.sendall(json.dumps(reply).encode("utf-8") + b"\n")
+                    except (OSError, ValueError) as e:
+                        print(f"⚠️  Bad request: {e}")
+        finally:
+            self._unbind(server)
+
+    def _unbind(self, server):
+        server.close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+        # Released last: the next daemon only binds once this socket is gone
+        if self._lock_handle is not None:
+            self._lock_handle.close()
+            self._lock_handle = None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep the scanner warm behind a Unix domain socket.")
+    parser.add_argument("--model-dir", default=MODEL_DIR)
+    parser.add_argument("--socket", help="Socket path (default: per user and model directory)")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT)
+    args = parser.parse_args()
+    ScanDaemon(args.socket or default_socket_path(args.model_dir), args.model_dir, args.idle_timeout).serve_forever()
@@ -1,11 +1,17 @@
 import joblib
 import os
+import sys
 import matplotlib.pyplot as plt
 import seaborn as sns
 from sklearn.metrics import classification_report, confusion_matrix, roc_auc_score, roc_curve
 
+# LinearScorer pickles reference model.linear_model
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 MODEL_DIR = "models"
 OUTPUT_DIR = "reports/figures"
+# linear_model.pkl is the calibrated LinearScorer; svm_model.pkl comes from --linear svc
+MODEL_FILES = {"Random Forest": "rf_model.pkl", "Linear Model": "linear_model.pkl", "SVM": "svm_model.pkl"}
 
 def evaluate_models():
     """Evaluates trained models."""
@@ -14,10 +20,13 @@ def evaluate_models():
         return
 
     X_test_vec, y_test = joblib.load(os.path.join(MODEL_DIR, "test_data.pkl"))
-    rf_model = joblib.load(os.path.join(MODEL_DIR, "rf_model.pkl"))
-    svm_model = joblib.load(os.path.join(MODEL_DIR, "svm_model.pkl"))
-    
-    models = {"Random Forest": rf_model, "SVM": svm_model}
+    models = {}
+    for name, filename in MODEL_FILES.items():
+        path = os.path.join(MODEL_DIR, filename)
+        if os.path.exists(path):
+            models[name] = joblib.load(path)
+        else:
+            print(f"{filename} not found, skipping {name}.")
     
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
@@ -0,0 +1,342 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from collections import Counter
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.sparse import hstack as sparse_hstack
+from sklearn.metrics import accuracy_score
+from sklearn.tree._tree import Tree
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modify.feature_pipeline import add_snippet_features, TEXT_COLUMN, NUMERIC_COLUMNS
+from model.registry import compute_model_version, MODEL_FILE, VECTORIZER_FILE
+from model.shared_model import export_vectorizer, rebuild_vectorizer, export_shared_model
+from model.bundle import write_bundle, BUNDLE_FILE
+from model.linear_model import LinearScorer, LINEAR_MODEL_FILE
+from model.predict import set_active_artifact
+from sample.dataset_store import read_dataset
+
+MODEL_DIR = "models"
+VERSIONS_SUBDIR = "versions"
+HOLDOUT_FILE = "holdout.pkl"
+METADATA_FILE = "metadata.json"
+PROMOTED_FILE = "PROMOTED"
+
+VOCAB_POLICIES = ("freeze", "extend")
+# Above this share of unknown tokens a frozen vocabulary no longer describes the data
+MAX_OOV_RATE = 0.25
+MAX_NEW_TERMS = 200
+TREES_PER_UPDATE = 50
+# Promotion allows at most this drop in holdout accuracy
+MAX_ACCURACY_DROP = 0.01
+HOLDOUT_FRACTION = 0.2
+# A holdout carved from a slice needs at least this many rows to judge promotions
+MIN_HOLDOUT_ROWS = 30
+TRAINING_SPLIT = "training split"
+
+class VocabularyDriftError(ValueError):
+    """The new batch is too far from the fitted vocabulary for an incremental update."""
+
+def code_hash(code):
+    return hashlib.sha1(str(code).encode("utf-8", errors="ignore")).hexdigest()
+
+def oov_terms(vectorizer, texts):
+    """Returns (share of tokens outside the vocabulary, document frequency of each unknown term)."""
+    analyze = vectorizer.build_analyzer()
+    total = unknown = 0
+    doc_freq = Counter()
+    for text in texts:
+        tokens = analyze(text)
+        total += len(tokens)
+        missing = [t for t in tokens if t not in vectorizer.vocabulary_]
+        unknown += len(missing)
+        doc_freq.update(set(missing))
+    return (unknown / total if total else 0.0), doc_freq
+
+def extend_vocabulary(vectorizer, texts, doc_freq, max_new_terms=MAX_NEW_TERMS, min_df=2):
+    """
+    Appends the most frequent unknown terms (seen in at least `min_df` documents)
+    after the existing vocabulary. Existing columns and idf weights stay as they
+    are; new terms get the smooth idf of the batch they came from.
+    Returns (new vectorizer, list of added terms).
+    """
+    new_terms = [t for t, df in doc_freq.most_common() if df >= min_df][:max_new_terms]
+    if not new_terms:
+        return vectorizer, []
+    arrays, params = export_vectorizer(vectorizer)
+    n_docs = len(texts)
+    new_idf = [np.log((1 + n_docs) / (1 + doc_freq[t])) + 1.0 for t in new_terms]
+    arrays = {
+        "vocabulary": np.concatenate([arrays["vocabulary"], np.array(new_terms)]),
+        "idf": np.concatenate([arrays["idf"], new_idf])
+    }
+    return rebuild_vectorizer(arrays, params), new_terms
+
+def shift_numeric_features(forest, n_tfidf, n_new):
+    """
+    Makes a fitted forest accept `n_new` extra TF-IDF columns inserted before the
+    numeric features: splits on the numeric columns move n_new positions right.
+    """
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        state = tree.__getstate__()
+        nodes = state["nodes"].copy()
+        # Leaves use a negative feature id and are left alone
+        nodes["feature"][nodes["feature"] >= n_tfidf] += n_new
+        state["nodes"] = nodes
+        # Tree.n_features is fixed at construction, so rebuild the tree around the shifted nodes
+        widened = Tree(tree.n_features + n_new, tree.n_classes, tree.n_outputs)
+        widened.__setstate__(state)
+        estimator.tree_ = widened
+        estimator.n_features_in_ += n_new
+    forest.n_features_in_ += n_new
+
+def widen_linear(scorer, n_tfidf, n_new):
+    """Inserts zero weights for new TF-IDF columns into a LinearScorer."""
+    coef = np.insert(scorer.coef, n_tfidf, np.zeros(n_new))
+    scale = np.insert(scorer.scale, n_tfidf, np.ones(n_new))
+    return LinearScorer(coef, scorer.intercept, scorer.classes_, kind=scorer.kind, scale=scale, n_seen=scorer.n_seen)
+
+def featurise_frame(df, vectorizer):
+    """Feature matrix (sparse) for a DataFrame with a 'code' column."""
+    df = add_snippet_features(df)
+    return sparse_hstack((vectorizer.transform(df[TEXT_COLUMN]), df[NUMERIC_COLUMNS].values.astype(float)), format='csr')
+
+def save_holdout(code, labels, model_dir=MODEL_DIR, source=TRAINING_SPLIT):
+    """Stores the fixed holdout (raw code and labels) together with the split it came from."""
+    holdout = pd.DataFrame({"code": list(code), "is_vulnerable": list(labels)})
+    joblib.dump({"source": source, "rows": holdout}, os.path.join(model_dir, HOLDOUT_FILE))
+    return holdout
+
+def load_holdout(model_dir=MODEL_DIR):
+    """Returns (holdout, source), or (None, None) if there is none yet."""
+    path = os.path.join(model_dir, HOLDOUT_FILE)
+    if not os.path.exists(path):
+        return None, None
+    stored = joblib.load(path)
+    if isinstance(stored, pd.DataFrame):
+        # Holdouts written before the source was recorded
+        return stored, None
+    return stored["rows"], stored["source"]
+
+def ensure_holdout(batch, slice_name, model_dir=MODEL_DIR, fraction=HOLDOUT_FRACTION, min_rows=MIN_HOLDOUT_ROWS):
+    """
+    Returns (holdout, source, batch without holdout rows). The holdout is fixed:
+    train_model.py stores the test split of the original training data. Models
+    trained without it get one carved out of the first slice, if that slice is
+    big enough to give min_rows holdout rows.
+    """
+    holdout, source = load_holdout(model_dir)
+    if holdout is None:
+        holdout = batch.sample(frac=fraction, random_state=42)[["code", "is_vulnerable"]]
+        if len(holdout) < min_rows:
+            raise ValueError(f"No holdout in {model_dir} and slice '{slice_name}' only gives {len(holdout)} "
+                             f"holdout rows (minimum {min_rows}); retrain with train_model.py to store one.")
+        source = slice_name
+        holdout = save_holdout(holdout["code"], holdout["is_vulnerable"], model_dir, source)
+        print(f"⚠️  Created fixed holdout with {len(holdout)} samples from slice '{slice_name}' "
+              f"in {os.path.join(model_dir, HOLDOUT_FILE)}")
+    held = set(holdout["code"].map(code_hash))
+    return holdout, source, batch[~batch["code"].map(code_hash).isin(held)]
+
+def read_metadata(model_dir, version):
+    path = os.path.join(model_dir, VERSIONS_SUBDIR, version, METADATA_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+def seen_sources(metadata):
+    return {s["name"] for s in (metadata or {}).get("slices", [])}
+
+def slice_info(name, batch):
+    digest = hashlib.sha256()
+    for h in sorted(batch["code"].map(code_hash)):
+        digest.update(h.encode())
+    return {
+        "name": name,
+        "rows": int(len(batch)),
+        "vulnerable": int(batch["is_vulnerable"].sum()),
+        "content_sha256": digest.hexdigest()[:16],
+        "added_at": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def promote(model_dir, version):
+    """Publishes a stored version as the served artifacts under models/."""
+    version_dir = os.path.join(model_dir, VERSIONS_SUBDIR, version)
+    for name in (VECTORIZER_FILE, LINEAR_MODEL_FILE, MODEL_FILE):
+        src = os.path.join(version_dir, name)
+        if os.path.exists(src):
+            # Copy then rename: the API's file watcher never sees a half-written pickle
+            tmp = os.path.join(model_dir, f".tmp_{name}")
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, os.path.join(model_dir, name))
+    forest = joblib.load(os.path.join(version_dir, MODEL_FILE))
+    vectorizer = joblib.load(os.path.join(version_dir, VECTORIZER_FILE))
+    export_shared_model(forest, vectorizer, os.path.join(model_dir, "shared"), version=version)
+    metadata = read_metadata(model_dir, version) or {}
+    write_bundle(forest, vectorizer, os.path.join(model_dir, BUNDLE_FILE), version=version, source_version=version,
+                 metadata={"parent": metadata.get("parent"), "slices": [s["name"] for s in metadata.get("slices", [])]})
+    set_active_artifact("bundle", model_dir)
+    with open(os.path.join(model_dir, VERSIONS_SUBDIR, PROMOTED_FILE), "w") as f:
+        f.write(version)
+
+def update_models(batch, slice_name, model_dir=MODEL_DIR, vocab_policy="freeze", trees=TREES_PER_UPDATE,
+                  max_oov_rate=MAX_OOV_RATE, max_new_terms=MAX_NEW_TERMS,
+                  max_accuracy_drop=MAX_ACCURACY_DROP, auto_promote=True):
+    """
+    Grows the served models with one new data slice instead of retraining:
+    - RandomForest: warm_start adds `trees` new trees fitted on the slice,
+    - linear model (if present): one partial_fit pass, kept only if its own
+      holdout accuracy passes the same check (else the parent's weights stay),
+    - vocabulary: "freeze" keeps the fitted TF-IDF vocabulary and refuses the
+      update when the slice's out-of-vocabulary rate exceeds max_oov_rate;
+      "extend" appends up to max_new_terms new terms instead.
+    The result is stored as models/versions/<version>/ with metadata about every
+    slice it has seen, and is promoted only if the forest's accuracy on the
+    fixed holdout does not drop by more than max_accuracy_drop. The slice must
+    contain every class the forest knows.
+    """
+    if vocab_policy not in VOCAB_POLICIES:
+        raise ValueError(f"Unknown vocabulary policy '{vocab_policy}'. Choose from {VOCAB_POLICIES}.")
+    start = time.perf_counter()
+    model_path = os.path.join(model_dir, MODEL_FILE)
+    vectorizer_path = os.path.join(model_dir, VECTORIZER_FILE)
+    linear_path = os.path.join(model_dir, LINEAR_MODEL_FILE)
+
+    parent = compute_model_version(model_path, vectorizer_path)
+    parent_meta = read_metadata(model_dir, parent)
+    forest = joblib.load(model_path)
+    vectorizer = joblib.load(vectorizer_path)
+    linear = joblib.load(linear_path) if os.path.exists(linear_path) else None
+    base_forest, base_vectorizer = joblib.load(model_path), vectorizer
+
+    holdout, holdout_source, batch = ensure_holdout(batch, slice_name, model_dir)
+    if batch.empty:
+        raise ValueError("The new slice has no rows outside the holdout.")
+
+    # 1. Vocabulary policy
+    batch_text = add_snippet_features(batch)[TEXT_COLUMN].tolist()
+    oov_rate, doc_freq = oov_terms(vectorizer, batch_text)
+    print(f"Slice '{slice_name}': {len(batch)} rows, out-of-vocabulary rate {oov_rate:.1%}")
+    new_terms = []
+    if vocab_policy == "freeze" and oov_rate > max_oov_rate:
+        raise VocabularyDriftError(
+            f"OOV rate {oov_rate:.1%} exceeds {max_oov_rate:.0%}; use vocab_policy='extend' or retrain from scratch."
+        )
+    if vocab_policy == "extend":
+        n_tfidf = len(vectorizer.vocabulary_)
+        vectorizer, new_terms = extend_vocabulary(vectorizer, batch_text, doc_freq, max_new_terms)
+        if new_terms:
+            shift_numeric_features(forest, n_tfidf, len(new_terms))
+            if linear is not None:
+                linear = widen_linear(linear, n_tfidf, len(new_terms))
+            print(f"Vocabulary extended with {len(new_terms)} terms")
+
+    # 2. Grow the models on the slice only
+    X_batch = featurise_frame(batch, vectorizer)
+    y_batch = batch["is_vulnerable"].values
+    # warm_start refits classes_ from the slice: trees fitted on fewer classes can't join the forest
+    missing = set(forest.classes_) - set(np.unique(y_batch))
+    if missing:
+        raise ValueError(f"Slice '{slice_name}' has no rows of class {sorted(missing)}; "
+                         f"incremental updates need every class the model knows ({list(forest.classes_)}).")
+    # Widened parent (zero weights on new terms): scores exactly like the parent
+    parent_linear = linear
+    forest.set_params(warm_start=True, n_estimators=len(forest.estimators_) + trees)
+    forest.fit(X_batch.toarray(), y_batch)
+    forest.set_params(warm_start=False)
+    if linear is not None:
+        linear = linear.partial_fit(X_batch, y_batch)
+
+    # 3. Holdout check against the parent
+    y_holdout = holdout["is_vulnerable"].values
+    base_accuracy = accuracy_score(y_holdout, base_forest.predict(featurise_frame(holdout, base_vectorizer).toarray()))
+    X_holdout = featurise_frame(holdout, vectorizer)
+    accuracy = accuracy_score(y_holdout, forest.predict(X_holdout.toarray()))
+    promoted = auto_promote and accuracy >= base_accuracy - max_accuracy_drop
+    linear_check = None
+    if linear is not None:
+        # The linear model feeds the cascade: its update has to pass the same check, or the parent's is kept
+        linear_check = {
+            "accuracy": accuracy_score(y_holdout, linear.predict(X_holdout)),
+            "parent_accuracy": accuracy_score(y_holdout, parent_linear.predict(X_holdout))
+        }
+        linear_check["updated"] = linear_check["accuracy"] >= linear_check["parent_accuracy"] - max_accuracy_drop
+        if not linear_check["updated"]:
+            linear = parent_linear
+            print(f"⚠️  Linear model update rejected (holdout accuracy {linear_check['accuracy']:.4f}, "
+                  f"parent {linear_check['parent_accuracy']:.4f}); keeping the parent's weights")
+
+    # 4. Store the version
+    staging = tempfile.mkdtemp(prefix=".staging_", dir=model_dir)
+    joblib.dump(forest, os.path.join(staging, MODEL_FILE))
+    joblib.dump(vectorizer, os.path.join(staging, VECTORIZER_FILE))
+    if linear is not None:
+        joblib.dump(linear, os.path.join(staging, LINEAR_MODEL_FILE))
+    version = compute_model_version(os.path.join(staging, MODEL_FILE), os.path.join(staging, VECTORIZER_FILE))
+    metadata = {
+        "version": version,
+        "parent": parent,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "slices": (parent_meta or {}).get("slices", [{"name": "base", "rows": None}]) + [slice_info(slice_name, batch)],
+        "n_estimators": len(forest.estimators_),
+        "vocabulary_size": len(vectorizer.vocabulary_),
+        "vocab_policy": vocab_policy,
+        "oov_rate": oov_rate,
+        "new_terms": new_terms,
+        "holdout": {"rows": int(len(holdout)), "source": holdout_source, "accuracy": accuracy, "parent_accuracy": base_accuracy},
+        "linear": linear_check,
+        "promoted": promoted,
+        "update_seconds": round(time.perf_counter() - start, 2)
+    }
+    with open(os.path.join(staging, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=4)
+    version_dir = os.path.join(model_dir, VERSIONS_SUBDIR, version)
+    os.makedirs(os.path.dirname(version_dir), exist_ok=True)
+    shutil.rmtree(version_dir, ignore_errors=True)
+    os.replace(staging, version_dir)
+
+    print(f"Holdout accuracy: {accuracy:.4f} (parent {parent}: {base_accuracy:.4f})")
+    if promoted:
+        promote(model_dir, version)
+        print(f"✅ Version {version} promoted ({metadata['update_seconds']}s)")
+    else:
+        print(f"⚠️  Version {version} stored in {version_dir} but not promoted.")
+    return metadata
+
+def new_slices(df, model_dir=MODEL_DIR):
+    """Groups the rows of mined data by 'source' and keeps repositories the served model has not seen."""
+    parent = compute_model_version(os.path.join(model_dir, MODEL_FILE), os.path.join(model_dir, VECTORIZER_FILE))
+    seen = seen_sources(read_metadata(model_dir, parent))
+    return [(name, group) for name, group in df.groupby("source", observed=True) if name not in seen]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally update the served models with new mined data.")
+    parser.add_argument("--data", default="data/mined_dataset.parquet",
+                        help="Parquet or CSV with code/is_vulnerable (and 'source' to pick unseen repositories)")
+    parser.add_argument("--name", help="Slice name when the dataset has no 'source' column")
+    parser.add_argument("--vocab-policy", choices=VOCAB_POLICIES, default="freeze")
+    parser.add_argument("--trees", type=int, default=TREES_PER_UPDATE)
+    parser.add_argument("--no-promote", action="store_true")
+    args = parser.parse_args()
+
+    df = read_dataset(args.data)
+    if "source" in df.columns and not args.name:
+        slices = new_slices(df)
+    else:
+        slices = [(args.name or os.path.basename(args.data), df)]
+    if not slices:
+        print("No new data slices.")
+    for name, batch in slices:
+        update_models(batch, name, vocab_policy=args.vocab_policy, trees=args.trees,
+                      auto_promote=not args.no_promote)
@@ -0,0 +1,205 @@
+import os
+import sys
+import time
+import pickle
+import argparse
+import joblib
+import numpy as np
+from scipy import sparse
+from scipy.special import expit
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.svm import SVC
+from sklearn.metrics import accuracy_score, f1_score, brier_score_loss
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+MODEL_DIR = "models"
+LINEAR_MODEL_FILE = "linear_model.pkl"
+
+# Complexity + AST Depth + Dangerous Calls follow the TF-IDF columns
+NUM_EXTRA_FEATURES = 3
+LINEAR_KINDS = ("logreg", "sgd")
+# libsvm is super-linear in the sample count; the comparison skips SVC above this
+SVC_MAX_SAMPLES = 20000
+
+class LinearScorer:
+    """
+    A fitted binary linear model reduced to one coefficient vector and an intercept:
+        P(vulnerable) = sigmoid(x . coef + intercept)
+    Feature scaling and sigmoid calibration are folded into coef/intercept at fit
+    time, so scoring a file is a single dot product over the non-zeros of its
+    sparse TF-IDF row plus the three numeric features.
+    """
+    # predict_content keeps the TF-IDF row sparse for models that set this
+    accepts_sparse = True
+
+    def __init__(self, coef, intercept, classes, kind="linear", scale=None, n_seen=0):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.classes_ = np.asarray(classes)
+        self.kind = kind
+        self.n_features_in_ = len(self.coef)
+        # Training-time feature scale and sample count, kept for partial_fit
+        self.scale = np.ones(self.n_features_in_) if scale is None else np.asarray(scale, dtype=np.float64)
+        self.n_seen = n_seen
+
+    def __setstate__(self, state):
+        # Scorers pickled before partial_fit existed have no scale/n_seen
+        state.setdefault("scale", np.ones(state["n_features_in_"]))
+        state.setdefault("n_seen", 0)
+        self.__dict__.update(state)
+
+    def decision_function(self, X):
+        if sparse.issparse(X):
+            return np.asarray(X @ self.coef).ravel() + self.intercept
+        return np.asarray(X, dtype=np.float64) @ self.coef + self.intercept
+
+    def predict_proba(self, X):
+        p = expit(self.decision_function(X))
+        return np.column_stack((1.0 - p, p))
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
+
+    def partial_fit(self, X, y, alpha=1e-4):
+        """
+        One SGD log-loss pass over a new batch, starting from the current
+        coefficients (in the original scaled space) and continuing the learning
+        rate schedule after the n_seen samples already used. Returns a new
+        LinearScorer and leaves this one untouched.
+        """
+        sgd = SGDClassifier(loss='log_loss', alpha=alpha, random_state=42)
+        sgd.coef_ = (self.coef * self.scale).reshape(1, -1)
+        sgd.intercept_ = np.array([self.intercept])
+        sgd.classes_ = self.classes_
+        sgd.t_ = float(max(1, self.n_seen))
+        sgd.partial_fit(_apply_scale(X, self.scale), y)
+        return LinearScorer(sgd.coef_[0] / self.scale, sgd.intercept_[0], self.classes_, kind=self.kind,
+                            scale=self.scale, n_seen=self.n_seen + X.shape[0])
+
+def _extra_scale(X):
+    """Max-abs scale for the numeric columns; TF-IDF columns are already l2-normalised."""
+    n_features = X.shape[1]
+    scale = np.ones(n_features)
+    extras = X[:, n_features - NUM_EXTRA_FEATURES:]
+    extras = extras.toarray() if sparse.issparse(extras) else np.asarray(extras, dtype=np.float64)
+    col_max = np.abs(extras).max(axis=0) if len(extras) else np.ones(NUM_EXTRA_FEATURES)
+    col_max[col_max == 0] = 1.0
+    scale[n_features - NUM_EXTRA_FEATURES:] = col_max
+    return scale
+
+def _apply_scale(X, scale):
+    if sparse.issparse(X):
+        return sparse.csr_matrix(X @ sparse.diags(1.0 / scale))
+    return np.asarray(X, dtype=np.float64) / scale
+
+def fit_linear_model(X_train, y_train, kind="logreg", random_state=42):
+    """
+    Trains a calibrated linear classifier on (sparse or dense) features and returns
+    it as a LinearScorer.
+    - logreg: liblinear logistic regression,
+    - sgd: SGD on log-loss (one pass per epoch, for very large datasets).
+    Both use balanced class weights, which shift the raw probabilities towards
+    the minority class, so both are followed by Platt scaling on held-out
+    folds. The sigmoid is linear in the logit, so it is folded into the
+    coefficients.
+    """
+    if kind not in LINEAR_KINDS:
+        raise ValueError(f"Unknown linear model '{kind}'. Choose from {LINEAR_KINDS}.")
+    scale = _extra_scale(X_train)
+    X_scaled = _apply_scale(X_train, scale)
+
+    if kind == "logreg":
+        base = LogisticRegression(solver='liblinear', C=1.0, class_weight='balanced', random_state=random_state)
+    else:
+        base = SGDClassifier(loss='log_loss', alpha=1e-4, class_weight='balanced', random_state=random_state)
+    # ensemble=False: one refit on all data plus one sigmoid fitted on CV predictions
+    calibrated = CalibratedClassifierCV(base, method='sigmoid', cv=3, ensemble=False)
+    calibrated.fit(X_scaled, y_train)
+    fitted = calibrated.calibrated_classifiers_[0]
+    base, sigmoid = fitted.estimator, fitted.calibrators[0]
+    # sklearn's sigmoid calibration is p = 1 / (1 + exp(a * f + b))
+    coef = -sigmoid.a_ * base.coef_[0]
+    intercept = -(sigmoid.a_ * base.intercept_[0] + sigmoid.b_)
+
+    return LinearScorer(coef / scale, intercept, calibrated.classes_, kind=kind, scale=scale, n_seen=X_train.shape[0])
+
+def expected_calibration_error(y_true, prob, bins=10):
+    """Mean |accuracy - confidence| over equal-width probability bins, weighted by bin size."""
+    y_true, prob = np.asarray(y_true), np.asarray(prob)
+    which = np.minimum((prob * bins).astype(int), bins - 1)
+    error = 0.0
+    for b in np.unique(which):
+        in_bin = which == b
+        error += in_bin.mean() * abs(y_true[in_bin].mean() - prob[in_bin].mean())
+    return error
+
+def _single_row_latency_ms(model, X, n_rows=200):
+    """Mean time to score one file (one predict_proba call per row)."""
+    rows = [X[i:i + 1] for i in range(min(n_rows, X.shape[0]))]
+    model.predict_proba(rows[0])
+    start = time.perf_counter()
+    for row in rows:
+        model.predict_proba(row)
+    return (time.perf_counter() - start) / len(rows) * 1000
+
+def compare_linear_models(X_train, y_train, X_test, y_test, kinds=("svc",) + LINEAR_KINDS):
+    """
+    Side-by-side accuracy, F1, calibration (Brier score and expected
+    calibration error of P(vulnerable)), training time, single-file inference
+    latency and artifact size of the linear SVC and the linear-model options.
+    Expects sparse feature matrices (extract_features(..., sparse=True)).
+    """
+    rows = []
+    print(f"{'model':<8} {'accuracy':>9} {'f1':>6} {'brier':>7} {'ece':>6} {'train (s)':>10} {'latency (ms)':>13} {'size (KB)':>10}")
+    for kind in kinds:
+        if kind == "svc" and X_train.shape[0] > SVC_MAX_SAMPLES:
+            print(f"{kind:<8} skipped: {X_train.shape[0]} samples > SVC_MAX_SAMPLES ({SVC_MAX_SAMPLES})")
+            continue
+        start = time.perf_counter()
+        if kind == "svc":
+            model = SVC(kernel='linear', probability=True, random_state=42, class_weight='balanced')
+            model.fit(X_train, y_train)
+        else:
+            model = fit_linear_model(X_train, y_train, kind)
+        train_s = time.perf_counter() - start
+
+        y_pred = model.predict(X_test)
+        prob = model.predict_proba(X_test)[:, 1]
+        row = {
+            "model": kind,
+            "accuracy": accuracy_score(y_test, y_pred),
+            "f1": f1_score(y_test, y_pred, zero_division=0),
+            "brier": brier_score_loss(y_test, prob),
+            "ece": expected_calibration_error(y_test, prob),
+            "train_s": train_s,
+            "latency_ms": _single_row_latency_ms(model, X_test),
+            "size_kb": len(pickle.dumps(model)) / 1024
+        }
+        rows.append(row)
+        print(f"{kind:<8} {row['accuracy']:>9.3f} {row['f1']:>6.3f} {row['brier']:>7.3f} {row['ece']:>6.3f} {train_s:>10.3f} "
+              f"{row['latency_ms']:>13.4f} {row['size_kb']:>10.1f}")
+    return rows
+
+if __name__ == "__main__":
+    from sample.data_loader import load_data
+    from modify.preprocessing import preprocess_data, extract_features
+    # Pickle the scorer as model.linear_model.LinearScorer, not __main__.LinearScorer
+    from model.linear_model import fit_linear_model, compare_linear_models
+
+    parser = argparse.ArgumentParser(description="Train the linear model or compare it with the linear SVC.")
+    parser.add_argument("--kind", choices=LINEAR_KINDS, default="logreg")
+    parser.add_argument("--compare", action="store_true", help="Print the SVC vs linear-model comparison table")
+    args = parser.parse_args()
+
+    X_train, X_test, y_train, y_test = preprocess_data(load_data())
+    X_train_vec, X_test_vec = extract_features(X_train, X_test, sparse=True)
+    if args.compare:
+        compare_linear_models(X_train_vec, y_train, X_test_vec, y_test)
+    else:
+        linear_model = fit_linear_model(X_train_vec, y_train, args.kind)
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        joblib.dump(linear_model, os.path.join(MODEL_DIR, LINEAR_MODEL_FILE))
+        print(f"✅ Linear model ({args.kind}) saved to {os.path.join(MODEL_DIR, LINEAR_MODEL_FILE)}")
@@ -1,40 +1,126 @@
-import joblib
 import os
 import argparse
 import sys
+import time
 import numpy as np
 
 # Add src to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from modify.preprocessing import clean_code, get_complexity, get_ast_depth, count_dangerous_calls, get_dangerous_details
+from modify.preprocessing import clean_code, get_complexity, get_ast_depth, get_dangerous_details
+from modify.feature_pipeline import snippet_features
+from model.bundle import load_bundle, stale_bundle, BundleError, BUNDLE_FILE
+
+# Only what scanning needs is imported here. joblib, pandas, scipy.sparse and
+# sklearn are imported where they are used (pickled artifacts, pipeline models,
+# sparse rows), so a single-file scan from the bundle starts in a fraction of a second.
 
 MODEL_DIR = "models"
+PIPELINE_FILE = "pipeline.pkl"
+# Names the artifact load_model serves; written by every trainer after it saves a model
+ACTIVE_FILE = "ACTIVE"
+ARTIFACT_FILES = {
+    "pipeline": (PIPELINE_FILE,),
+    "bundle": (BUNDLE_FILE,),
+    "pickles": ("rf_model.pkl", "tfidf_vectorizer.pkl"),
+}
 
-def load_model():
-    """Loads the trained model and vectorizer."""
-    try:
-        model = joblib.load(os.path.join(MODEL_DIR, "rf_model.pkl"))
-        vectorizer = joblib.load(os.path.join(MODEL_DIR, "tfidf_vectorizer.pkl"))
-        return model, vectorizer
-    except FileNotFoundError:
+def set_active_artifact(kind, model_dir=MODEL_DIR):
+    """Makes `kind` (pipeline, bundle or pickles) the artifact load_model serves from model_dir."""
+    if kind not in ARTIFACT_FILES:
+        raise ValueError(f"Unknown artifact '{kind}'. Choose from {tuple(ARTIFACT_FILES)}.")
+    tmp = os.path.join(model_dir, f".tmp_{ACTIVE_FILE}")
+    with open(tmp, "w") as f:
+        f.write(kind + "\n")
+    os.replace(tmp, os.path.join(model_dir, ACTIVE_FILE))
+
+def active_artifact(model_dir=MODEL_DIR):
+    """
+    The artifact load_model serves: the one named in models/ACTIVE, or, in
+    model directories written before that pointer existed (or when its files
+    are gone), the most recently written one. A bundle exported from older
+    pickles than the ones present is skipped for them (see stale_bundle).
+    None if there is no model.
+    """
+    present = {kind: [os.path.join(model_dir, name) for name in files] for kind, files in ARTIFACT_FILES.items()
+               if all(os.path.exists(os.path.join(model_dir, name)) for name in files)}
+    active_path = os.path.join(model_dir, ACTIVE_FILE)
+    kind = None
+    if os.path.exists(active_path):
+        with open(active_path) as f:
+            kind = f.read().strip()
+        if kind not in present:
+            print(f"⚠️  {active_path} names '{kind}', which is missing; serving the newest model instead",
+                  file=sys.stderr)
+            kind = None
+    if not present:
+        return None
+    if kind is None:
+        kind = max(present, key=lambda kind: max(os.path.getmtime(path) for path in present[kind]))
+    if kind == "bundle" and "pickles" in present:
+        reason = stale_bundle(model_dir)
+        if reason:
+            # The bundle is a copy of an older model: never let it shadow the retrained pickles
+            print(f"⚠️  {reason}; serving the pickles instead", file=sys.stderr)
+            return "pickles"
+    return kind
+
+def load_model(model_dir=MODEL_DIR):
+    """
+    Loads the trained model and vectorizer from the active artifact (see
+    active_artifact): a self-contained pipeline.pkl (see train_pipeline.py,
+    returned with vectorizer=None), the single-file model.bundle
+    (memory-mapped, schema checked) or the rf_model.pkl + tfidf_vectorizer.pkl pair.
+    """
+    kind = active_artifact(model_dir)
+    if kind is None:
         print("Model not found. Please train the model first.")
         sys.exit(1)
+    print(f"Using {kind} model from {model_dir}", file=sys.stderr)
+    if kind == "pipeline":
+        import joblib
+        return joblib.load(os.path.join(model_dir, PIPELINE_FILE)), None
+    if kind == "bundle":
+        bundle_path = os.path.join(model_dir, BUNDLE_FILE)
+        try:
+            model, vectorizer, _ = load_bundle(bundle_path)
+            return model, vectorizer
+        except BundleError as e:
+            print(f"❌ Invalid model bundle {bundle_path}: {e}")
+            sys.exit(1)
+    import joblib
+    model = joblib.load(os.path.join(model_dir, "rf_model.pkl"))
+    vectorizer = joblib.load(os.path.join(model_dir, "tfidf_vectorizer.pkl"))
+    return model, vectorizer
 
-def predict_file(filepath, model, vectorizer):
-    """Predicts if a file contains vulnerabilities."""
+def read_source(filepath):
+    """Reads a source file, falling back to latin-1 for non-utf8 content."""
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+            return f.read()
     except UnicodeDecodeError:
         # Fallback for non-utf8 files
         with open(filepath, 'r', encoding='latin-1', errors='ignore') as f:
-            content = f.read()
-    
+            return f.read()
+
+def decode_source(data):
+    """Decodes raw bytes the same way read_source decodes files."""
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('latin-1', errors='ignore')
+
+def featurise_content(content, vectorizer, dangerous_calls_count, sparse_row=False):
+    """
+    Builds the model input row: TF-IDF + Complexity + AST Depth + Dangerous Calls.
+    With sparse_row=True the TF-IDF part stays sparse (for linear scorers).
+    Returns (features, complexity, ast_depth).
+    """
     cleaned_content = clean_code(content)
     
-    # 1. TF-IDF
-    features_tfidf = vectorizer.transform([cleaned_content]).toarray()
+    # 1. TF-IDF (sparse row; StaticVectorizer gives a dense one without scipy)
+    dense_tfidf = not sparse_row and hasattr(vectorizer, "transform_dense")
+    features_tfidf = vectorizer.transform_dense([cleaned_content]) if dense_tfidf else vectorizer.transform([cleaned_content])
     
     # 2. Complexity
     complexity = get_complexity(content)
@@ -42,16 +128,48 @@ def predict_file(filepath, model, vectorizer):
     # 3. AST Depth
     ast_depth = get_ast_depth(content)
     
-    # 4. Dangerous Calls
-    dang_calls_count = count_dangerous_calls(content)
+    # Combine
+    extra_features = np.array([[complexity, ast_depth, dangerous_calls_count]])
+    if sparse_row:
+        # Linear scorers only touch the non-zero TF-IDF terms
+        from scipy.sparse import hstack as sparse_hstack
+        features = sparse_hstack((features_tfidf, extra_features), format='csr')
+    else:
+        features = np.hstack((features_tfidf if dense_tfidf else features_tfidf.toarray(), extra_features))
+    return features, complexity, ast_depth
+
+def predict_content(content, model, vectorizer, timings=None):
+    """
+    Predicts if a piece of source code contains vulnerabilities.
+    If a dict is passed as `timings`, the seconds spent in each stage
+    (rule_scan, featurisation, inference) are stored in it.
+    """
+    start = time.perf_counter()
+    
+    # 4. Dangerous Calls (a single rule-engine pass gives both the count and the details)
     dang_details = get_dangerous_details(content)
+    rules_done = time.perf_counter()
     
-    # Combine
-    features = np.hstack((features_tfidf, np.array([[complexity, ast_depth, dang_calls_count]])))
+    if vectorizer is None:
+        # Pipeline artifact: TF-IDF happens inside the model, it takes the snippet features
+        import pandas as pd
+        row = snippet_features(content, len(dang_details))
+        features = pd.DataFrame([row])
+        complexity, ast_depth = row["complexity"], row["ast_depth"]
+    else:
+        features, complexity, ast_depth = featurise_content(
+            content, vectorizer, len(dang_details), sparse_row=getattr(model, "accepts_sparse", False)
+        )
+    featurised = time.perf_counter()
     
     prediction = model.predict(features)[0]
     probability = model.predict_proba(features)[0][1]
     
+    if timings is not None:
+        timings["rule_scan"] = rules_done - start
+        timings["featurisation"] = featurised - rules_done
+        timings["inference"] = time.perf_counter() - featurised
+    
     details = {
         "complexity": complexity,
         "ast_depth": ast_depth,
@@ -60,58 +178,80 @@ def predict_file(filepath, model, vectorizer):
     
     return prediction, probability, details
 
+def predict_file(filepath, model, vectorizer):
+    """Predicts if a file contains vulnerabilities."""
+    return predict_content(read_source(filepath), model, vectorizer)
+
 import json
-import time
 
-def scan_directory(path, model, vectorizer):
-    """Recursively scans a directory for vulnerabilities."""
+SOURCE_EXTENSIONS = {".py", ".java", ".c", ".cpp", ".h", ".js", ".cs", ".go", ".rb", ".swift", ".ts", ".tsx"}
+IGNORE_DIRS = {".git", "__pycache__", "node_modules", "venv", ".idea", ".vscode"}
+# Whitelist internal files
+INTERNAL_FILES = ["data_loader.py", "external_data.py", "test_cases", "train_model.py", "scan_repo.py", "preprocessing.py", "explain.py",
+                  "rules.py", "synthetic.py"]
+
+def is_source_path(path):
+    """True for the files scans inspect: known source extension, not in an ignored or internal path."""
+    if os.path.splitext(path)[1] not in SOURCE_EXTENSIONS:
+        return False
+    parts = path.replace("\\", "/").split("/")
+    if any(part in IGNORE_DIRS for part in parts[:-1]):
+        return False
+    return not any(w in path for w in INTERNAL_FILES)
+
+def iter_source_files(path):
+    """Yields the source files under `path` that scan_directory inspects (judged like git scans, relative to `path`)."""
+    for root, dirs, files in os.walk(path):
+        # Prune ignored directories (is_source_path would reject their files anyway)
+        dirs[:] = [d for d in dirs if d not in IGNORE_DIRS]
+        
+        for file in files:
+            filepath = os.path.join(root, file)
+            if is_source_path(os.path.relpath(filepath, path)):
+                yield filepath
+
+def scan_file_content(name, content, model, vectorizer, scan_content=predict_content):
+    """Scores one file's source, prints it if vulnerable and returns its report entry."""
+    pred, prob, details = scan_content(content, model, vectorizer)
+    return report_entry(name, pred, prob, details)
+
+def report_entry(name, pred, prob, details):
+    """Prints a scored file if vulnerable and returns its report entry (also for results scored earlier)."""
+    status = "VULNERABLE" if pred == 1 else "SAFE"
+    
+    if status == "VULNERABLE":
+        print(f"\033[91m[{status}] {name} (Confidence: {prob:.2f})\033[0m")
+        if details['dangerous_calls']:
+            print("  ⚠️  Findings:")
+            for finding in details['dangerous_calls']:
+                if isinstance(finding, dict):
+                    print(f"    - [Line {finding['line']}] {finding['type']}: {finding['description']}")
+                else:
+                    print(f"    - {finding}")
+    
+    return {
+        "file": name,
+        "status": status,
+        "confidence": float(prob),
+        "details": details,
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def scan_directory(path, model, vectorizer, scan_content=predict_content):
+    """
+    Recursively scans a directory for vulnerabilities. `scan_content` scores one
+    file's source (predict_content, or cascade_predict_content for tiered scoring).
+    """
     results = []
-    extensions = {".py", ".java", ".c", ".cpp", ".h", ".js", ".cs", ".go", ".rb", ".swift", ".ts", ".tsx"}
-    ignore_dirs = {".git", "__pycache__", "node_modules", "venv", ".idea", ".vscode"}
     
     print(f"Scanning directory: {path}")
     
-    for root, dirs, files in os.walk(path):
-        # Filter ignored directories
-        dirs[:] = [d for d in dirs if d not in ignore_dirs]
-        
-        for file in files:
-            ext = os.path.splitext(file)[1]
-            if ext in extensions:
-                filepath = os.path.join(root, file)
-                
-                # Whitelist internal files
-                if any(w in filepath for w in ["data_loader.py", "external_data.py", "test_cases", "train_model.py", "scan_repo.py", "preprocessing.py", "explain.py"]):
-                    continue
-                    
-                try:
-                    pred, prob, details = predict_file(filepath, model, vectorizer)
-                    status = "VULNERABLE" if pred == 1 else "SAFE"
-                    
-                    if status == "VULNERABLE":
-                        print(f"\033[91m[{status}] {filepath} (Confidence: {prob:.2f})\033[0m")
-                        if details['dangerous_calls']:
-                            print("  ⚠️  Findings:")
-                            for finding in details['dangerous_calls']:
-                                if isinstance(finding, dict):
-                                    print(f"    - [Line {finding['line']}] {finding['type']}: {finding['description']}")
-                                else:
-                                    print(f"    - {finding}")
-                    else:
-                        # Only print safe if verbose or just summary? Let's keep it quiet for safe files to avoid clutter
-                        # print(f"\033[92m[{status}] {filepath} (Confidence: {prob:.2f})\033[0m")
-                        pass
-                        
-                    results.append({
-                        "file": filepath,
-                        "status": status,
-                        "confidence": float(prob),
-                        "details": details,
-                        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
-                    })
-                except Exception as e:
-                    print(f"Error scanning {filepath}: {e}")
-                    
+    for filepath in iter_source_files(path):
+        try:
+            results.append(scan_file_content(filepath, read_source(filepath), model, vectorizer, scan_content))
+        except Exception as e:
+            print(f"Error scanning {filepath}: {e}")
+            
     return results
 
 def generate_report(results, output_file="scan_report.json"):
@@ -123,39 +263,86 @@ def generate_report(results, output_file="scan_report.json"):
         "scan_duration": 0, # Placeholder, could calculate real duration
         "results": results
     }
+    # Cascade scans record which tier decided each file
+    tiers = [r['details'].get('tier') for r in results if r['details'].get('tier')]
+    if tiers:
+        report_data["decided_by"] = {tier: tiers.count(tier) for tier in sorted(set(tiers))}
+    # Git-object scans record which results came from the blob cache
+    cached = [r['cached'] for r in results if 'cached' in r]
+    if cached:
+        report_data["cache"] = {"reused": sum(cached), "computed": len(cached) - sum(cached)}
     
     with open(output_file, "w") as f:
         json.dump(report_data, f, indent=4)
     print(f"\nReport generated: {output_file}")
 
-def main():
+def build_parser():
     parser = argparse.ArgumentParser(description="Scan files for vulnerabilities.")
-    parser.add_argument("path", help="File or directory to scan")
-    args = parser.parse_args()
-    
-    model, vectorizer = load_model()
+    parser.add_argument("path", help="File or directory to scan ('-' reads the source from stdin)")
+    parser.add_argument("--engine", choices=["sklearn", "compiled"], default="sklearn",
+                        help="'compiled' scores with the vectorised NumPy forest (same results, lower per-file latency)")
+    parser.add_argument("--cascade", action="store_true",
+                        help="Tiered scoring: rules, then the linear model, RF only for uncertain files")
+    parser.add_argument("--band", nargs=2, type=float, metavar=("LOW", "HIGH"),
+                        help="Linear-model probabilities sent on to the RF in cascade mode (default: 0.2 0.8)")
+    return parser
+
+def prepare_scanner(args, model, vectorizer, model_dir=MODEL_DIR):
+    """Applies --engine/--cascade to a loaded model. Returns (model, scan_content)."""
+    if vectorizer is None and (args.engine == "compiled" or args.cascade):
+        print("--engine compiled and --cascade need rf_model.pkl; scoring with pipeline.pkl instead.")
+    elif args.engine == "compiled":
+        from model.compiled_forest import CompiledForest
+        if not isinstance(model, CompiledForest):
+            model = CompiledForest.from_model(model)
+    scan_content = predict_content
+    if args.cascade and vectorizer is not None:
+        from model.cascade import CascadeModel, DEFAULT_BAND, cascade_predict_content
+        import joblib
+        linear = joblib.load(os.path.join(model_dir, "linear_model.pkl"))
+        model = CascadeModel(linear, model, args.band or DEFAULT_BAND)
+        scan_content = cascade_predict_content
+    return model, scan_content
+
+def print_file_result(name, pred, prob, details):
+    status = "VULNERABLE" if pred == 1 else "SAFE"
+    color = "\033[91m" if pred == 1 else "\033[92m"
+    print(f"{color}[{status}] {name} (Confidence: {prob:.2f})\033[0m")
     
-    if os.path.isfile(args.path):
+    if status == "VULNERABLE" and details['dangerous_calls']:
+        print("  ⚠️  Findings:")
+        for finding in details['dangerous_calls']:
+            if isinstance(finding, dict):
+                print(f"    - [Line {finding['line']}] {finding['type']} ({finding.get('cwe', 'N/A')}): {finding['description']}")
+            else:
+                print(f"    - {finding}")
+
+def run_scan(args, model, vectorizer, scan_content=predict_content, content=None):
+    """
+    Scans args.path with an already prepared model and prints the results.
+    `content` is the source for path '-' (stdin). Shared by main() and the scan daemon.
+    """
+    if args.path == "-":
+        print("Scanning single file: <stdin>")
+        pred, prob, details = scan_content(sys.stdin.read() if content is None else content, model, vectorizer)
+        print_file_result("<stdin>", pred, prob, details)
+    elif os.path.isfile(args.path):
         print(f"Scanning single file: {args.path}")
-        pred, prob, details = predict_file(args.path, model, vectorizer)
-        status = "VULNERABLE" if pred == 1 else "SAFE"
-        color = "\033[91m" if pred == 1 else "\033[92m"
-        print(f"{color}[{status}] {args.path} (Confidence: {prob:.2f})\033[0m")
-        
-        if status == "VULNERABLE" and details['dangerous_calls']:
-            print("  ⚠️  Findings:")
-            for finding in details['dangerous_calls']:
-                if isinstance(finding, dict):
-                    print(f"    - [Line {finding['line']}] {finding['type']} ({finding.get('cwe', 'N/A')}): {finding['description']}")
-                else:
-                    print(f"    - {finding}")
+        pred, prob, details = scan_content(read_source(args.path), model, vectorizer)
+        print_file_result(args.path, pred, prob, details)
     elif os.path.isdir(args.path):
-        results = scan_directory(args.path, model, vectorizer)
+        results = scan_directory(args.path, model, vectorizer, scan_content)
         vuln_count = sum(1 for r in results if r['status'] == 'VULNERABLE')
         print(f"\nScan Complete. Found {vuln_count} potential vulnerabilities out of {len(results)} files scanned.")
         generate_report(results)
     else:
         print("Invalid path.")
 
+def main():
+    args = build_parser().parse_args()
+    model, vectorizer = load_model()
+    model, scan_content = prepare_scanner(args, model, vectorizer)
+    run_scan(args, model, vectorizer, scan_content)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,190 @@
+import os
+import sys
+import time
+import threading
+import joblib
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model.predict import predict_content, active_artifact, ACTIVE_FILE, PIPELINE_FILE
+from model.shared_model import load_shared_model, CURRENT_FILE
+from model.compiled_forest import CompiledForest
+from model.bundle import compute_model_version, load_bundle, BUNDLE_FILE
+from modify.rules import WARMUP_SNIPPET
+
+MODEL_DIR = "models"
+MODEL_FILE = "rf_model.pkl"
+VECTORIZER_FILE = "tfidf_vectorizer.pkl"
+SHARED_SUBDIR = "shared"
+
+# Complexity + AST Depth + Dangerous Calls are appended after the TF-IDF columns
+NUM_EXTRA_FEATURES = 3
+
+def validate_model(model, vectorizer):
+    """Checks that the model expects exactly the features the vectorizer produces."""
+    expected = len(vectorizer.vocabulary_) + NUM_EXTRA_FEATURES
+    n_features = getattr(model, "n_features_in_", expected)
+    if n_features != expected:
+        raise ValueError(
+            f"Model expects {n_features} features but vectorizer produces {expected} "
+            f"({len(vectorizer.vocabulary_)} TF-IDF + {NUM_EXTRA_FEATURES} extra)."
+        )
+
+def load_artifacts(model_dir=MODEL_DIR, shared=False, compiled=False):
+    """
+    Loads, validates and warms up a model/vectorizer pair. Raises instead of exiting.
+    Serves the same artifact as predict.load_model (see predict.active_artifact):
+    a pipeline.pkl (vectorizer None), the model.bundle or the pickle pair, versioned
+    by the hash of the file(s) actually loaded.
+    With shared=True the memory-mappable layout under models/shared/ is used, so
+    every worker process maps the same read-only pages instead of unpickling a copy.
+    With compiled=True a pickled forest is converted to a CompiledForest.
+    """
+    if shared:
+        model, vectorizer, version = load_shared_model(os.path.join(model_dir, SHARED_SUBDIR))
+    else:
+        kind = active_artifact(model_dir)
+        if kind is None:
+            raise FileNotFoundError(f"No model in {model_dir}. Please train the model first.")
+        if kind == "pipeline":
+            pipeline_path = os.path.join(model_dir, PIPELINE_FILE)
+            version = compute_model_version(pipeline_path)
+            model, vectorizer = joblib.load(pipeline_path), None
+        elif kind == "bundle":
+            bundle_path = os.path.join(model_dir, BUNDLE_FILE)
+            version = compute_model_version(bundle_path)
+            model, vectorizer, _ = load_bundle(bundle_path)
+        else:
+            model_path = os.path.join(model_dir, MODEL_FILE)
+            vectorizer_path = os.path.join(model_dir, VECTORIZER_FILE)
+            version = compute_model_version(model_path, vectorizer_path)
+            model = joblib.load(model_path)
+            vectorizer = joblib.load(vectorizer_path)
+            if compiled:
+                model = CompiledForest.from_model(model)
+
+    if vectorizer is not None:
+        validate_model(model, vectorizer)
+
+    # Warm-up: the first prediction pays for lazy initialisation inside sklearn/numpy
+    predict_content(WARMUP_SNIPPET, model, vectorizer)
+
+    return model, vectorizer, version
+
+class ActiveModel:
+    """Immutable snapshot of the model currently being served."""
+    def __init__(self, model, vectorizer, version):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.version = version
+        self.loaded_at = time.strftime("%Y-%m-%d %H:%M:%S")
+
+class ModelRegistry:
+    """
+    Holds the served model behind a single reference that is swapped atomically.
+    Readers grab the current snapshot once per request; reloads build a complete
+    new snapshot in a background thread and only then replace the reference, so
+    in-flight requests keep using the version they started with.
+    """
+    def __init__(self, model_dir=MODEL_DIR, shared=False, compiled=False):
+        self.model_dir = model_dir
+        self.shared = shared
+        self.compiled = compiled
+        self._active = None
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self.last_error = None
+        self.reloading = False
+
+    def get(self):
+        """Returns the current ActiveModel snapshot (or None if nothing is loaded)."""
+        return self._active
+
+    def swap(self, model, vectorizer, version):
+        """Atomically replaces the served model."""
+        self._active = ActiveModel(model, vectorizer, version)
+        return self._active
+
+    def load(self):
+        """Loads the artifacts from disk and swaps them in. Blocks the caller."""
+        with self._reload_lock:
+            return self._load_locked()
+
+    def _load_locked(self):
+        self.reloading = True
+        try:
+            model, vectorizer, version = load_artifacts(self.model_dir, self.shared, self.compiled)
+            current = self._active
+            if current is None or current.version != version:
+                self.swap(model, vectorizer, version)
+                print(f"✅ Serving model version {version}")
+            self.last_error = None
+            return version
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"❌ Model reload failed, keeping current model: {e}")
+            raise
+        finally:
+            self.reloading = False
+
+    def reload_async(self):
+        """Starts a background reload. Returns False if one is already running."""
+        # Test-and-set in one step: /admin/reload and the file watcher run on different threads
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        self.reloading = True
+
+        def _run():
+            try:
+                self._load_locked()
+            except Exception:
+                pass # Error already recorded in last_error
+            finally:
+                self._reload_lock.release()
+
+        threading.Thread(target=_run, daemon=True).start()
+        return True
+
+    def _reload_quietly(self):
+        try:
+            self.load()
+        except Exception:
+            pass # Error already recorded in last_error
+
+    def _artifact_mtimes(self):
+        mtimes = []
+        if self.shared:
+            # Exports only become visible when the CURRENT pointer is replaced
+            names = (os.path.join(SHARED_SUBDIR, CURRENT_FILE),)
+        else:
+            # Every artifact active_artifact may pick, and the pointer that picks it
+            names = (ACTIVE_FILE, PIPELINE_FILE, BUNDLE_FILE, MODEL_FILE, VECTORIZER_FILE)
+        for name in names:
+            try:
+                mtimes.append(os.path.getmtime(os.path.join(self.model_dir, name)))
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def watch(self, interval=5.0):
+        """Polls the artifact files and reloads in the background when they change."""
+        if self._watcher is not None:
+            return
+
+        def _poll():
+            last_seen = self._artifact_mtimes()
+            while True:
+                time.sleep(interval)
+                current = self._artifact_mtimes()
+                # Artifacts that don't exist (e.g. no pipeline.pkl) are None; a change
+                # that leaves none at all is a directory being replaced, not a model
+                if current != last_seen and any(mtime is not None for mtime in current):
+                    # Give the writer a moment to finish before reading
+                    time.sleep(min(interval, 1.0))
+                    if self._artifact_mtimes() == current:
+                        last_seen = current
+                        self._reload_quietly()
+
+        self._watcher = threading.Thread(target=_poll, daemon=True)
+        self._watcher.start()
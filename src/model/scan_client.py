@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import stat
+import time
+import socket
+import getpass
+import hashlib
+import tempfile
+
+# Standard library only: the client runs on every editor save / git hook, so it
+# must not pay for numpy or the model. The daemon (daemon.py) keeps those warm.
+
+MODEL_DIR = "models"
+SOCKET_ENV = "VULNSCAN_SOCKET"
+DAEMON_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "daemon.py")
+CONNECT_TIMEOUT = 1.0
+START_TIMEOUT = 15.0
+# Client-only flags; everything else is passed through to predict.py's parser
+CLIENT_FLAGS = {"--no-daemon", "--no-autostart", "--stop"}
+
+def _current_uid():
+    """The user's uid, or None where there is none (Windows)."""
+    getuid = getattr(os, "getuid", None)
+    return getuid() if getuid else None
+
+def socket_dir():
+    """Per-user directory for the sockets: $XDG_RUNTIME_DIR/vulnscan, else vulnscan-<user> in the temp dir."""
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "vulnscan")
+    uid = _current_uid()
+    return os.path.join(tempfile.gettempdir(), f"vulnscan-{getpass.getuser() if uid is None else uid}")
+
+def default_socket_path(model_dir=MODEL_DIR):
+    """One daemon per user and model directory."""
+    if os.environ.get(SOCKET_ENV):
+        return os.environ[SOCKET_ENV]
+    digest = hashlib.sha1(os.path.abspath(model_dir).encode("utf-8")).hexdigest()[:10]
+    return os.path.join(socket_dir(), f"{digest}.sock")
+
+def make_socket_dir(socket_path):
+    """Creates the socket's directory (private to the user) and checks it, see check_owner."""
+    folder = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(folder, mode=0o700, exist_ok=True)
+    _check_folder(folder)
+
+def _check_folder(folder):
+    uid = _current_uid()
+    info = os.stat(folder)
+    if uid is not None and (info.st_uid not in (uid, 0) or (info.st_mode & 0o022 and not info.st_mode & stat.S_ISVTX)):
+        raise PermissionError(f"{folder} can be changed by other users")
+
+def check_owner(socket_path):
+    """
+    Raises PermissionError unless socket_path belongs to this user and sits in a
+    directory no other user can swap it in (ours or root's, and sticky if shared).
+    Scans send source code and trust the exit code: never to someone else's daemon.
+    """
+    uid = _current_uid()
+    if uid is None:
+        return
+    if os.lstat(socket_path).st_uid != uid:
+        raise PermissionError(f"{socket_path} belongs to another user")
+    _check_folder(os.path.dirname(os.path.abspath(socket_path)))
+
+def send_request(request, socket_path, timeout=None):
+    """Sends one JSON request line and returns the daemon's JSON reply."""
+    check_owner(socket_path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT)
+        sock.connect(socket_path)
+        # Scanning a large directory can take a while; only connecting is bounded
+        sock.settimeout(timeout)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as reply:
+            line = reply.readline()
+    finally:
+        sock.close()
+    if not line:
+        raise ConnectionError("Scan daemon closed the connection without replying.")
+    return json.loads(line)
+
+def start_daemon(socket_path, model_dir=MODEL_DIR, wait=START_TIMEOUT):
+    """Starts the daemon in its own session and waits until it answers a ping."""
+    import subprocess
+    make_socket_dir(socket_path)
+    log_path = socket_path + ".log"
+    with open(log_path, "ab") as log:
+        subprocess.Popen([sys.executable, DAEMON_SCRIPT, "--socket", socket_path,
+                          "--model-dir", os.path.abspath(model_dir)],
+                         stdin=subprocess.DEVNULL, stdout=log, stderr=log, start_new_session=True)
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        try:
+            return send_request({"command": "ping"}, socket_path, timeout=CONNECT_TIMEOUT)
+        except (OSError, ValueError):
+            time.sleep(0.05)
+    return None
+
+def scan_in_process(argv, content=None, model_dir=MODEL_DIR):
+    """Fallback: the same scan predict.py runs, in this process."""
+    sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    from model.predict import build_parser, load_model, prepare_scanner, run_scan
+    args = build_parser().parse_args(argv)
+    model, vectorizer = load_model(model_dir)
+    model, scan_content = prepare_scanner(args, model, vectorizer, model_dir)
+    run_scan(args, model, vectorizer, scan_content, content)
+    return 0
+
+def main(argv=None, model_dir=MODEL_DIR):
+    """
+    Scans through the daemon and prints exactly what predict.py would print.
+    Starts the daemon when none is listening (unless --no-autostart) and scans
+    in-process when it still can't be reached (or with --no-daemon).
+    """
+    argv = list(sys.argv[1:] if argv is None else argv)
+    flags = {arg for arg in argv if arg in CLIENT_FLAGS}
+    argv = [arg for arg in argv if arg not in CLIENT_FLAGS]
+    socket_path = default_socket_path(model_dir)
+
+    if "--stop" in flags:
+        try:
+            send_request({"command": "shutdown"}, socket_path, timeout=CONNECT_TIMEOUT)
+            print("Scan daemon stopped.")
+        except OSError:
+            print("No scan daemon running.")
+        return 0
+
+    # Source from stdin is read here: the daemon has no access to our stdin
+    content = sys.stdin.read() if "-" in argv else None
+    # No Unix domain sockets (older Windows Pythons): always in-process
+    if "--no-daemon" not in flags and hasattr(socket, "AF_UNIX"):
+        request = {"command": "scan", "argv": argv, "cwd": os.getcwd(), "content": content}
+        for attempt in range(2):
+            try:
+                reply = send_request(request, socket_path)
+                sys.stdout.write(reply["stdout"])
+                sys.stderr.write(reply["stderr"])
+                return reply["exit_code"]
+            except PermissionError as e:
+                print(f"⚠️  Not using the scan daemon: {e}", file=sys.stderr)
+                break
+            except (OSError, ValueError):
+                if attempt or "--no-autostart" in flags or start_daemon(socket_path, model_dir) is None:
+                    break
+        print("⚠️  Scan daemon unavailable, scanning in-process.", file=sys.stderr)
+    return scan_in_process(argv, content, model_dir)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import numpy as np
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, cross_val_score
+from sklearn.utils import resample
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+RESULTS_FILE = "reports/search_results.jsonl"
+RESOURCES = ("n_samples", "n_estimators")
+DEFAULT_FACTOR = 3
+DEFAULT_MAX_ESTIMATORS = 300
+
+def _search_id(estimator, param_grid, resource, rungs, factor, cv, n_samples, scoring):
+    """Identifies a search setup; results of a different setup are never reused."""
+    setup = {
+        "estimator": type(estimator).__name__,
+        "base_params": {k: repr(v) for k, v in sorted(estimator.get_params().items())},
+        "param_grid": {k: [repr(v) for v in vals] for k, vals in sorted(param_grid.items())},
+        "resource": resource, "rungs": rungs, "factor": factor, "cv": cv,
+        "n_samples": n_samples, "scoring": scoring
+    }
+    return hashlib.sha256(json.dumps(setup, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def _params_key(params):
+    return json.dumps({k: repr(v) for k, v in sorted(params.items())}, sort_keys=True)
+
+def load_results(results_path, search_id):
+    """Reads the candidates already scored by this search: {(rung, params_key): record}."""
+    done = {}
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue # Last line of an interrupted write
+            if record.get("search_id") == search_id:
+                done[(record["rung"], record["params_key"])] = record
+    return done
+
+def _append_result(results_path, record):
+    # One flushed and fsynced line per candidate: a crash loses at most the candidate in flight
+    with open(results_path, "ab") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end:
+            # A crash mid-write leaves a partial last line: cut it, or this record would be glued onto it
+            with open(results_path, "rb") as tail:
+                tail.seek(max(0, end - 1))
+                if tail.read(1) != b"\n":
+                    tail.seek(0)
+                    f.truncate(tail.read().rfind(b"\n") + 1)
+        f.write((json.dumps(record) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+
+def plan_rungs(n_candidates, min_resources, max_resources, factor):
+    """
+    Resource per rung, following sklearn's successive halving: as many rungs as
+    needed to get down to one candidate (or as many as the resource range
+    allows), with min_resources raised so the last rung uses max_resources.
+    """
+    n_required = 1 + int(math.floor(math.log(n_candidates, factor))) if n_candidates > 1 else 1
+    n_possible = 1 + int(math.floor(math.log(max_resources / min_resources, factor)))
+    n_rungs = max(1, min(n_required, n_possible))
+    first = max(min_resources, max_resources // factor ** (n_rungs - 1))
+    return [int(min(max_resources, first * factor ** i)) for i in range(n_rungs)]
+
+def successive_halving_search(estimator, param_grid, X, y, resource="n_samples", min_resources=None,
+                              max_resources=None, factor=DEFAULT_FACTOR, cv=5, scoring="accuracy",
+                              budget_seconds=None, results_path=RESULTS_FILE, n_jobs=-1, random_state=42):
+    """
+    Successive halving over a parameter grid. Every candidate is cross-validated
+    on a small amount of `resource` (training samples or trees); the best
+    1/factor of them move to the next rung with factor times more resource.
+
+    Each scored candidate is appended to `results_path` (JSON lines) right away.
+    Re-running the same search reads that file back and only fits what is
+    missing, so an interrupted search resumes where it stopped.
+    With `budget_seconds`, no new candidate is started once the budget is spent
+    and the best candidate of the deepest rung reached wins.
+    """
+    if resource not in RESOURCES:
+        raise ValueError(f"Unknown resource '{resource}'. Choose from {RESOURCES}.")
+    y = np.asarray(y)
+    n_samples = X.shape[0]
+    n_classes = len(np.unique(y))
+    if resource == "n_samples":
+        param_grid = dict(param_grid)
+        max_resources = max_resources or n_samples
+        min_resources = min_resources or cv * 2 * n_classes
+    else:
+        # The number of trees is the resource, so it can't also be searched
+        param_grid = {k: v for k, v in param_grid.items() if k != "n_estimators"}
+        max_resources = max_resources or DEFAULT_MAX_ESTIMATORS
+        min_resources = min_resources or 10
+
+    candidates = list(ParameterGrid(param_grid))
+    rungs = plan_rungs(len(candidates), min_resources, max_resources, factor)
+    search_id = _search_id(estimator, param_grid, resource, rungs, factor, cv, n_samples, scoring)
+
+    os.makedirs(os.path.dirname(results_path) or ".", exist_ok=True)
+    done = load_results(results_path, search_id)
+    splitter = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+
+    start = time.perf_counter()
+    history = []
+    n_fitted = n_reused = 0
+    out_of_budget = False
+    best = None
+    print(f"Successive halving: {len(candidates)} candidates, {resource} per rung {rungs} (factor {factor})")
+
+    for rung, n_resources in enumerate(rungs):
+        if resource == "n_samples" and n_resources < n_samples:
+            idx = resample(np.arange(n_samples), n_samples=n_resources, replace=False,
+                           stratify=y, random_state=random_state + rung)
+            X_rung, y_rung = X[idx], y[idx]
+        else:
+            X_rung, y_rung = X, y
+
+        scored = []
+        for params in candidates:
+            key = (rung, _params_key(params))
+            record = done.get(key)
+            if record is not None:
+                n_reused += 1
+            else:
+                if budget_seconds is not None and time.perf_counter() - start > budget_seconds:
+                    out_of_budget = True
+                    break
+                model = clone(estimator).set_params(**params)
+                if resource == "n_estimators":
+                    model.set_params(n_estimators=n_resources)
+                fit_start = time.perf_counter()
+                scores = cross_val_score(model, X_rung, y_rung, cv=splitter, scoring=scoring, n_jobs=n_jobs)
+                record = {
+                    "search_id": search_id, "rung": rung, "resource": resource, "n_resources": n_resources,
+                    "params_key": key[1], "params": params, "mean_score": float(np.mean(scores)),
+                    "std_score": float(np.std(scores)), "fit_seconds": time.perf_counter() - fit_start
+                }
+                _append_result(results_path, record)
+                n_fitted += 1
+            scored.append((record["mean_score"], params, record))
+            history.append(record)
+
+        if scored:
+            scored.sort(key=lambda item: -item[0])
+            best = scored[0]
+            print(f"  rung {rung}: {len(scored)} candidates on {n_resources} {resource}, "
+                  f"best {best[0]:.4f} {best[1]}")
+        if out_of_budget:
+            print(f"⚠️  Budget of {budget_seconds}s spent; stopping at rung {rung}.")
+            break
+        n_keep = max(1, int(math.ceil(len(candidates) / factor)))
+        candidates = [params for _, params, _ in scored[:n_keep]]
+
+    if best is None:
+        raise RuntimeError("Search budget ran out before any candidate was scored.")
+    best_params = dict(best[1])
+    if resource == "n_estimators":
+        best_params["n_estimators"] = best[2]["n_resources"]
+    return {
+        "best_params": best_params,
+        "best_score": best[0],
+        "history": history,
+        "n_fitted": n_fitted,
+        "n_reused": n_reused,
+        "search_seconds": time.perf_counter() - start,
+        "completed": not out_of_budget,
+        "search_id": search_id
+    }
@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from model.compiled_forest import FOREST_ARRAYS, CompiledForest, flatten_forest
+
+MODEL_DIR = "models"
+SHARED_DIR = os.path.join(MODEL_DIR, "shared")
+CURRENT_FILE = "CURRENT"
+
+# TfidfVectorizer settings that affect transform() and are JSON friendly
+VECTORIZER_PARAMS = ["lowercase", "token_pattern", "ngram_range", "analyzer", "binary",
+                     "norm", "use_idf", "smooth_idf", "sublinear_tf", "strip_accents"]
+
+def export_vectorizer(vectorizer):
+    """Splits a fitted TfidfVectorizer into arrays plus JSON parameters."""
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    params = {k: v for k, v in vectorizer.get_params().items() if k in VECTORIZER_PARAMS}
+    arrays = {"vocabulary": np.array(terms), "idf": np.asarray(vectorizer.idf_, dtype=np.float64)}
+    return arrays, params
+
+def rebuild_vectorizer(arrays, params):
+    """Recreates a transform-only TfidfVectorizer from exported arrays."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    params = dict(params)
+    params["ngram_range"] = tuple(params["ngram_range"])
+    vectorizer = TfidfVectorizer(**params)
+    vectorizer.vocabulary_ = {str(term): i for i, term in enumerate(arrays["vocabulary"])}
+    vectorizer.idf_ = np.asarray(arrays["idf"])
+    return vectorizer
+
+def export_shared_model(model, vectorizer, shared_dir=SHARED_DIR, version=None):
+    """
+    Writes model + vectorizer as uncompressed .npy files under shared_dir/<version>/
+    (the flat forest layout CompiledForest predicts from)
+    and then points shared_dir/CURRENT at it. Published versions are never modified
+    in place, so workers that still map an older version keep reading valid pages.
+    """
+    forest = flatten_forest(model)
+    vec_arrays, vec_params = export_vectorizer(vectorizer)
+
+    if version is None:
+        version = time.strftime("%Y%m%d%H%M%S")
+    target = os.path.join(shared_dir, version)
+    os.makedirs(target, exist_ok=True)
+
+    for name, array in list(forest.items()) + list(vec_arrays.items()):
+        np.save(os.path.join(target, f"{name}.npy"), array)
+
+    meta = {
+        "version": version,
+        "n_features": int(model.n_features_in_),
+        "n_estimators": len(model.estimators_),
+        "vectorizer_params": vec_params,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    with open(os.path.join(target, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=4)
+
+    # Atomic pointer swap
+    tmp_pointer = os.path.join(shared_dir, CURRENT_FILE + ".tmp")
+    with open(tmp_pointer, "w") as f:
+        f.write(version)
+    os.replace(tmp_pointer, os.path.join(shared_dir, CURRENT_FILE))
+    print(f"Shared model {version} exported to {target}")
+    return target
+
+def current_shared_version(shared_dir=SHARED_DIR):
+    """Returns the version CURRENT points to, or None when nothing was exported."""
+    try:
+        with open(os.path.join(shared_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def load_shared_model(shared_dir=SHARED_DIR, version=None, mmap_mode='r'):
+    """Maps the exported arrays read-only. Returns (model, vectorizer, version)."""
+    version = version or current_shared_version(shared_dir)
+    if version is None:
+        raise FileNotFoundError(f"No shared model exported in {shared_dir}")
+    target = os.path.join(shared_dir, version)
+    with open(os.path.join(target, "meta.json")) as f:
+        meta = json.load(f)
+
+    arrays = {}
+    for name in FOREST_ARRAYS + ["vocabulary", "idf"]:
+        arrays[name] = np.load(os.path.join(target, f"{name}.npy"), mmap_mode=mmap_mode)
+
+    model = CompiledForest(arrays, meta["n_features"])
+    vectorizer = rebuild_vectorizer(arrays, meta["vectorizer_params"])
+    return model, vectorizer, version
+
+def _read_memory_kb():
+    """Reads RSS and PSS of the current process (Linux /proc)."""
+    usage = {"rss_kb": None, "pss_kb": None}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    usage["rss_kb"] = int(line.split()[1])
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    usage["pss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return usage
+
+def _rss_worker(mode, model_dir, barrier, queue):
+    import joblib
+    from model.predict import predict_content
+    from modify.rules import WARMUP_SNIPPET
+    if mode == "pickle":
+        model = joblib.load(os.path.join(model_dir, "rf_model.pkl"))
+        vectorizer = joblib.load(os.path.join(model_dir, "tfidf_vectorizer.pkl"))
+    else:
+        model, vectorizer, _ = load_shared_model(os.path.join(model_dir, "shared"))
+    # Touch every tree once, like a warmed-up worker would
+    predict_content(WARMUP_SNIPPET, model, vectorizer)
+    if mode == "shared":
+        for name in FOREST_ARRAYS:
+            np.asarray(getattr(model, name)).sum()
+    # Measure while all workers are alive so shared pages are split between them
+    barrier.wait()
+    queue.put(_read_memory_kb())
+    barrier.wait()
+
+def measure_worker_rss(mode, model_dir=MODEL_DIR, workers=4):
+    """Starts `workers` processes that load the model like uvicorn workers do and reports their memory."""
+    import multiprocessing as mp
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    queue = ctx.Queue()
+    procs = [ctx.Process(target=_rss_worker, args=(mode, model_dir, barrier, queue)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    samples = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return samples
+
+def report_worker_rss(model_dir=MODEL_DIR, workers=4):
+    """Prints per-worker RSS/PSS for pickled vs memory-mapped artifacts."""
+    print(f"{'mode':<8} {'workers':>7} {'avg RSS (MB)':>13} {'avg PSS (MB)':>13} {'total PSS (MB)':>15}")
+    for mode in ("pickle", "shared"):
+        samples = measure_worker_rss(mode, model_dir, workers)
+        rss = [s["rss_kb"] / 1024 for s in samples if s["rss_kb"]]
+        pss = [s["pss_kb"] / 1024 for s in samples if s["pss_kb"]]
+        print(f"{mode:<8} {workers:>7} {np.mean(rss):>13.1f} {np.mean(pss) if pss else float('nan'):>13.1f} "
+              f"{np.sum(pss) if pss else float('nan'):>15.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or benchmark the memory-mappable model layout.")
+    parser.add_argument("command", choices=["export", "measure"])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        import joblib
+        from model.registry import compute_model_version
+        model_path = os.path.join(MODEL_DIR, "rf_model.pkl")
+        vectorizer_path = os.path.join(MODEL_DIR, "tfidf_vectorizer.pkl")
+        export_shared_model(joblib.load(model_path), joblib.load(vectorizer_path),
+                            version=compute_model_version(model_path, vectorizer_path))
+    else:
+        report_worker_rss(MODEL_DIR, args.workers)
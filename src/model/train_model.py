@@ -1,6 +1,8 @@
 import os
 import sys
+import time
 import joblib
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.svm import SVC
@@ -9,62 +11,145 @@ from sklearn.model_selection import GridSearchCV
 # Add src to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from sample.data_loader import load_data
-from modify.preprocessing import preprocess_data, extract_features
+from sample.data_loader import load_data, DATA_COLUMNS
+from sample.stratified_sample import build_balanced_sample, VULNERABLE_PER_STRATUM, SAFE_PER_STRATUM
+from modify.dedup import MODES as NEAR_DUPLICATE_MODES, near_duplicate_clusters
+from modify.preprocessing import preprocess_data, extract_features, NUMERIC_FEATURES
+from model.shared_model import export_shared_model
+from model.bundle import write_bundle
+from model.predict import set_active_artifact
+from model.registry import compute_model_version
+from model.linear_model import fit_linear_model, LINEAR_KINDS, LINEAR_MODEL_FILE
+from model.incremental import save_holdout
+from model.search import successive_halving_search, RESOURCES, RESULTS_FILE, DEFAULT_FACTOR
 
-def train_models():
-    """Trains Random Forest and SVM models with advanced tuning and metrics."""
-    print("Starting training pipeline...")
-    
-    # 1. Load Data
-    df = load_data()
-    
-    # 2. Smart Polishing (Balancing)
-    # If we have too many safe samples (0), downsample them to match vulnerable (1)
-    vuln_count = df['is_vulnerable'].sum()
-    safe_count = len(df) - vuln_count
+# The miner's stored features come along, so preprocess_data can skip recomputing them
+TRAINING_COLUMNS = DATA_COLUMNS + NUMERIC_FEATURES + ["ruleset_version"]
+
+RF_PARAM_GRID = {
+    'n_estimators': [100, 200, 300],
+    'max_depth': [None, 20, 30],
+    'min_samples_split': [2, 5],
+    'class_weight': ['balanced', None]
+}
+
+def balance_rows(labels, random_state=42):
+    """
+    Positions of the rows to train on, from the labels alone: if we have too
+    many safe samples (0), they are downsampled to 1.2x the vulnerable ones (1).
+    None when the classes are already balanced enough.
+    """
+    labels = pd.Series(labels).reset_index(drop=True)
+    vuln_count = int(labels.sum())
+    safe_count = len(labels) - vuln_count
     print(f"Original Distribution: Safe={safe_count}, Vulnerable={vuln_count}")
     
-    if safe_count > vuln_count * 1.5: # Allow some imbalance, but not extreme
-        print("Balancing dataset (Downsampling Safe class)...")
-        df_vuln = df[df['is_vulnerable'] == 1]
-        df_safe = df[df['is_vulnerable'] == 0].sample(n=int(vuln_count * 1.2), random_state=42) # 1.2 ratio
-        df = pd.concat([df_vuln, df_safe]).sample(frac=1).reset_index(drop=True)
-        print(f"Balanced Distribution: Safe={len(df_safe)}, Vulnerable={len(df_vuln)}")
+    if safe_count <= vuln_count * 1.5: # Allow some imbalance, but not extreme
+        return None
+    print("Balancing dataset (Downsampling Safe class)...")
+    vuln_rows = labels.index[labels == 1]
+    safe_rows = labels[labels == 0].sample(n=int(vuln_count * 1.2), random_state=random_state).index # 1.2 ratio
+    print(f"Balanced Distribution: Safe={len(safe_rows)}, Vulnerable={len(vuln_rows)}")
+    return np.random.RandomState(random_state).permutation(np.concatenate([vuln_rows, safe_rows]))
+
+def balance_dataset(df):
+    """If we have too many safe samples (0), downsample them to match vulnerable (1)."""
+    rows = balance_rows(df['is_vulnerable'])
+    if rows is None:
+        return df
+    return df.iloc[rows].reset_index(drop=True)
+
+def load_training_data(near_duplicates="keep", stream=None, per_stratum=(VULNERABLE_PER_STRATUM, SAFE_PER_STRATUM)):
+    """
+    The balanced training set. Rows are chosen from the labels first, so the
+    code of the safe samples that are dropped is never loaded.
+    `near_duplicates` is passed to load_data ("keep", "drop" or "group").
+    With `stream` (shard directories or dataset files) the set is instead
+    built in one pass by stratified reservoir sampling (sample/stratified_sample.py),
+    `per_stratum` = (vulnerable, safe) rows per class x language x source.
+    """
+    if stream:
+        df = build_balanced_sample(stream, *per_stratum)
+        if near_duplicates != "keep":
+            df["cluster"] = near_duplicate_clusters(df["code"])
+            if near_duplicates == "drop":
+                df = df[~df["cluster"].duplicated()].drop(columns="cluster").reset_index(drop=True)
+        return df
+    rows = balance_rows(load_data(columns=["is_vulnerable"], near_duplicates=near_duplicates)["is_vulnerable"])
+    return load_data(columns=TRAINING_COLUMNS, rows=rows, near_duplicates=near_duplicates)
+
+def train_models(linear="logreg", search="grid", resource="n_estimators", factor=DEFAULT_FACTOR,
+                 budget_seconds=None, results_path=RESULTS_FILE, learning_curve_plot=True, near_duplicates="keep",
+                 stream=None, per_stratum=(VULNERABLE_PER_STRATUM, SAFE_PER_STRATUM)):
+    """
+    Trains Random Forest and a linear model with advanced tuning and metrics.
+    `linear` is "logreg" or "sgd" (calibrated LinearScorer, saved as linear_model.pkl)
+    or "svc" for the previous SVC(kernel='linear', probability=True) (svm_model.pkl).
+    `search` is "grid" (exhaustive GridSearchCV) or "halving" (resumable successive
+    halving over `resource`, see model/search.py).
+    `near_duplicates` ("keep", "drop", "group") is how near-copies are handled, see modify/dedup.py.
+    `stream` trains on a balanced reservoir sample of those shards instead of load_data().
+    """
+    timings = {}
+    print("Starting training pipeline...")
+    
+    # 1. Load Data + 2. Smart Polishing (Balancing), choosing the rows from the labels alone
+    df = load_training_data(near_duplicates, stream, per_stratum)
 
     # 3. Preprocessing (80/20 Split is handled in preprocess_data, let's verify)
     # We need to ensure preprocess_data uses test_size=0.2
     X_train, X_test, y_train, y_test = preprocess_data(df)
-    X_train_vec, X_test_vec = extract_features(X_train, X_test)
+    # Sparse features: the linear models train on them directly, RF gets a dense copy
+    X_train_sparse, X_test_sparse = extract_features(X_train, X_test, sparse=True)
+    X_train_vec, X_test_vec = X_train_sparse.toarray(), X_test_sparse.toarray()
     
     print(f"Training Set: {X_train_vec.shape[0]} samples")
     print(f"Testing Set: {X_test_vec.shape[0]} samples")
     
-    # 4. Random Forest with Grid Search (5-Fold CV)
-    print("\n--- Training Random Forest (Grid Search) ---")
-    rf_params = {
-        'n_estimators': [100, 200, 300],
-        'max_depth': [None, 20, 30],
-        'min_samples_split': [2, 5],
-        'class_weight': ['balanced', None]
-    }
-    rf_grid = GridSearchCV(RandomForestClassifier(random_state=42), rf_params, cv=5, n_jobs=-1, verbose=1)
-    rf_grid.fit(X_train_vec, y_train)
+    # 4. Random Forest hyperparameter search (5-Fold CV)
+    rf_params = RF_PARAM_GRID
+    if search == "halving":
+        print(f"\n--- Training Random Forest (Successive Halving on {resource}) ---")
+        result = successive_halving_search(
+            RandomForestClassifier(random_state=42), rf_params, X_train_sparse, y_train,
+            resource=resource, factor=factor, budget_seconds=budget_seconds, results_path=results_path
+        )
+        timings["search"] = result["search_seconds"]
+        print(f"Candidates fitted: {result['n_fitted']}, reused from {results_path}: {result['n_reused']}")
+        best_params, best_score = result["best_params"], result["best_score"]
+        start = time.perf_counter()
+        best_rf = RandomForestClassifier(random_state=42, n_jobs=-1, **best_params).fit(X_train_vec, y_train)
+        timings["final_fit"] = time.perf_counter() - start
+    else:
+        print("\n--- Training Random Forest (Grid Search) ---")
+        start = time.perf_counter()
+        rf_grid = GridSearchCV(RandomForestClassifier(random_state=42), rf_params, cv=5, n_jobs=-1, verbose=1)
+        rf_grid.fit(X_train_vec, y_train)
+        timings["final_fit"] = rf_grid.refit_time_
+        timings["search"] = time.perf_counter() - start - rf_grid.refit_time_
+        best_rf = rf_grid.best_estimator_
+        best_params, best_score = rf_grid.best_params_, rf_grid.best_score_
     
-    best_rf = rf_grid.best_estimator_
-    print(f"Best RF Params: {rf_grid.best_params_}")
-    print(f"Best CV Score: {rf_grid.best_score_:.4f}")
+    print(f"Best RF Params: {best_params}")
+    print(f"Best CV Score: {best_score:.4f}")
     
-    # 5. SVM (Linear)
-    print("\n--- Training SVM ---")
-    svm_model = SVC(kernel='linear', probability=True, random_state=42, class_weight='balanced')
-    svm_model.fit(X_train_vec, y_train)
+    # 5. Linear model
+    if linear == "svc":
+        print("\n--- Training SVM ---")
+        linear_model = SVC(kernel='linear', probability=True, random_state=42, class_weight='balanced')
+        linear_model.fit(X_train_sparse, y_train)
+        linear_file = "svm_model.pkl"
+    else:
+        print(f"\n--- Training Linear Model ({linear}) ---")
+        start = time.perf_counter()
+        linear_model = fit_linear_model(X_train_sparse, y_train, linear)
+        print(f"Trained in {time.perf_counter() - start:.2f}s")
+        linear_file = LINEAR_MODEL_FILE
     
     # 6. Evaluation
     from sklearn.metrics import classification_report, confusion_matrix
     from sklearn.model_selection import learning_curve
     import matplotlib.pyplot as plt
-    import numpy as np
     
     print("\n--- Random Forest Evaluation (Test Set) ---")
     y_pred_rf = best_rf.predict(X_test_vec)
@@ -72,57 +157,106 @@ def train_models():
     print("Confusion Matrix:")
     print(confusion_matrix(y_test, y_pred_rf))
     
-    print("\n--- SVM Evaluation (Test Set) ---")
-    y_pred_svm = svm_model.predict(X_test_vec)
-    print(classification_report(y_test, y_pred_svm))
+    print(f"\n--- Linear Model ({linear}) Evaluation (Test Set) ---")
+    y_pred_linear = linear_model.predict(X_test_sparse)
+    print(classification_report(y_test, y_pred_linear))
 
-    # 7. Learning Curve Analysis
-    print("\n--- Generating Learning Curve ---")
-    try:
-        os.makedirs("reports", exist_ok=True)
-        train_sizes, train_scores, test_scores = learning_curve(
-            best_rf, X_train_vec, y_train, cv=5, n_jobs=-1, 
-            train_sizes=np.linspace(0.1, 1.0, 5), scoring='accuracy'
-        )
+    # 7. Learning Curve Analysis (refits the model 5 sizes x 5 folds)
+    if learning_curve_plot:
+        print("\n--- Generating Learning Curve ---")
+        start = time.perf_counter()
+        try:
+            os.makedirs("reports", exist_ok=True)
+            train_sizes, train_scores, test_scores = learning_curve(
+                best_rf, X_train_vec, y_train, cv=5, n_jobs=-1, 
+                train_sizes=np.linspace(0.1, 1.0, 5), scoring='accuracy'
+            )
         
-        train_scores_mean = np.mean(train_scores, axis=1)
-        test_scores_mean = np.mean(test_scores, axis=1)
+            train_scores_mean = np.mean(train_scores, axis=1)
+            test_scores_mean = np.mean(test_scores, axis=1)
         
-        plt.figure()
-        plt.title("Learning Curve (Random Forest)")
-        plt.xlabel("Training examples")
-        plt.ylabel("Accuracy Score")
-        plt.grid()
+            plt.figure()
+            plt.title("Learning Curve (Random Forest)")
+            plt.xlabel("Training examples")
+            plt.ylabel("Accuracy Score")
+            plt.grid()
         
-        plt.plot(train_sizes, train_scores_mean, 'o-', color="r", label="Training score")
-        plt.plot(train_sizes, test_scores_mean, 'o-', color="g", label="Cross-validation score")
+            plt.plot(train_sizes, train_scores_mean, 'o-', color="r", label="Training score")
+            plt.plot(train_sizes, test_scores_mean, 'o-', color="g", label="Cross-validation score")
         
-        plt.legend(loc="best")
-        plt.savefig("reports/learning_curve.png")
-        print("✅ Learning curve saved to 'reports/learning_curve.png'")
+            plt.legend(loc="best")
+            plt.savefig("reports/learning_curve.png")
+            print("✅ Learning curve saved to 'reports/learning_curve.png'")
         
-        # Textual Analysis for User
-        gap = train_scores_mean[-1] - test_scores_mean[-1]
-        print(f"Final Training Score: {train_scores_mean[-1]:.4f}")
-        print(f"Final CV Score: {test_scores_mean[-1]:.4f}")
-        print(f"Gap: {gap:.4f}")
+            # Textual Analysis for User
+            gap = train_scores_mean[-1] - test_scores_mean[-1]
+            print(f"Final Training Score: {train_scores_mean[-1]:.4f}")
+            print(f"Final CV Score: {test_scores_mean[-1]:.4f}")
+            print(f"Gap: {gap:.4f}")
         
-        if gap > 0.1:
-            print("⚠️  High Variance detected (Overfitting). More data needed.")
-        elif test_scores_mean[-1] < 0.7:
-            print("⚠️  High Bias detected (Underfitting). Model too simple or features poor.")
-        else:
-            print("✅  Good Fit. Model generalizes well.")
+            if gap > 0.1:
+                print("⚠️  High Variance detected (Overfitting). More data needed.")
+            elif test_scores_mean[-1] < 0.7:
+                print("⚠️  High Bias detected (Underfitting). Model too simple or features poor.")
+            else:
+                print("✅  Good Fit. Model generalizes well.")
             
-    except Exception as e:
-        print(f"Error generating learning curve: {e}")
+        except Exception as e:
+            print(f"Error generating learning curve: {e}")
+        timings["learning_curve"] = time.perf_counter() - start
     
     # 8. Save Models
     os.makedirs("models", exist_ok=True)
     joblib.dump(best_rf, "models/rf_model.pkl")
-    joblib.dump(svm_model, "models/svm_model.pkl")
+    joblib.dump(linear_model, os.path.join("models", linear_file))
+    # Held-out split for evaluate.py
+    joblib.dump((X_test_vec, y_test), "models/test_data.pkl")
+    # Same split as raw code for incremental.py, whose updates are judged on it
+    save_holdout(X_test["code"], y_test, "models")
+    
+    # Memory-mappable copy so several API workers share one physical model
+    vectorizer = joblib.load("models/tfidf_vectorizer.pkl")
+    version = compute_model_version("models/rf_model.pkl", "models/tfidf_vectorizer.pkl")
+    export_shared_model(best_rf, vectorizer, version=version)
+    # Single-file bundle, served by predict.load_model from now on (over any older pipeline.pkl)
+    write_bundle(best_rf, vectorizer, "models/model.bundle", version=version, source_version=version, metadata={
+        "n_train": int(X_train_vec.shape[0]),
+        "rf_params": {k: v for k, v in best_rf.get_params().items() if isinstance(v, (int, float, str, type(None)))}
+    })
+    set_active_artifact("bundle", "models")
     
     print("\n✅ Models saved successfully.")
+    
+    print("\n--- Training Time ---")
+    for stage in ("search", "final_fit", "learning_curve"):
+        if stage in timings:
+            print(f"{stage:<15} {timings[stage]:>9.1f}s")
+    return timings
 
 if __name__ == "__main__":
-    train_models()
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the vulnerability models.")
+    parser.add_argument("--linear", choices=LINEAR_KINDS + ("svc",), default="logreg",
+                        help="Linear model trained next to the Random Forest (default: logreg)")
+    parser.add_argument("--search", choices=["grid", "halving"], default="grid",
+                        help="RF hyperparameter search: exhaustive grid or resumable successive halving")
+    parser.add_argument("--resource", choices=RESOURCES, default="n_estimators",
+                        help="Resource grown between successive-halving rungs")
+    parser.add_argument("--factor", type=int, default=DEFAULT_FACTOR)
+    parser.add_argument("--budget", type=float, help="Successive-halving time budget in seconds")
+    parser.add_argument("--results", default=RESULTS_FILE, help="JSONL file used to resume an interrupted search")
+    parser.add_argument("--no-learning-curve", action="store_true")
+    parser.add_argument("--near-duplicates", choices=NEAR_DUPLICATE_MODES, default="keep",
+                        help="Near-copies (MinHash Jaccard >= 0.8): keep them, drop all but one per cluster, "
+                             "or group them so each cluster stays in one split")
+    parser.add_argument("--stream", nargs="+", metavar="PATH",
+                        help="Sample a balanced set from these shard directories/files in one pass "
+                             "instead of loading the whole dataset")
+    parser.add_argument("--per-stratum", type=int, nargs=2, metavar=("VULNERABLE", "SAFE"),
+                        default=(VULNERABLE_PER_STRATUM, SAFE_PER_STRATUM),
+                        help="Reservoir sizes per class x language x source stratum (with --stream)")
+    args = parser.parse_args()
+    train_models(linear=args.linear, search=args.search, resource=args.resource, factor=args.factor,
+                 budget_seconds=args.budget, results_path=args.results,
+                 learning_curve_plot=not args.no_learning_curve, near_duplicates=args.near_duplicates,
+                 stream=args.stream, per_stratum=tuple(args.per_stratum))
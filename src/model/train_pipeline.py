@@ -0,0 +1,78 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import joblib
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GridSearchCV
+from sklearn.metrics import classification_report
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modify.feature_pipeline import add_snippet_features, build_pipeline, FEATURE_COLUMNS
+from modify.preprocessing import split_dataset
+from modify.dedup import MODES as NEAR_DUPLICATE_MODES
+from model.train_model import load_training_data, RF_PARAM_GRID
+from model.predict import set_active_artifact
+
+MODEL_DIR = "models"
+PIPELINE_FILE = "pipeline.pkl"
+CACHE_DIR = os.path.join(MODEL_DIR, "pipeline_cache")
+
+def train_pipeline(df=None, param_grid=RF_PARAM_GRID, cv=5, n_jobs=-1, cache_dir=CACHE_DIR,
+                   model_dir=MODEL_DIR, keep_cache=False, near_duplicates="keep"):
+    """
+    Trains featurisation + RandomForest as a single sklearn Pipeline and saves it
+    to models/pipeline.pkl. TF-IDF is fitted inside every CV fold; the fitted
+    feature step is cached per fold (Pipeline(memory=...)) and shared by all the
+    grid candidates, so the vectorizer is fitted once per fold, not once per
+    candidate and fold. With near_duplicates="group" (or a `cluster` column in
+    df) near-duplicate clusters never straddle the train/test split.
+    """
+    if df is None:
+        df = load_training_data(near_duplicates)
+
+    start = time.perf_counter()
+    df = add_snippet_features(df)
+    print(f"Snippet features precomputed in {time.perf_counter() - start:.1f}s")
+
+    X_train, X_test, y_train, y_test = split_dataset(
+        df[FEATURE_COLUMNS], df['is_vulnerable'], groups=df['cluster'] if 'cluster' in df.columns else None
+    )
+
+    memory = joblib.Memory(cache_dir, verbose=0)
+    pipeline = build_pipeline(RandomForestClassifier(random_state=42), memory=memory)
+    grid = GridSearchCV(pipeline, {f"clf__{name}": values for name, values in param_grid.items()},
+                        cv=cv, n_jobs=n_jobs, verbose=1)
+    start = time.perf_counter()
+    grid.fit(X_train, y_train)
+    print(f"Grid search finished in {time.perf_counter() - start:.1f}s")
+    print(f"Best Params: {grid.best_params_}")
+    print(f"Best CV Score: {grid.best_score_:.4f}")
+
+    best = grid.best_estimator_
+    # The cache is only useful while searching; the saved artifact must not point at it
+    best.set_params(memory=None)
+    if not keep_cache:
+        memory.clear(warn=False)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print("\n--- Pipeline Evaluation (Test Set) ---")
+    print(classification_report(y_test, best.predict(X_test)))
+
+    os.makedirs(model_dir, exist_ok=True)
+    joblib.dump(best, os.path.join(model_dir, PIPELINE_FILE))
+    set_active_artifact("pipeline", model_dir)
+    print(f"✅ Pipeline saved to {os.path.join(model_dir, PIPELINE_FILE)} (now the served model)")
+    return best, grid
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train featurisation + RF as one cached sklearn Pipeline.")
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--keep-cache", action="store_true", help="Keep the fitted-transformer cache for the next run")
+    parser.add_argument("--near-duplicates", choices=NEAR_DUPLICATE_MODES, default="keep",
+                        help="keep, drop (one per cluster) or group (one split per cluster) near-copies")
+    args = parser.parse_args()
+    train_pipeline(cv=args.cv, keep_cache=args.keep_cache, near_duplicates=args.near_duplicates)
@@ -0,0 +1,278 @@
+import os
+import re
+import sys
+import argparse
+import multiprocessing
+from functools import partial
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Near-duplicate detection: MinHash signatures over token shingles, grouped
+# with LSH banding. Two snippets whose shingle sets have a Jaccard similarity
+# above THRESHOLD land in the same cluster with high probability; everything
+# is computed with numpy over whole chunks of snippets, never pair by pair.
+
+INDEX_PATH = "data/minhash_index.npz"
+THRESHOLD = 0.8
+NUM_PERM = 128
+SHINGLE_TOKENS = 5
+SEED = 1
+# Snippets per worker task, and shingles hashed per numpy block (bounds memory)
+CHUNK_DOCS = 512
+BLOCK_SHINGLES = 16384
+MODES = ("keep", "drop", "group")
+
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+UINT32_MAX = np.uint64(0xFFFFFFFF)
+
+def _permutations(num_perm, seed):
+    """Multiply-shift hash functions: h(x) = (a * x + b) >> 32 with a odd (mod 2^64)."""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(0, 2 ** 63, num_perm, dtype=np.int64).astype(np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.randint(0, 2 ** 63, num_perm, dtype=np.int64).astype(np.uint64)
+    return a, b
+
+def shingle_hashes(codes, shingle=SHINGLE_TOKENS):
+    """
+    64-bit hashes of every `shingle`-token window of every snippet, and the
+    index of the snippet each one belongs to. Snippets shorter than one
+    window get a single shingle with all their tokens.
+    """
+    tokens = [TOKEN_RE.findall(code if isinstance(code, str) else "") or [""] for code in codes]
+    lengths = np.fromiter((len(t) for t in tokens), dtype=np.int64, count=len(tokens))
+    hashed = pd.util.hash_array(np.fromiter((tok for t in tokens for tok in t), dtype=object, count=int(lengths.sum())))
+    ends = np.repeat(np.cumsum(lengths), lengths)
+    positions = np.arange(len(hashed))
+    # Window hash: sum of token hashes times per-offset odd multipliers, clipped at the snippet's end
+    multipliers = _permutations(shingle, SEED)[0]
+    padded = np.concatenate([hashed, np.zeros(shingle, dtype=np.uint64)])
+    windows = np.zeros(len(hashed), dtype=np.uint64)
+    for j in range(shingle):
+        windows += np.where(positions + j < ends, padded[j:j + len(hashed)], np.uint64(0)) * multipliers[j]
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    short = np.repeat(lengths < shingle, lengths)
+    valid = (positions + shingle <= ends) | (short & (positions == starts))
+    owners = np.repeat(np.arange(len(codes)), lengths)
+    return windows[valid], owners[valid]
+
+def _chunk_signatures(codes, num_perm, shingle, seed):
+    hashes, owners = shingle_hashes(codes, shingle)
+    a, b = _permutations(num_perm, seed)
+    # (num_perm, shingles) blocks: the per-snippet minimum runs along contiguous rows
+    signatures = np.full((num_perm, len(codes)), UINT32_MAX, dtype=np.uint64)
+    for lo in range(0, len(hashes), BLOCK_SHINGLES):
+        block, owner = hashes[lo:lo + BLOCK_SHINGLES], owners[lo:lo + BLOCK_SHINGLES]
+        values = a[:, None] * block[None, :]
+        values += b[:, None]
+        values >>= np.uint64(32)
+        starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        ids = owner[starts]
+        signatures[:, ids] = np.minimum(signatures[:, ids], np.minimum.reduceat(values, starts, axis=1))
+    return signatures.T.astype(np.uint32)
+
+def minhash_signatures(codes, num_perm=NUM_PERM, shingle=SHINGLE_TOKENS, seed=SEED, workers=None):
+    """(n, num_perm) uint32 MinHash signatures, chunks of CHUNK_DOCS snippets spread over `workers` processes."""
+    codes = list(codes)
+    chunks = [codes[i:i + CHUNK_DOCS] for i in range(0, len(codes), CHUNK_DOCS)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        parts = [_chunk_signatures(chunk, num_perm, shingle, seed) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(partial(_chunk_signatures, num_perm=num_perm, shingle=shingle, seed=seed), chunks))
+    return np.vstack(parts) if parts else np.empty((0, num_perm), dtype=np.uint32)
+
+def lsh_params(threshold=THRESHOLD, num_perm=NUM_PERM):
+    """
+    (bands, rows) with bands * rows <= num_perm that minimises the sum of the
+    false positive and false negative probability mass around `threshold`.
+    """
+    s = np.linspace(0, 1, 201)
+    best, best_error = (1, num_perm), None
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        candidate = 1 - (1 - s ** rows) ** bands
+        error = candidate[s < threshold].sum() + (1 - candidate[s >= threshold]).sum()
+        if best_error is None or error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+def band_keys(signatures, bands, rows):
+    """(n, bands) uint64 bucket keys: one hash of each band of `rows` signature values."""
+    multipliers = _permutations(rows, SEED + 1)[0]
+    values = signatures[:, :bands * rows].astype(np.uint64).reshape(len(signatures), bands, rows)
+    return (values * multipliers).sum(axis=2, dtype=np.uint64)
+
+def candidate_pairs(keys, new=None):
+    """
+    Pairs (i, j) sharing a bucket in some band. Each snippet is paired with
+    the first snippet of its bucket; with `new` (bool mask) only pairs that
+    involve a new snippet are returned.
+    """
+    pairs = []
+    for band in keys.T:
+        order = np.argsort(band, kind="stable")
+        sorted_keys = band[order]
+        first = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        heads = order[np.flatnonzero(first)[np.cumsum(first) - 1]]
+        keep = heads != order
+        if new is not None:
+            keep &= new[order] | new[heads]
+        pairs.append(np.stack([heads[keep], order[keep]], axis=1))
+    if not pairs:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.unique(np.vstack(pairs), axis=0)
+
+def similarity(signatures, pairs):
+    """Estimated Jaccard similarity of each pair: the share of equal MinHash values."""
+    return (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+
+def _representatives(n, edges):
+    """Cluster id of each node: the smallest node of its connected component."""
+    graph = coo_matrix((np.ones(len(edges), dtype=np.int8), (edges[:, 0], edges[:, 1])), shape=(n, n))
+    _, component = connected_components(graph, directed=False)
+    first = np.full(component.max() + 1 if n else 0, n, dtype=np.int64)
+    np.minimum.at(first, component, np.arange(n))
+    return first[component]
+
+class MinHashIndex:
+    """
+    Persistent near-duplicate index keyed by code_hash. Keeps each snippet's
+    signature, LSH band keys and cluster, so new data is checked against
+    everything seen before without recomputing old signatures.
+    """
+    def __init__(self, threshold=THRESHOLD, num_perm=NUM_PERM, shingle=SHINGLE_TOKENS, seed=SEED):
+        self.threshold = threshold
+        self.num_perm, self.shingle, self.seed = num_perm, shingle, seed
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self.band_keys = np.empty((0, self.bands), dtype=np.uint64)
+        self.clusters = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, threshold=THRESHOLD):
+        """
+        The index at `path`, or an empty one. Signatures are reused when the
+        hashing parameters match; a different threshold only re-clusters them.
+        """
+        index = cls(threshold)
+        if not os.path.exists(path):
+            return index
+        with np.load(path) as data:
+            num_perm, shingle, seed = (int(v) for v in data["params"])
+            if (num_perm, shingle, seed) != (index.num_perm, index.shingle, index.seed):
+                print(f"⚠️  {path} was built with other MinHash parameters, rebuilding.")
+                return index
+            index.keys, index.signatures = data["keys"], data["signatures"]
+            if float(data["threshold"]) == threshold:
+                index.band_keys, index.clusters = data["band_keys"], data["clusters"]
+                return index
+        index.band_keys = band_keys(index.signatures, index.bands, index.rows)
+        index.clusters = np.arange(len(index.keys))
+        index._cluster(np.ones(len(index.keys), dtype=bool))
+        return index
+
+    def save(self, path=INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, keys=self.keys, signatures=self.signatures, band_keys=self.band_keys, clusters=self.clusters,
+                 params=np.array([self.num_perm, self.shingle, self.seed]), threshold=np.array(self.threshold))
+        os.replace(tmp, path)
+
+    def _cluster(self, new):
+        """Links the `new` rows to every verified near duplicate and re-labels the clusters."""
+        pairs = candidate_pairs(self.band_keys, new)
+        pairs = pairs[similarity(self.signatures, pairs) >= self.threshold]
+        # Existing clusters stay connected through their representative
+        edges = np.vstack([np.stack([np.arange(len(self.keys)), self.clusters], axis=1), pairs])
+        self.clusters = _representatives(len(self.keys), edges)
+
+    def add(self, keys, codes, workers=None):
+        """Indexes the snippets whose key is not in the index yet. Returns how many were added."""
+        keys = np.asarray(keys, dtype=np.uint64)
+        fresh = ~np.isin(keys, self.keys)
+        fresh[fresh] = ~pd.Series(keys[fresh]).duplicated().to_numpy()
+        if not fresh.any():
+            return 0
+        signatures = minhash_signatures([code for code, f in zip(codes, fresh) if f],
+                                        self.num_perm, self.shingle, self.seed, workers)
+        n = len(self.keys)
+        self.keys = np.concatenate([self.keys, keys[fresh]])
+        self.signatures = np.vstack([self.signatures, signatures])
+        self.band_keys = np.vstack([self.band_keys, band_keys(signatures, self.bands, self.rows)])
+        self.clusters = np.concatenate([self.clusters, np.arange(n, len(self.keys))])
+        self._cluster(np.arange(len(self.keys)) >= n)
+        return int(fresh.sum())
+
+    def clusters_of(self, keys):
+        """Cluster id of each key (-1 if it is not indexed)."""
+        positions = pd.Index(self.keys).get_indexer(np.asarray(keys, dtype=np.uint64))
+        clusters = np.append(self.clusters, -1) # position -1 (not found) picks the sentinel
+        return clusters[positions]
+
+    def query(self, codes, workers=None):
+        """
+        For each snippet, the cluster of its most similar indexed near duplicate
+        (-1 if there is none) and that similarity. The index is not modified.
+        """
+        signatures = minhash_signatures(codes, self.num_perm, self.shingle, self.seed, workers)
+        keys = np.vstack([self.band_keys, band_keys(signatures, self.bands, self.rows)])
+        new = np.arange(len(keys)) >= len(self.keys)
+        pairs = candidate_pairs(keys, new)
+        # Only new-vs-indexed pairs, as (query row, indexed row)
+        pairs = np.sort(pairs, axis=1)[:, ::-1]
+        pairs = pairs[(pairs[:, 0] >= len(self.keys)) & (pairs[:, 1] < len(self.keys))]
+        rows = pairs[:, 0] - len(self.keys)
+        matches = pd.DataFrame({"row": rows, "cluster": self.clusters[pairs[:, 1]],
+                                "score": (signatures[rows] == self.signatures[pairs[:, 1]]).mean(axis=1)})
+        matches = matches[matches["score"] >= self.threshold].sort_values("score").drop_duplicates("row", keep="last")
+        cluster, best = np.full(len(signatures), -1), np.zeros(len(signatures))
+        cluster[matches["row"].to_numpy()] = matches["cluster"].to_numpy()
+        best[matches["row"].to_numpy()] = matches["score"].to_numpy()
+        return cluster, best
+
+def near_duplicate_clusters(codes, threshold=THRESHOLD, workers=None):
+    """Cluster id (position of the first member) of each snippet, without a persistent index."""
+    codes = list(codes)
+    index = MinHashIndex(threshold)
+    index.add(np.arange(len(codes), dtype=np.uint64), codes, workers)
+    return index.clusters
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Near-duplicate index (MinHash + LSH) of the training data.")
+    parser.add_argument("command", choices=["build", "check"])
+    parser.add_argument("files", nargs="*", help="Files to check against the index (check)")
+    parser.add_argument("--index", default=INDEX_PATH)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Jaccard similarity of near duplicates")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from sample.data_loader import load_data
+        df = load_data(columns=["is_vulnerable"], near_duplicates="group", threshold=args.threshold,
+                       index_path=args.index, workers=args.workers)
+        sizes = df["cluster"].value_counts()
+        print(f"✅ {len(df)} snippets, {len(sizes)} clusters; {int((sizes > 1).sum())} clusters of near duplicates "
+              f"hold {int(sizes[sizes > 1].sum())} snippets (threshold {args.threshold}).")
+    else:
+        index = MinHashIndex.load(args.index, args.threshold)
+        codes = []
+        for path in args.files:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                codes.append(f.read())
+        clusters, scores = index.query(codes, args.workers)
+        for path, cluster, score in zip(args.files, clusters, scores):
+            if cluster < 0:
+                print(f"✅ {path}: no near duplicate in the index")
+            else:
+                print(f"⚠️  {path}: near duplicate of indexed cluster {cluster} (Jaccard ≈ {score:.2f})")
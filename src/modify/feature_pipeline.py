@@ -0,0 +1,60 @@
+import os
+import sys
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modify.preprocessing import clean_code, get_complexity, get_ast_depth, get_dangerous_details, numeric_features
+
+TEXT_COLUMN = "clean_code"
+# Same order as extract_features: TF-IDF, then Complexity + AST Depth + Dangerous Calls
+NUMERIC_COLUMNS = ["complexity", "ast_depth", "dangerous_calls"]
+FEATURE_COLUMNS = [TEXT_COLUMN] + NUMERIC_COLUMNS
+
+def snippet_features(code, dangerous_calls=None):
+    """
+    Per-snippet features that need no fitting (cleaned text, complexity, AST depth,
+    rule findings). Pass the finding count if the rules already ran.
+    """
+    if dangerous_calls is None:
+        dangerous_calls = len(get_dangerous_details(code))
+    return {
+        TEXT_COLUMN: clean_code(code),
+        "complexity": get_complexity(code),
+        "ast_depth": get_ast_depth(code),
+        "dangerous_calls": dangerous_calls
+    }
+
+def add_snippet_features(df, code_column="code"):
+    """
+    Precomputes the snippet features once for the whole dataset. They are stateless,
+    so computing them before the CV split leaks nothing, and no fold or grid
+    candidate ever recomputes them. Values the miner stored with the current
+    rule set are reused (see preprocessing.numeric_features).
+    """
+    import pandas as pd
+    features = numeric_features(df, code_column)
+    features.insert(0, TEXT_COLUMN, df[code_column].fillna("").map(clean_code))
+    return pd.concat([df.drop(columns=[c for c in FEATURE_COLUMNS if c in df.columns]), features], axis=1)
+
+def build_feature_transformer(max_features=1000):
+    """TF-IDF on the cleaned code plus the numeric columns passed through unchanged."""
+    from sklearn.compose import ColumnTransformer
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return ColumnTransformer([
+        ("tfidf", TfidfVectorizer(max_features=max_features, token_pattern=r'\b\w+\b'), TEXT_COLUMN),
+        ("numeric", "passthrough", NUMERIC_COLUMNS)
+    ])
+
+def build_pipeline(classifier, memory=None, max_features=1000):
+    """
+    Featurisation + classifier as one estimator. The vectorizer is fitted inside
+    each CV fold (no leakage). With `memory` (a joblib.Memory or cache directory)
+    the fitted feature step is cached, so grid candidates that only change
+    classifier parameters reuse it for the same fold instead of refitting TF-IDF.
+    """
+    from sklearn.pipeline import Pipeline
+    return Pipeline([
+        ("features", build_feature_transformer(max_features)),
+        ("clf", classifier)
+    ], memory=memory)
@@ -0,0 +1,62 @@
+import re
+import numpy as np
+
+# Settings StaticVectorizer reproduces exactly; anything else falls back to sklearn
+SUPPORTED = {"analyzer": ("word",), "ngram_range": ((1, 1), [1, 1]), "strip_accents": (None,)}
+
+class StaticVectorizer:
+    """
+    Transform-only TF-IDF over a fixed vocabulary and IDF, in plain NumPy.
+    Gives the same rows as the fitted TfidfVectorizer it was exported from
+    (word unigrams), without importing sklearn, which dominates the start-up
+    time of a single-file scan.
+    """
+    def __init__(self, vocabulary, idf, params):
+        self.vocabulary_ = {str(term): i for i, term in enumerate(vocabulary)}
+        self.idf_ = np.asarray(idf, dtype=np.float64)
+        self.params = dict(params)
+        self.lowercase = params.get("lowercase", True)
+        self.token_regex = re.compile(params.get("token_pattern", r"(?u)\b\w\w+\b"))
+        self.binary = params.get("binary", False)
+        self.sublinear_tf = params.get("sublinear_tf", False)
+        self.use_idf = params.get("use_idf", True)
+        self.norm = params.get("norm", "l2")
+
+    @staticmethod
+    def supports(params):
+        return all(params.get(name, allowed[0]) in allowed for name, allowed in SUPPORTED.items())
+
+    def _tokens(self, text):
+        # Like sklearn, a pattern with one capturing group yields that group (re.findall does the same)
+        return self.token_regex.findall(text.lower() if self.lowercase else text)
+
+    def transform_dense(self, texts):
+        rows = np.zeros((len(texts), len(self.vocabulary_)))
+        for r, text in enumerate(texts):
+            for token in self._tokens(text):
+                column = self.vocabulary_.get(token)
+                if column is not None:
+                    rows[r, column] += 1
+        if self.binary:
+            np.minimum(rows, 1, out=rows)
+        elif self.sublinear_tf:
+            counted = rows > 0
+            rows[counted] = np.log(rows[counted]) + 1
+        if self.use_idf:
+            rows *= self.idf_
+        if self.norm == "l2":
+            norms = np.sqrt((rows ** 2).sum(axis=1, keepdims=True))
+        elif self.norm == "l1":
+            norms = np.abs(rows).sum(axis=1, keepdims=True)
+        else:
+            return rows
+        norms[norms == 0] = 1.0
+        return rows / norms
+
+    def transform(self, texts):
+        """Sparse rows, like TfidfVectorizer.transform (imports scipy on first use)."""
+        from scipy import sparse
+        return sparse.csr_matrix(self.transform_dense(texts))
+
+    def get_feature_names_out(self):
+        return np.array(sorted(self.vocabulary_, key=self.vocabulary_.get), dtype=object)
@@ -3,97 +3,50 @@ import os
 import numpy as np
 import requests
 import io
+import sys
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sample.dataset_store import read_dataset, code_hash, HASH_COLUMN
+from modify.dedup import MinHashIndex, INDEX_PATH, THRESHOLD
+from sample.synthetic import generate_frame
 
 DATA_PATH = "data/dataset.csv"
+MINED_PATH = "data/mined_dataset.parquet"
+LEGACY_MINED_PATH = "data/mined_dataset.csv"
+DATA_COLUMNS = ["code", "is_vulnerable", "cwe_id"]
 REAL_DATA_URL = "https://raw.githubusercontent.com/ZeoVan/MSR_20_Code_vulnerability_CSV_Dataset/master/all_c_cpp_release2.0.csv"
 
-def generate_synthetic_data(num_samples=100):
-    """Generates a synthetic dataset for demonstration purposes."""
+def generate_synthetic_data(num_samples=100, seed=None, vulnerable=0.5, functions=1, lines=3, external=False, **kwargs):
+    """
+    Generates a synthetic dataset for demonstration purposes: balanced, one
+    short function per snippet by default (see synthetic.generate_table for
+    the options, and synthetic.py for large corpora). Without a seed one is drawn
+    from np.random, so np.random.seed() still makes it reproducible. The
+    external knowledge base examples are only merged when `external`.
+    """
     print("Generating synthetic dataset (Fallback)...")
-    
-    data = []
-    
-    # Vulnerable patterns (C/C++)
-    vuln_patterns_c = [
-        ("strcpy(dest, src);", 1, "CWE-120"),
-        ("gets(buffer);", 1, "CWE-120"),
-        ("sprintf(query, \"SELECT * FROM users WHERE id = '%s'\", user_id);", 1, "CWE-89"),
-        ("strcat(dest, src);", 1, "CWE-120"),
-        ("system(cmd);", 1, "CWE-78"),
-        ("memcpy(dest, src, len);", 1, "CWE-120"),
-        ("printf(user_input);", 1, "CWE-134"),
-        ("char *p = malloc(10); free(p); free(p);", 1, "CWE-415"),
-        ("int *p = NULL; *p = 1;", 1, "CWE-476"),
-    ]
-    
-    # Vulnerable patterns (Python - OWASP)
-    vuln_patterns_py = [
-        ("def login(user): query = 'SELECT * FROM users WHERE name = ' + user", 1, "CWE-89"),
-        ("def exec_cmd(cmd): os.system(cmd)", 1, "CWE-78"),
-        ("def load_yaml(data): yaml.load(data)", 1, "CWE-502"),
-        ("eval(user_input)", 1, "CWE-94"),
-        ("pickle.loads(data)", 1, "CWE-502"),
-        ("subprocess.call(cmd, shell=True)", 1, "CWE-78"),
-        ("input(prompt)", 1, "CWE-20"), # Python 2 input() is eval()
-    ]
-
-    # Vulnerable patterns (Java - OWASP)
-    vuln_patterns_java = [
-        ("String query = \"SELECT * FROM users WHERE name = \" + user;", 1, "CWE-89"),
-        ("Runtime.getRuntime().exec(cmd);", 1, "CWE-78"),
-        ("ObjectInputStream ois = new ObjectInputStream(is); ois.readObject();", 1, "CWE-502"),
-    ]
-
-    vuln_patterns = (vuln_patterns_c + vuln_patterns_py + vuln_patterns_java) * 50
-    
-    # Safe patterns
-    safe_patterns = [
-        ("def login(user): query = 'SELECT * FROM users WHERE name = ?', (user,)", 0, "None"),
-        ("def exec_cmd(cmd): subprocess.run(cmd, shell=False)", 0, "None"),
-        ("def load_yaml(data): yaml.safe_load(data)", 0, "None"),
-        ("strncpy(dest, src, sizeof(dest));", 0, "None"),
-        ("fgets(buffer, sizeof(buffer), stdin);", 0, "None"),
-        ("snprintf(buf, sizeof(buf), \"Safe string\");", 0, "None"),
-        ("printf(\"Hello World\");", 0, "None"),
-        ("int a = 5; int b = 6; int c = a + b;", 0, "None"),
-        ("if (x > 0) { y = x; }", 0, "None"),
-        ("for (int i=0; i<10; i++) { sum += i; }", 0, "None"),
-        ("std::string s = \"safe\";", 0, "None"),
-        ("cout << \"Hello\" << endl;", 0, "None"),
-        ("PreparedStatement pstmt = conn.prepareStatement(\"SELECT * FROM users WHERE name = ?\");", 0, "None"),
-    ] * 50
-    
-    for _ in range(num_samples // 2):
-        item = vuln_patterns[np.random.randint(0, len(vuln_patterns))]
-        data.append(item)
-        
-    for _ in range(num_samples // 2):
-        item = safe_patterns[np.random.randint(0, len(safe_patterns))]
-        data.append(item)
-        
-    df = pd.DataFrame(data, columns=["code", "is_vulnerable", "cwe_id"])
-    
+    if seed is None:
+        seed = np.random.randint(2 ** 31)
+    df = generate_frame(num_samples, seed, vulnerable=vulnerable, functions=functions, lines=lines, **kwargs)[DATA_COLUMNS]
+
     # Integrate External Knowledge Base
-    try:
-        from external_data import VulnerabilityKnowledgeBase
-        kb = VulnerabilityKnowledgeBase()
-        # Fetch if empty, or just load
-        kb.fetch_nvd_data() 
-        df_ext = kb.get_as_dataframe()
-        if not df_ext.empty:
-            print(f"Merging {len(df_ext)} external CVEs into dataset...")
-            # Ensure columns match
-            df_ext = df_ext[['code', 'is_vulnerable']]
-            df_ext['cwe_id'] = "External-CVE"
-            df = pd.concat([df, df_ext], ignore_index=True)
-    except ImportError:
-        print("External data module not found, skipping.")
-    except Exception as e:
-        print(f"Error merging external data: {e}")
-    
-    # Shuffle
-    df = df.sample(frac=1).reset_index(drop=True)
-    
+    if external:
+        try:
+            from external_data import VulnerabilityKnowledgeBase
+            kb = VulnerabilityKnowledgeBase()
+            kb.fetch_nvd_data()
+            df_ext = kb.get_as_dataframe()
+            if not df_ext.empty:
+                print(f"Merging {len(df_ext)} external CVEs into dataset...")
+                df_ext = df_ext[['code', 'is_vulnerable']].assign(cwe_id="External-CVE")
+                df = pd.concat([df, df_ext], ignore_index=True).sample(frac=1, random_state=seed).reset_index(drop=True)
+        except ImportError:
+            print("External data module not found, skipping.")
+        except Exception as e:
+            print(f"Error merging external data: {e}")
+
     os.makedirs(os.path.dirname(DATA_PATH), exist_ok=True)
     df.to_csv(DATA_PATH, index=False)
     print(f"Saved synthetic dataset to {DATA_PATH}")
@@ -165,49 +118,114 @@ def download_real_data():
         return pd.concat(dfs, ignore_index=True)
     return None
 
-def load_data():
-    """Loads the dataset, merging synthetic, downloaded, and mined data."""
-    dfs = []
+def stored_path(path):
+    """The Parquet copy of a CSV dataset when there is one (see dataset_store.py migrate)."""
+    parquet = os.path.splitext(path)[0] + ".parquet"
+    return parquet if os.path.exists(parquet) else path
+
+def load_data(columns=None, rows=None, near_duplicates="keep", threshold=THRESHOLD, index_path=INDEX_PATH,
+              workers=None):
+    """
+    Loads the dataset, merging synthetic, downloaded, and mined data.
+    `columns` projects the result: label-only callers (EDA, balancing) never
+    read `code` from Parquet sources, since duplicates are found by code_hash.
+    `rows` keeps those positions of the merged, deduplicated data; only their
+    code is read.
+    `near_duplicates` handles snippets whose Jaccard similarity is above
+    `threshold` (see modify/dedup.py): "keep" them, "drop" all but the first
+    of each cluster, or "group" them under a `cluster` column for the split.
+    """
+    columns = list(columns or DATA_COLUMNS)
+    if near_duplicates == "group" and "cluster" not in columns:
+        columns.append("cluster")
+    with_code = "code" in columns and rows is None
+    read_columns = [c for c in columns if c not in ("code", "cluster")] + (["code"] if with_code else []) + [HASH_COLUMN]
+    sources = [] # (path or None, frame); None: generated in memory
     
     # 1. Existing Synthetic/Downloaded Data
     if os.path.exists(DATA_PATH):
-        print(f"Loading base dataset from {DATA_PATH}")
-        dfs.append(pd.read_csv(DATA_PATH))
+        path = stored_path(DATA_PATH)
+        print(f"Loading base dataset from {path}")
+        sources.append((path, read_dataset(path, read_columns)))
     else:
         # Try download or generate
         df_base = download_real_data()
         if df_base is None:
             df_base = generate_synthetic_data()
-        dfs.append(df_base)
+        sources.append((None, df_base.assign(**{HASH_COLUMN: code_hash(df_base["code"])})))
 
     # 2. Mined Real Data (Massive)
-    mined_path = "data/mined_dataset.csv"
+    mined_path = MINED_PATH if os.path.exists(MINED_PATH) else LEGACY_MINED_PATH
     if os.path.exists(mined_path):
         print(f"Loading mined real dataset from {mined_path}")
         try:
-            df_mined = pd.read_csv(mined_path)
+            df_mined = read_dataset(mined_path, read_columns)
             # Ensure compatibility
-            if 'cwe_id' not in df_mined.columns:
+            if 'cwe_id' in columns and 'cwe_id' not in df_mined.columns:
                 df_mined['cwe_id'] = "None"
-            
-            # Keep only relevant columns
-            df_mined = df_mined[['code', 'is_vulnerable', 'cwe_id']]
-            dfs.append(df_mined)
+            sources.append((mined_path, df_mined))
         except Exception as e:
             print(f"Error loading mined data: {e}")
 
     # Merge all sources
-    if not dfs:
-        return pd.DataFrame(columns=["code", "is_vulnerable", "cwe_id"])
+    if not sources:
+        return pd.DataFrame(columns=columns)
         
-    full_df = pd.concat(dfs, ignore_index=True)
+    full_df = pd.concat([df.assign(_source=i, _row=np.arange(len(df))) for i, (_, df) in enumerate(sources)],
+                        ignore_index=True)
     
     # Deduplicate
     initial_len = len(full_df)
-    full_df.drop_duplicates(subset=['code'], inplace=True)
+    full_df.drop_duplicates(subset=[HASH_COLUMN], inplace=True)
     print(f"Merged dataset size: {len(full_df)} (Dropped {initial_len - len(full_df)} duplicates)")
+
+    if near_duplicates != "keep":
+        full_df["cluster"] = _near_duplicate_clusters(sources, full_df, threshold, index_path, workers)
+        if near_duplicates == "drop":
+            initial_len = len(full_df)
+            full_df = full_df[~full_df["cluster"].duplicated()]
+            print(f"Dropped {initial_len - len(full_df)} near duplicates (Jaccard >= {threshold})")
+        else:
+            print(f"{full_df['cluster'].nunique()} near-duplicate clusters (Jaccard >= {threshold})")
+
+    if rows is not None:
+        full_df = full_df.iloc[rows]
+        if "code" in columns:
+            full_df["code"] = _read_code(sources, full_df)
     
-    return full_df
+    # Optional columns (e.g. the miner's stored features) are NaN for sources without them
+    return full_df.reindex(columns=columns).reset_index(drop=True)
+
+def _near_duplicate_clusters(sources, full_df, threshold, index_path, workers):
+    """
+    Near-duplicate cluster of every row, from the persistent MinHash index.
+    Only snippets the index has not seen yet are read and signed.
+    """
+    index = MinHashIndex.load(index_path, threshold)
+    keys = full_df[HASH_COLUMN].to_numpy(np.uint64)
+    missing = index.clusters_of(keys) < 0
+    if missing.any():
+        selected = full_df[missing]
+        codes = selected["code"] if "code" in selected.columns else _read_code(sources, selected)
+        added = index.add(keys[missing], codes, workers)
+        index.save(index_path)
+        print(f"Near-duplicate index: {added} new snippets added ({len(index)} total)")
+    return index.clusters_of(keys)
+
+def _read_code(sources, selected):
+    """Code of the selected rows only, read source by source."""
+    code = pd.Series(index=selected.index, dtype=object)
+    for i, (path, df) in enumerate(sources):
+        mask = (selected["_source"] == i).to_numpy()
+        positions = selected["_row"].to_numpy()[mask]
+        if path is None:
+            code[mask] = df["code"].to_numpy()[positions]
+            continue
+        order = np.argsort(positions)
+        values = np.empty(len(positions), dtype=object)
+        values[order] = read_dataset(path, ["code"], rows=positions[order])["code"].to_numpy()
+        code[mask] = values
+    return code
 
 if __name__ == "__main__":
     df = load_data()
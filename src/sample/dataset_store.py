@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Datasets are stored as Parquet: columnar, zstd-compressed, with the
+# low-cardinality label columns dictionary-encoded and min/max statistics per
+# row group. Readers project columns, so anything that only needs labels never
+# touches the `code` column. CSV is still read, for old and hand-made datasets.
+
+LABEL_COLUMNS = ["is_vulnerable", "cwe_id", "language", "source"]
+DICTIONARY_COLUMNS = ["cwe_id", "language", "source", "ruleset_version"]
+# Content hash of `code`, stored next to it: duplicates can be dropped without reading the code
+HASH_COLUMN = "code_hash"
+ROW_GROUP_ROWS = 4096
+BATCH_ROWS = 1024
+COMPRESSION = "zstd"
+
+def is_parquet(path):
+    return path.endswith(".parquet")
+
+def code_hash(codes):
+    """Vectorised 64-bit hash of every snippet (stable across runs and machines)."""
+    return pd.util.hash_pandas_object(pd.Series(codes, dtype=object), index=False).to_numpy(np.uint64)
+
+def to_table(df):
+    """DataFrame -> Arrow table with the dataset's column types (and code_hash if code is present)."""
+    df = df.reset_index(drop=True)
+    if "code" in df.columns and HASH_COLUMN not in df.columns:
+        df = df.assign(**{HASH_COLUMN: code_hash(df["code"])})
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, name in enumerate(table.column_names):
+        column = table.column(i)
+        if name in DICTIONARY_COLUMNS:
+            if not pa.types.is_dictionary(column.type):
+                column = pc.dictionary_encode(column.cast(pa.string()))
+            column = column.cast(pa.dictionary(pa.int32(), pa.string()))
+        elif name == "is_vulnerable":
+            column = column.cast(pa.int8())
+        elif name == "code":
+            column = column.cast(pa.string())
+        table = table.set_column(i, name, column)
+    return table
+
+class DatasetWriter:
+    """
+    Streams DataFrames into one Parquet file, a row group per ROW_GROUP_ROWS
+    rows. Written to a temp file and renamed on close, so readers never see a
+    half-written dataset.
+    """
+    def __init__(self, path, row_group_rows=ROW_GROUP_ROWS):
+        self.path = path
+        self.row_group_rows = row_group_rows
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df):
+        """Appends a DataFrame (or an Arrow table already in the dataset's types)."""
+        table = df if isinstance(df, pa.Table) else to_table(df)
+        if self._writer is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._writer = pq.ParquetWriter(
+                self.path + ".tmp", table.schema, compression=COMPRESSION,
+                use_dictionary=[name for name in table.column_names if name in DICTIONARY_COLUMNS])
+        elif table.schema != self._writer.schema:
+            table = table.select(self._writer.schema.names).cast(self._writer.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_rows)
+        self.rows += len(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            os.replace(self.path + ".tmp", self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        elif self._writer is not None:
+            self._writer.close()
+            os.remove(self.path + ".tmp")
+
+def write_dataset(df, path):
+    with DatasetWriter(path) as writer:
+        writer.write(df)
+    return path
+
+def dataset_columns(path):
+    if is_parquet(path):
+        return pq.read_schema(path).names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+def iter_batches(path, columns=None, batch_rows=BATCH_ROWS):
+    """
+    Streams a dataset as DataFrames of up to `batch_rows` rows, reading only
+    `columns`. code_hash is computed on the fly for CSVs (and old Parquet files).
+    """
+    available = dataset_columns(path)
+    wanted = available if columns is None else [c for c in columns if c in available]
+    derive_hash = columns is not None and HASH_COLUMN in columns and HASH_COLUMN not in available
+    read = wanted + (["code"] if derive_hash and "code" not in wanted else [])
+    if is_parquet(path):
+        batches = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=read))
+    else:
+        batches = pd.read_csv(path, usecols=read, chunksize=batch_rows)
+    for df in batches:
+        if derive_hash:
+            df[HASH_COLUMN] = code_hash(df["code"])
+        yield df[[c for c in columns if c in df.columns] if columns is not None else wanted]
+
+def read_dataset(path, columns=None, rows=None):
+    """
+    Loads a dataset (Parquet or CSV) with only `columns`. `rows` (sorted
+    positions) keeps just those rows, batch by batch, so the code of the
+    others is never held in memory.
+    """
+    available = dataset_columns(path)
+    if rows is None and is_parquet(path) and (columns is None or HASH_COLUMN not in columns or HASH_COLUMN in available):
+        return pq.read_table(path, columns=[c for c in (columns or available) if c in available]).to_pandas()
+    frames, start = [], 0
+    rows = None if rows is None else np.asarray(rows)
+    for df in iter_batches(path, columns):
+        batch_start, start = start, start + len(df)
+        if rows is not None:
+            lo, hi = np.searchsorted(rows, [batch_start, start])
+            df = df.iloc[rows[lo:hi] - batch_start]
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+def migrate_csv(csv_path, output=None, batch_rows=ROW_GROUP_ROWS):
+    """Converts a CSV dataset to Parquet without loading it whole. Returns the output path."""
+    output = output or os.path.splitext(csv_path)[0] + ".parquet"
+    with DatasetWriter(output) as writer:
+        for df in pd.read_csv(csv_path, chunksize=batch_rows):
+            writer.write(df)
+    csv_mb, parquet_mb = os.path.getsize(csv_path) / 1024 ** 2, os.path.getsize(output) / 1024 ** 2
+    print(f"✅ {csv_path} ({csv_mb:.1f} MB) -> {output} ({parquet_mb:.1f} MB, {writer.rows} rows)")
+    return output
+
+def describe(path):
+    """Row groups with their row counts and label statistics (from the footer, no data read)."""
+    meta = pq.ParquetFile(path).metadata
+    names = [meta.schema.column(i).name for i in range(meta.num_columns)]
+    groups = []
+    for g in range(meta.num_row_groups):
+        group = meta.row_group(g)
+        info = {"rows": group.num_rows, "bytes": group.total_byte_size}
+        if "is_vulnerable" in names:
+            stats = group.column(names.index("is_vulnerable")).statistics
+            if stats is not None and stats.has_min_max:
+                info["is_vulnerable"] = [stats.min, stats.max]
+        groups.append(info)
+    return {"rows": meta.num_rows, "columns": names, "row_groups": groups}
+
+def _peak_rss_mb():
+    """High-water mark of this process's RSS (Linux /proc; ru_maxrss would include the parent's before exec)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _measure(kind, path):
+    """Runs in a fresh interpreter: load time and peak RSS of one way of reading `path`."""
+    start = time.perf_counter()
+    if kind == "csv":
+        df = pd.read_csv(path)
+    elif kind == "parquet":
+        df = read_dataset(path)
+    elif kind == "labels":
+        df = read_dataset(path, ["is_vulnerable", "cwe_id"])
+    else:
+        df = pd.DataFrame()
+    return {"seconds": time.perf_counter() - start, "rows": len(df), "peak_mb": _peak_rss_mb()}
+
+def benchmark(csv_path, parquet_path=None):
+    """Load time and peak memory: whole CSV vs whole Parquet vs Parquet labels only."""
+    parquet_path = parquet_path or os.path.splitext(csv_path)[0] + ".parquet"
+    if not os.path.exists(parquet_path):
+        migrate_csv(csv_path, parquet_path)
+    rows = []
+    print(f"{'read':<22} {'size (MB)':>10} {'time (s)':>9} {'peak RSS (MB)':>14}")
+    for kind, path in (("baseline", parquet_path), ("csv", csv_path), ("parquet", parquet_path), ("labels", parquet_path)):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "_measure", kind, path],
+                             check=True, capture_output=True, text=True).stdout
+        result = dict(json.loads(out.splitlines()[-1]), read=kind, size_mb=os.path.getsize(path) / 1024 ** 2)
+        rows.append(result)
+        print(f"{kind:<22} {result['size_mb']:>10.1f} {result['seconds']:>9.2f} {result['peak_mb']:>14.0f}")
+    return rows
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "_measure":
+        print(json.dumps(_measure(sys.argv[2], sys.argv[3])))
+        sys.exit(0)
+    parser = argparse.ArgumentParser(description="Parquet dataset storage: migrate CSVs, inspect, benchmark.")
+    parser.add_argument("command", choices=["migrate", "info", "benchmark"])
+    parser.add_argument("path", help="CSV to migrate/benchmark, or Parquet file to inspect")
+    parser.add_argument("--output", help="Parquet path (default: next to the CSV)")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate_csv(args.path, args.output)
+    elif args.command == "info":
+        print(json.dumps(describe(args.path), indent=4))
+    else:
+        benchmark(args.path, args.output)
@@ -0,0 +1,90 @@
+import os
+import subprocess
+
+# Tree entries that are not regular files: symlinks and submodule commits
+SKIPPED_MODES = {"120000", "160000"}
+
+class GitError(RuntimeError):
+    """A git command failed or returned something unexpected."""
+
+def _git(repo, *args):
+    try:
+        return subprocess.run(["git", "-C", repo] + list(args), check=True, capture_output=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise GitError(f"git {' '.join(args)} failed: {e.stderr.decode('utf-8', 'replace').strip()}")
+
+def resolve_commit(repo, rev="HEAD"):
+    """Full commit id for `rev` in `repo` (bare or not)."""
+    return _git(repo, "rev-parse", "--verify", f"{rev}^{{commit}}").decode().strip()
+
+def list_blobs(repo, rev="HEAD", include=None):
+    """
+    Lists the files of a commit straight from the object database with
+    `git ls-tree -r -l`: [(path, blob_oid, size)]. `include(path)` filters paths.
+    Nothing is checked out.
+    """
+    out = _git(repo, "ls-tree", "-r", "-z", "-l", "--full-tree", rev)
+    blobs = []
+    for entry in out.split(b"\0"):
+        if not entry:
+            continue
+        meta, path = entry.split(b"\t", 1)
+        mode, kind, oid, size = meta.decode().split()
+        path = path.decode("utf-8", "surrogateescape")
+        if kind != "blob" or mode in SKIPPED_MODES:
+            continue
+        if include is not None and not include(path):
+            continue
+        blobs.append((path, oid, int(size)))
+    return blobs
+
+class CatFileBatch:
+    """
+    One long-lived `git cat-file --batch` process: every blob is requested by
+    OID over its stdin pipe and read back from stdout, instead of starting a
+    git process (or touching the disk) per file.
+    """
+    def __init__(self, repo):
+        self.repo = repo
+        self.proc = subprocess.Popen(["git", "-C", repo, "cat-file", "--batch"],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def read(self, oid):
+        """Returns the raw bytes of an object. Raises KeyError if it is missing."""
+        self.proc.stdin.write(oid.encode() + b"\n")
+        self.proc.stdin.flush()
+        header = self.proc.stdout.readline().split()
+        if len(header) == 2 and header[1] == b"missing":
+            raise KeyError(oid)
+        if len(header) != 3:
+            raise GitError(f"Unexpected cat-file reply for {oid}: {header!r}")
+        size = int(header[2])
+        data = self.proc.stdout.read(size)
+        self.proc.stdout.read(1) # Trailing newline after the contents
+        return data
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.stdin.close()
+            self.proc.wait()
+        self.proc.stdout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_blob_sources(repo, rev="HEAD", include=None, max_size=None):
+    """Yields (path, blob_oid, bytes) for every matching file of `rev`."""
+    blobs = list_blobs(repo, rev, include)
+    with CatFileBatch(repo) as batch:
+        for path, oid, size in blobs:
+            if max_size is not None and size > max_size:
+                continue
+            yield path, oid, batch.read(oid)
+
+def is_git_repository(path):
+    return os.path.isdir(path) and subprocess.run(
+        ["git", "-C", path, "rev-parse", "--git-dir"], capture_output=True
+    ).returncode == 0
@@ -0,0 +1,219 @@
+import os
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError: # Windows: no advisory locks, single-process use only
+    fcntl = None
+
+MIRROR_ENV = "VULNSCAN_MIRRORS"
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+# Touched on every use; eviction removes the mirrors with the oldest stamp first
+STAMP_FILE = "vulnscan-last-used"
+# Branches and tags only: a --mirror clone also fetches refs/pull/* and other
+# hosting refs, which on large GitHub projects is more than the code itself
+REFSPECS = ("+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*")
+
+def default_mirror_root():
+    """$VULNSCAN_MIRRORS, else the user's cache directory."""
+    if os.environ.get(MIRROR_ENV):
+        return os.environ[MIRROR_ENV]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "vulnscan", "mirrors")
+
+def mirror_name(url):
+    """Readable and unique per remote: <repo>-<hash of the URL>.git"""
+    repo = url.rstrip("/").split("/")[-1].replace(".git", "") or "repo"
+    return f"{repo}-{hashlib.sha1(url.encode('utf-8')).hexdigest()[:12]}.git"
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def _git(*args):
+    return subprocess.run(["git"] + list(args), check=True, capture_output=True, text=True).stdout
+
+class MirrorCache:
+    """
+    One bare clone per remote under `root`, holding its branches and tags
+    (see REFSPECS). The first use clones; every later use runs `git fetch
+    --prune`, which only transfers the objects the mirror is missing. With
+    `depth` only the default branch is kept, shallow (enough to read HEAD's
+    files, as the miner does). Scans read the mirror's object database
+    directly (see git_objects.py) or get a throw-away `git worktree`.
+
+    Each mirror has a lock file that users hold shared from before the update
+    until they are done, so eviction (least recently used first, down to
+    `max_bytes` in total) can never remove a mirror between its update and
+    its use; a second lock file serialises updates of the same mirror.
+    """
+    def __init__(self, root=None, max_bytes=DEFAULT_MAX_BYTES, depth=None):
+        self.root = os.path.abspath(root or default_mirror_root())
+        self.max_bytes = max_bytes
+        self.depth = depth
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, url):
+        return os.path.join(self.root, mirror_name(url))
+
+    @contextmanager
+    def _lock(self, name, shared=False, blocking=True):
+        """Advisory lock on <root>/<name>.lock. Yields False if non-blocking and busy."""
+        with open(os.path.join(self.root, name + ".lock"), "a") as handle:
+            if fcntl is None:
+                yield True
+                return
+            mode = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+            try:
+                fcntl.flock(handle, mode)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _configure(self, path):
+        """
+        Sets the refs `git fetch` updates. Refs outside them (hosting refs of a
+        mirror cloned with --mirror, other branches of a shallow one) are
+        deleted, and their objects pruned once.
+        """
+        if self.depth:
+            branch = _git("-C", path, "symbolic-ref", "HEAD").strip()
+            refspecs, keep = [f"+{branch}:{branch}"], lambda ref: ref == branch
+        else:
+            refspecs, keep = list(REFSPECS), lambda ref: ref.startswith(("refs/heads/", "refs/tags/"))
+        _git("-C", path, "config", "--replace-all", "remote.origin.fetch", refspecs[0])
+        for refspec in refspecs[1:]:
+            _git("-C", path, "config", "--add", "remote.origin.fetch", refspec)
+        stale = [ref for ref in _git("-C", path, "for-each-ref", "--format=%(refname)").split() if not keep(ref)]
+        if stale:
+            subprocess.run(["git", "-C", path, "update-ref", "--stdin"], check=True, capture_output=True, text=True,
+                           input="".join(f"delete {ref}\n" for ref in stale))
+            _git("-C", path, "gc", "--prune=now", "--quiet")
+
+    def _update(self, url, path):
+        shallow = ["--depth", str(self.depth), "--no-tags"] if self.depth else []
+        if os.path.isdir(path):
+            print(f"🔄 Updating mirror {os.path.basename(path)} (fetch)...")
+            self._configure(path)
+            _git("-C", path, "fetch", "--prune", "--quiet", *shallow, "origin")
+            _git("-C", path, "worktree", "prune")
+            return
+        print(f"⬇️  Creating mirror of {url}...")
+        # Cloned next to its final path and renamed, so a failed clone leaves nothing behind
+        tmp = tempfile.mkdtemp(prefix=".clone-", dir=self.root)
+        try:
+            _git("clone", "--bare", "--quiet", *shallow, url, os.path.join(tmp, "mirror.git"))
+            self._configure(os.path.join(tmp, "mirror.git"))
+            os.replace(os.path.join(tmp, "mirror.git"), path)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    @contextmanager
+    def mirror(self, url, refresh=True, stale_ok=False):
+        """
+        Yields the path of an up-to-date bare mirror of `url`, which stays
+        locked against eviction from before the update until the block exits.
+        refresh=False skips the fetch when a mirror already exists; with
+        stale_ok a failed fetch falls back to the mirror already on disk.
+        """
+        path = self.path(url)
+        name = os.path.basename(path)
+        with self._lock(name, shared=True):
+            with self._lock(name + ".update"):
+                if refresh or not os.path.isdir(path):
+                    try:
+                        self._update(url, path)
+                    except (subprocess.CalledProcessError, OSError) as e:
+                        if not (stale_ok and os.path.isdir(path)):
+                            raise
+                        print(f"⚠️  Fetching {url} failed ({getattr(e, 'stderr', None) or e}), using the cached mirror")
+            with open(os.path.join(path, STAMP_FILE), "w") as stamp:
+                stamp.write(str(time.time()))
+            self.evict()
+            yield path
+
+    @contextmanager
+    def worktree(self, url, rev="HEAD", refresh=True):
+        """Yields a temporary detached checkout of `rev` that shares the mirror's objects."""
+        with self.mirror(url, refresh) as path:
+            target = tempfile.mkdtemp(prefix="worktree_")
+            try:
+                _git("-C", path, "worktree", "add", "--detach", "--force", target, rev)
+                yield target
+            finally:
+                subprocess.run(["git", "-C", path, "worktree", "remove", "--force", target], capture_output=True)
+                shutil.rmtree(target, ignore_errors=True)
+
+    def entries(self):
+        """Cached mirrors, least recently used first: [{name, url, size, last_used}]."""
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not name.endswith(".git") or not os.path.isdir(path):
+                continue
+            try:
+                last_used = os.path.getmtime(os.path.join(path, STAMP_FILE))
+            except OSError:
+                last_used = os.path.getmtime(path)
+            url = subprocess.run(["git", "-C", path, "config", "--get", "remote.origin.url"],
+                                 capture_output=True, text=True).stdout.strip()
+            entries.append({"name": name, "url": url, "size": _dir_size(path), "last_used": last_used})
+        return sorted(entries, key=lambda e: e["last_used"])
+
+    def evict(self, max_bytes=None):
+        """Removes least recently used mirrors until the cache fits; busy mirrors are kept. Returns the names removed."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        removed = []
+        with self._lock(".evict"):
+            entries = self.entries()
+            total = sum(e["size"] for e in entries)
+            for entry in entries:
+                if total <= max_bytes:
+                    break
+                with self._lock(entry["name"], blocking=False) as acquired:
+                    if not acquired:
+                        continue
+                    shutil.rmtree(os.path.join(self.root, entry["name"]), ignore_errors=True)
+                total -= entry["size"]
+                removed.append(entry["name"])
+        for name in removed:
+            print(f"🧹 Evicted mirror {name}")
+        return removed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local cache of bare repository mirrors.")
+    parser.add_argument("command", choices=["list", "fetch", "evict"])
+    parser.add_argument("url", nargs="?", help="Remote to create or update (fetch)")
+    parser.add_argument("--root", help=f"Cache directory (default: ${MIRROR_ENV} or ~/.cache/vulnscan/mirrors)")
+    parser.add_argument("--max-gb", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 3)
+    parser.add_argument("--depth", type=int, help="Shallow mirrors of the default branch only (fetch)")
+    args = parser.parse_args()
+
+    cache = MirrorCache(args.root, int(args.max_gb * 1024 ** 3), depth=args.depth)
+    if args.command == "fetch":
+        if not args.url:
+            parser.error("fetch needs a URL")
+        with cache.mirror(args.url) as path:
+            print(f"✅ {path}")
+    elif args.command == "evict":
+        cache.evict()
+    else:
+        for entry in reversed(cache.entries()):
+            used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))
+            print(f"{entry['size'] / 1024 ** 2:>9.1f} MB  {used}  {entry['name']}  {entry['url']}")
@@ -0,0 +1,196 @@
+import os
+import sys
+import glob
+import json
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import coo_matrix
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modify.rules import KNOWLEDGE_BASE, RULES, RULE_IDS, RULESET_VERSION
+from sample.dataset_store import DatasetWriter, ROW_GROUP_ROWS
+from sample.repo_miner import SHARD_DIR, OUTPUT_PATH, MANIFEST_FILE, MinerManifest
+
+# Bulk weak labelling: every rule runs once over a whole column of code with
+# Arrow's vectorised regex matching instead of once per line from Python, so
+# a stored corpus can be relabelled after a rule edit without re-mining it.
+# Results match get_dangerous_details() line for line.
+
+PATTERNS = list(KNOWLEDGE_BASE)
+RULE_CWES = [info.get("cwe", "N/A") for _, info in RULES]
+# Columns derived from the rules; complexity and AST depth do not depend on them
+RULE_COLUMNS = ["is_vulnerable", "cwe_id", "findings", "rule_counts", "dangerous_calls", "ruleset_version"]
+# ASCII characters Python's \s matches but RE2's does not (\v and the file,
+# group, record and unit separators)
+RE2_BLIND_SPACE = "[\\x0b\\x1c-\\x1f]"
+
+def rule_hits(codes):
+    """
+    Runs every rule over `codes` (an Arrow string array or any sequence of
+    str). Returns (counts, hits): a sparse (snippets x rules) CSR matrix of
+    matching lines, and the (snippet, line, rule) triples behind it.
+
+    Like get_dangerous_details, rules match line by line. Each rule first
+    runs on whole snippets to find the candidates, then only their lines are
+    checked. Lines with non-ASCII text, or with whitespace RE2 does not
+    count as \\s (RE2_BLIND_SPACE), use Python's re, whose \\w and \\s are
+    Unicode-aware where RE2's are not.
+    """
+    if not isinstance(codes, (pa.Array, pa.ChunkedArray)):
+        codes = pa.array(codes, pa.string(), from_pandas=True)
+    if isinstance(codes, pa.ChunkedArray):
+        codes = codes.combine_chunks()
+    codes = pc.fill_null(codes.cast(pa.string()), "")
+    lines = pc.split_pattern(codes, "\n")
+    flat = pc.list_flatten(lines)
+    parents = pc.list_parent_indices(lines).to_numpy()
+    offsets = lines.offsets.to_numpy()
+    line_numbers = np.arange(len(flat)) - offsets[parents] + 1
+    python_lines = (~pc.string_is_ascii(flat).to_numpy(zero_copy_only=False)
+                    | pc.match_substring_regex(flat, RE2_BLIND_SPACE).to_numpy(zero_copy_only=False))
+    python_snippets = np.zeros(len(codes), dtype=bool)
+    python_snippets[parents[python_lines]] = True
+
+    snippets, numbers, rules = [], [], []
+    for r, ((regex, _), pattern) in enumerate(zip(RULES, PATTERNS)):
+        candidates = pc.match_substring_regex(codes, "(?m)" + pattern).to_numpy(zero_copy_only=False) | python_snippets
+        idx = np.flatnonzero(candidates[parents])
+        if not len(idx):
+            continue
+        matched = pc.match_substring_regex(flat.take(pa.array(idx)), pattern).to_numpy(zero_copy_only=False)
+        in_python = np.flatnonzero(python_lines[idx])
+        if len(in_python):
+            texts = flat.take(pa.array(idx[in_python])).to_pylist()
+            matched[in_python] = [regex.search(text) is not None for text in texts]
+        idx = idx[matched]
+        snippets.append(parents[idx])
+        numbers.append(line_numbers[idx])
+        rules.append(np.full(len(idx), r))
+    hits = tuple(np.concatenate(parts) if parts else np.empty(0, dtype=np.int64) for parts in (snippets, numbers, rules))
+    counts = coo_matrix((np.ones(len(hits[0]), dtype=np.int32), (hits[0], hits[2])),
+                        shape=(len(codes), len(RULES))).tocsr()
+    return counts, hits
+
+def labels_from_hits(counts):
+    """is_vulnerable and cwe_id (sorted, ';'-joined CWEs of the rules hit; "None" if none) of every snippet."""
+    present = counts > 0
+    is_vulnerable = np.asarray(present.sum(axis=1)).ravel() > 0
+    cwes = sorted(set(RULE_CWES))
+    to_cwe = coo_matrix((np.ones(len(RULE_CWES)), (np.arange(len(RULE_CWES)), [cwes.index(c) for c in RULE_CWES])),
+                        shape=(len(RULE_CWES), len(cwes))).tocsr()
+    cwe_sets = (present @ to_cwe).toarray() > 0
+    # Few distinct CWE combinations: build each label once
+    combos, inverse = np.unique(cwe_sets, axis=0, return_inverse=True)
+    names = np.array([";".join(c for c, on in zip(cwes, combo) if on) or "None" for combo in combos], dtype=object)
+    return is_vulnerable.astype(np.int8), names[inverse.ravel()]
+
+def findings_json(n, hits):
+    """The findings and rule_counts columns the miner stores (see preprocessing.stored_features)."""
+    findings = np.full(n, "[]", dtype=object)
+    rule_counts = np.full(n, "{}", dtype=object)
+    snippets, numbers, rules = hits
+    # get_dangerous_details order: by line, then rule
+    order = np.lexsort((rules, numbers, snippets))
+    snippets, numbers, rules = snippets[order], numbers[order], rules[order]
+    starts = np.flatnonzero(np.r_[True, snippets[1:] != snippets[:-1]]) if len(snippets) else []
+    for start, end in zip(starts, list(starts[1:]) + [len(snippets)]):
+        ids = [RULE_IDS[r] for r in rules[start:end]]
+        findings[snippets[start]] = json.dumps([[rule_id, int(line)] for rule_id, line in zip(ids, numbers[start:end])])
+        rule_counts[snippets[start]] = json.dumps({RULE_IDS[r]: int(c) for r, c in zip(*np.unique(rules[start:end], return_counts=True))})
+    return findings, rule_counts
+
+def relabel_frame(df, codes=None):
+    """df with its rule-derived columns recomputed from `code` (or the Arrow array `codes`) with the current rule set."""
+    counts, hits = rule_hits(df["code"] if codes is None else codes)
+    is_vulnerable, cwe_id = labels_from_hits(counts)
+    findings, rule_counts = findings_json(len(df), hits)
+    return df.assign(is_vulnerable=is_vulnerable, cwe_id=cwe_id, findings=findings, rule_counts=rule_counts,
+                     dangerous_calls=np.asarray(counts.sum(axis=1)).ravel(), ruleset_version=RULESET_VERSION)
+
+def relabel_file(path, force=False, dry_run=False):
+    """
+    Relabels one Parquet dataset row group by row group (rewritten atomically).
+    Files already labelled with this rule set are skipped unless `force`.
+    Returns {path, rows, changed, vulnerable, skipped}.
+    """
+    parquet = pq.ParquetFile(path)
+    stats = {"path": path, "rows": parquet.metadata.num_rows, "changed": 0, "vulnerable": 0, "skipped": False}
+    if not force and "ruleset_version" in parquet.schema_arrow.names:
+        versions = pq.read_table(path, columns=["ruleset_version"]).column(0).unique().to_pylist()
+        if versions == [RULESET_VERSION]:
+            stats["skipped"] = True
+            return stats
+    def relabelled_batches():
+        for batch in parquet.iter_batches(batch_size=ROW_GROUP_ROWS):
+            df = batch.to_pandas()
+            relabelled = relabel_frame(df, batch.column("code"))
+            stats["changed"] += int((relabelled["is_vulnerable"].to_numpy() != df["is_vulnerable"].to_numpy()).sum())
+            stats["vulnerable"] += int(relabelled["is_vulnerable"].sum())
+            yield relabelled
+    if dry_run:
+        for _ in relabelled_batches():
+            pass
+    else:
+        with DatasetWriter(path) as writer:
+            for relabelled in relabelled_batches():
+                writer.write(relabelled)
+    return stats
+
+def expand_paths(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True)))
+        elif os.path.exists(path) and path.endswith(".parquet"):
+            files.append(path)
+        elif os.path.exists(path):
+            print(f"⚠️  {path}: only Parquet datasets can be relabelled (see dataset_store.py migrate)")
+    return files
+
+def relabel(paths=(SHARD_DIR, OUTPUT_PATH), workers=None, force=False, dry_run=False, shard_dir=SHARD_DIR):
+    """
+    Relabels every Parquet file under `paths`, one process per file at a
+    time, and refreshes the per-repository vulnerable counts in the miner's
+    manifest. Returns the per-file stats.
+    """
+    files = expand_paths(paths)
+    workers = min(workers or os.cpu_count() or 1, max(len(files), 1))
+    if workers <= 1:
+        results = [relabel_file(path, force, dry_run) for path in files]
+    else:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(relabel_file, files, [force] * len(files), [dry_run] * len(files)))
+
+    manifest_path = os.path.join(shard_dir, MANIFEST_FILE)
+    if not dry_run and os.path.exists(manifest_path):
+        manifest = MinerManifest(manifest_path)
+        repos = {os.path.basename(os.path.dirname(s["path"])) for s in results if not s["skipped"]
+                 and os.path.dirname(os.path.dirname(os.path.abspath(s["path"]))) == os.path.abspath(shard_dir)}
+        for name in sorted(repos):
+            if manifest.get(name):
+                parts = glob.glob(os.path.join(shard_dir, name, "part-*.parquet"))
+                manifest.update(name, vulnerable=sum(
+                    int(pc.sum(pq.read_table(part, columns=["is_vulnerable"]).column(0)).as_py() or 0) for part in parts))
+
+    relabelled = [s for s in results if not s["skipped"]]
+    print(f"✅ Relabelled {sum(s['rows'] for s in relabelled)} snippets in {len(relabelled)} files "
+          f"({len(results) - len(relabelled)} already up to date) with rule set {RULESET_VERSION}: "
+          f"{sum(s['changed'] for s in relabelled)} labels changed")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Relabel stored datasets with the current rule set, without re-mining.")
+    parser.add_argument("paths", nargs="*", default=[SHARD_DIR, OUTPUT_PATH], help="Shard directories or Parquet files")
+    parser.add_argument("--workers", type=int, help="Files relabelled in parallel (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Relabel files already at the current rule set")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many labels would change")
+    args = parser.parse_args()
+    relabel(args.paths, args.workers, args.force, args.dry_run)
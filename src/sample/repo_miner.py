@@ -1,16 +1,41 @@
 import os
+import json
+import shutil
+import hashlib
+import argparse
+import threading
+import multiprocessing
 import subprocess
 import pandas as pd
-import shutil
+import pyarrow.parquet as pq
 import sys
 import time
+from collections import deque
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 # Add src to sys.path to import preprocessing
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from modify.preprocessing import get_dangerous_details
+from modify.preprocessing import get_dangerous_details, stored_features, STORED_FEATURE_COLUMNS
+from sample.git_objects import iter_blob_sources, list_blobs, resolve_commit, CatFileBatch
+from sample.mirror_cache import MirrorCache
+from sample.dataset_store import DatasetWriter, write_dataset
 
 DATA_DIR = "data/mined_repos"
-OUTPUT_CSV = "data/mined_dataset.csv"
+OUTPUT_PATH = "data/mined_dataset.parquet"
+SHARD_DIR = "data/mined_shards"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 3
+COLUMNS = ["code", "is_vulnerable", "cwe_id", "source", "language"] + STORED_FEATURE_COLUMNS
+# Files per shard: the unit of parallel work and of checkpointing
+CHUNK_FILES = 256
+PARALLEL_REPOS = 4
+MEMORY_BUDGET_MB = 512
+# The miner only reads HEAD's files: its mirrors are single-branch, depth-1
+# clones in data/mined_repos, under a budget of their own (the scanners' cache
+# in ~/.cache keeps DEFAULT_MAX_BYTES)
+MIRROR_DEPTH = 1
+MIRROR_MAX_GB = 40
 
 # Top Open Source Repositories by Language
 # Selected for high quality and variety of code patterns
@@ -53,31 +78,67 @@ REPOS = {
     "alamofire": "https://github.com/Alamofire/Alamofire.git"
 }
 
-def clone_repo(name, url):
-    """Clones a repository to the data directory."""
-    target_dir = os.path.join(DATA_DIR, name)
-    
-    if os.path.exists(target_dir):
-        print(f"Repo {name} already exists. Skipping clone.")
-        return target_dir
-        
-    print(f"Cloning {name} from {url}...")
-    try:
-        # Depth 1 to save space and time
-        subprocess.check_call(["git", "clone", "--depth", "1", url, target_dir])
-        return target_dir
-    except Exception as e:
-        print(f"Error cloning {name}: {e}")
+MIN_FILE_CHARS = 50
+MAX_FILE_CHARS = 100000
+EXTENSIONS = {".py", ".java", ".c", ".cpp", ".h", ".js", ".ts", ".tsx", ".go", ".rb", ".cs", ".swift"}
+
+def fetch_repo(name, url, mirrors, refresh=True):
+    """
+    Creates or updates the cached bare mirror of a repository. Returns a context
+    manager yielding the mirror path (locked against eviction while mining).
+    The first run clones; later runs only fetch new objects. If the fetch
+    fails, an existing mirror is used as it is.
+    """
+    if refresh:
+        print(f"Fetching {name} from {url}...")
+    return mirrors.mirror(url, refresh=refresh, stale_ok=True)
+
+def is_mined_path(path):
+    """Same files mine_files walks: known extension, no hidden or test directories."""
+    parts = path.split("/")
+    if any(d.startswith('.') or 'test' in d.lower() for d in parts[:-1]):
+        return False
+    return os.path.splitext(path)[1] in EXTENSIONS
+
+def label_file(content, repo_name, ext):
+    """
+    Weakly labels one file with the knowledge base; None for tiny or huge files.
+    The findings and numeric features are kept too, so training never reruns the rules.
+    """
+    # Skip tiny files or huge files
+    if len(content) < MIN_FILE_CHARS or len(content) > MAX_FILE_CHARS:
         return None
 
+    # Weak Supervision: Auto-labeling
+    # Use our Knowledge Base to detect potential vulnerabilities
+    findings = get_dangerous_details(content)
+    is_vulnerable = 1 if len(findings) > 0 else 0
+
+    # Extract CWEs if vulnerable
+    cwe_ids = sorted(set([f.get('cwe', 'N/A') for f in findings])) if is_vulnerable else ["None"]
+
+    return {
+        "code": content,
+        "is_vulnerable": is_vulnerable,
+        "cwe_id": ";".join(cwe_ids),
+        "source": repo_name,
+        "language": ext,
+        **stored_features(content, findings)
+    }
+
+def decode_file(data):
+    """Bytes to text the way mine_files reads files (text mode: universal newlines)."""
+    return data.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+
+def _report(data):
+    print(f"  - Processed: {len(data)} files")
+    print(f"  - Potential Vulnerabilities: {sum(row['is_vulnerable'] for row in data)}")
+
 def mine_files(repo_dir, repo_name):
     """Walks through the repo, extracts code, and auto-labels it."""
     data = []
-    extensions = {".py", ".java", ".c", ".cpp", ".h", ".js", ".ts", ".tsx", ".go", ".rb", ".cs", ".swift"}
     
     print(f"Scanning {repo_name}...")
-    file_count = 0
-    vuln_count = 0
     
     for root, dirs, files in os.walk(repo_dir):
         # Skip hidden and test directories to reduce noise
@@ -85,72 +146,281 @@ def mine_files(repo_dir, repo_name):
         
         for file in files:
             ext = os.path.splitext(file)[1]
-            if ext in extensions:
+            if ext in EXTENSIONS:
                 filepath = os.path.join(root, file)
                 try:
                     with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-                        content = f.read()
-                        
-                        # Skip tiny files or huge files
-                        if len(content) < 50 or len(content) > 100000:
-                            continue
-                            
-                        # Weak Supervision: Auto-labeling
-                        # Use our Knowledge Base to detect potential vulnerabilities
-                        findings = get_dangerous_details(content)
-                        is_vulnerable = 1 if len(findings) > 0 else 0
-                        
-                        # Extract CWEs if vulnerable
-                        cwe_ids = list(set([f.get('cwe', 'N/A') for f in findings])) if is_vulnerable else ["None"]
-                        
-                        data.append({
-                            "code": content,
-                            "is_vulnerable": is_vulnerable,
-                            "cwe_id": ";".join(cwe_ids),
-                            "source": repo_name,
-                            "language": ext
-                        })
-                        
-                        file_count += 1
-                        if is_vulnerable:
-                            vuln_count += 1
-                            
+                        row = label_file(f.read(), repo_name, ext)
+                    if row is not None:
+                        data.append(row)
                 except Exception:
                     pass
                     
-    print(f"  - Processed: {file_count} files")
-    print(f"  - Potential Vulnerabilities: {vuln_count}")
+    _report(data)
+    return data
+
+def mine_git_tree(mirror, repo_name, rev="HEAD"):
+    """Like mine_files, but reads the files of `rev` straight from a (bare) repository's objects."""
+    data = []
+    print(f"Scanning {repo_name}...")
+    # UTF-8 takes at most 4 bytes per character: larger blobs can't pass label_file
+    for path, _, blob in iter_blob_sources(mirror, rev, include=is_mined_path, max_size=4 * MAX_FILE_CHARS):
+        row = label_file(decode_file(blob), repo_name, os.path.splitext(path)[1])
+        if row is not None:
+            data.append(row)
+    _report(data)
     return data
 
-def run_miner():
+class ByteBudget:
+    """
+    Caps the source bytes in flight (read, but not yet written to a shard)
+    across every repository being mined at once.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, n, timeout=None):
+        """Returns False if `n` bytes did not fit within `timeout` seconds."""
+        with self._cond:
+            # A chunk larger than the whole budget still runs, on its own
+            fits = self._cond.wait_for(lambda: not self.used or self.used + n <= self.limit, timeout)
+            if fits:
+                self.used += n
+            return fits
+
+    def release(self, n):
+        with self._cond:
+            self.used -= n
+            self._cond.notify_all()
+
+class MinerManifest:
+    """
+    Checkpoint of the shards written so far, one entry per repository:
+    {fingerprint, chunk_files, files, parts, rows, vulnerable, status}.
+    Rewritten atomically after every shard, so a crash loses at most the
+    chunks that were in flight.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.repos = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            # Shards of another format version are mined again
+            if state.get("version") == MANIFEST_VERSION:
+                self.repos = state.get("repos", {})
+
+    def get(self, name):
+        with self._lock:
+            return dict(self.repos.get(name, {}))
+
+    def update(self, name, **fields):
+        with self._lock:
+            self.repos.setdefault(name, {}).update(fields)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump({"version": MANIFEST_VERSION, "repos": self.repos}, f, indent=2)
+            os.replace(tmp, self.path)
+
+def _is_repository(path):
+    """A bare mirror or the top of a checkout (not a plain directory inside another repository)."""
+    return os.path.exists(os.path.join(path, ".git")) or (
+        os.path.isfile(os.path.join(path, "HEAD")) and os.path.isdir(os.path.join(path, "objects")))
+
+def list_repo_files(repo_path):
+    """
+    (fingerprint, files) for a repository to mine, in a stable order. Git
+    repositories list HEAD's blobs (fingerprint: the commit); plain directories,
+    like old clones in data/mined_repos, are walked (fingerprint: paths, sizes, mtimes).
+    """
+    if _is_repository(repo_path):
+        commit = resolve_commit(repo_path)
+        # UTF-8 takes at most 4 bytes per character: larger blobs can't pass label_file
+        files = [(path, oid) for path, oid, size in list_blobs(repo_path, commit, include=is_mined_path)
+                 if size <= 4 * MAX_FILE_CHARS]
+        return commit, files
+    files = []
+    for root, dirs, names in os.walk(repo_path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and 'test' not in d.lower())
+        for name in sorted(names):
+            if os.path.splitext(name)[1] in EXTENSIONS:
+                files.append((os.path.relpath(os.path.join(root, name), repo_path), None))
+    digest = hashlib.sha1()
+    for path, _ in files:
+        info = os.stat(os.path.join(repo_path, path))
+        digest.update(f"{path}:{info.st_size}:{info.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return "tree-" + digest.hexdigest(), files
+
+def iter_repo_chunks(repo_path, files, chunk_files, first_chunk=0):
+    """Yields (index, [(path, bytes)]) for every chunk from `first_chunk` on; earlier files are never read."""
+    batch = CatFileBatch(repo_path) if _is_repository(repo_path) else None
+    try:
+        for index in range(first_chunk, (len(files) + chunk_files - 1) // chunk_files):
+            chunk = []
+            for path, oid in files[index * chunk_files:(index + 1) * chunk_files]:
+                if batch is not None:
+                    chunk.append((path, batch.read(oid)))
+                else:
+                    with open(os.path.join(repo_path, path), "rb") as f:
+                        chunk.append((path, f.read()))
+            yield index, chunk
+    finally:
+        if batch is not None:
+            batch.close()
+
+def label_chunk(repo_name, chunk):
+    """Process-pool task: decodes and weakly labels one chunk of files."""
+    rows = []
+    for path, data in chunk:
+        row = label_file(decode_file(data), repo_name, os.path.splitext(path)[1])
+        if row is not None:
+            rows.append(row)
+    return rows
+
+def _part_path(shard_dir, name, index):
+    return os.path.join(shard_dir, name, f"part-{index:05d}.parquet")
+
+def write_part(shard_dir, name, index, rows):
+    write_dataset(pd.DataFrame(rows, columns=COLUMNS), _part_path(shard_dir, name, index))
+
+def mine_repo(name, repo_path, pool, budget, manifest, shard_dir=SHARD_DIR, chunk_files=CHUNK_FILES):
+    """
+    Mines one repository into <shard_dir>/<name>/part-NNNNN.parquet, one shard per
+    chunk of `chunk_files` files, labelled on the process pool. Resumes after
+    the last shard in the manifest when the repository has not changed since;
+    a finished, unchanged repository is skipped.
+    """
+    fingerprint, files = list_repo_files(repo_path)
+    state = manifest.get(name)
+    resumable = state.get("fingerprint") == fingerprint and state.get("chunk_files") == chunk_files
+    if resumable and state.get("status") == "done":
+        print(f"⏭️  {name}: already mined ({state['rows']} files)")
+        return
+    if not resumable:
+        shutil.rmtree(os.path.join(shard_dir, name), ignore_errors=True)
+        state = {"parts": 0, "rows": 0, "vulnerable": 0}
+    elif state["parts"]:
+        print(f"🔁 {name}: resuming after {state['parts']} shards")
+    os.makedirs(os.path.join(shard_dir, name), exist_ok=True)
+    manifest.update(name, fingerprint=fingerprint, chunk_files=chunk_files, files=len(files),
+                    parts=state["parts"], rows=state["rows"], vulnerable=state["vulnerable"], status="partial")
+
+    pending = deque()
+    def write_ready(wait=False):
+        # Shards are written in chunk order, so `parts` is always a prefix
+        while pending and (wait or pending[0][2].done()):
+            index, size, future = pending.popleft()
+            rows = future.result()
+            write_part(shard_dir, name, index, rows)
+            budget.release(size)
+            state["rows"] += len(rows)
+            state["vulnerable"] += sum(row["is_vulnerable"] for row in rows)
+            progress = {"parts": index + 1, "rows": state["rows"], "vulnerable": state["vulnerable"]}
+            manifest.update(name, **progress)
+
+    try:
+        for index, chunk in iter_repo_chunks(repo_path, files, chunk_files, state["parts"]):
+            size = sum(len(data) for _, data in chunk)
+            while not budget.acquire(size, timeout=0.1):
+                write_ready()
+            pending.append((index, size, pool.submit(label_chunk, name, chunk)))
+            write_ready()
+        write_ready(wait=True)
+    finally:
+        for _, size, _ in pending:
+            budget.release(size)
+    manifest.update(name, status="done")
+    print(f"✅ {name}: {state['rows']} files, {state['vulnerable']} potentially vulnerable")
+
+def _mine_source(name, url, mirrors, data_dir, offline, mine):
+    """
+    Mines the mirror (fetched first unless offline), else an existing old-style
+    clone in data_dir. The mirror stays locked from the fetch until mining ends.
+    """
+    if not offline or os.path.isdir(mirrors.path(url)):
+        mining = False
+        try:
+            with fetch_repo(name, url, mirrors, refresh=not offline) as mirror:
+                mining = True
+                return mine(mirror)
+        except (subprocess.CalledProcessError, OSError) as e:
+            if mining:
+                raise
+            print(f"⚠️  {name}: fetch failed ({getattr(e, 'stderr', None) or e}), using the local copy")
+    legacy = os.path.join(data_dir, name)
+    if os.path.isdir(legacy):
+        return mine(legacy)
+    print(f"⚠️  {name}: no local copy, skipped")
+
+def merge_shards(manifest, names, shard_dir=SHARD_DIR, output=OUTPUT_PATH):
+    """Appends every written shard to one Parquet dataset, one shard in memory at a time."""
+    with DatasetWriter(output) as writer:
+        for name in names:
+            for index in range(manifest.get(name).get("parts", 0)):
+                writer.write(pq.read_table(_part_path(shard_dir, name, index)))
+
+def run_miner(repos=REPOS, data_dir=DATA_DIR, shard_dir=SHARD_DIR, output=OUTPUT_PATH, workers=None,
+              parallel_repos=PARALLEL_REPOS, memory_mb=MEMORY_BUDGET_MB, chunk_files=CHUNK_FILES, offline=False,
+              mirror_max_gb=MIRROR_MAX_GB):
+    """
+    Mines `repos` concurrently (`parallel_repos` at a time) and labels their
+    files on a pool of `workers` processes, with at most `memory_mb` of source
+    in flight. Every chunk becomes a shard recorded in the manifest, so a rerun
+    skips finished repositories and resumes interrupted ones. offline=True
+    mines only what is already in data_dir. Mirrors beyond `mirror_max_gb`
+    are evicted, least recently mined first.
+    """
     print("Starting Massive Repository Miner...")
-    print("Note: This process requires significant internet bandwidth and disk space.")
-    os.makedirs(DATA_DIR, exist_ok=True)
-    
-    all_data = []
-    
-    for name, url in REPOS.items():
-        repo_dir = clone_repo(name, url)
-        if repo_dir:
-            repo_data = mine_files(repo_dir, name)
-            all_data.extend(repo_data)
-            
-            # Optional: Delete repo after mining to save space
-            # shutil.rmtree(repo_dir)
-            
-    if all_data:
-        df = pd.DataFrame(all_data)
-        
-        # Basic Stats
-        print("\n--- Mining Stats ---")
-        print(f"Total Samples: {len(df)}")
-        print(df['is_vulnerable'].value_counts())
-        print(df['language'].value_counts())
-        
-        df.to_csv(OUTPUT_CSV, index=False)
-        print(f"\nMined dataset saved to {OUTPUT_CSV}")
-    else:
+    if not offline:
+        print("Note: This process requires significant internet bandwidth and disk space.")
+    os.makedirs(shard_dir, exist_ok=True)
+    mirrors = MirrorCache(data_dir, int(mirror_max_gb * 1024 ** 3), depth=MIRROR_DEPTH)
+    manifest = MinerManifest(os.path.join(shard_dir, MANIFEST_FILE))
+    budget = ByteBudget(int(memory_mb * 1024 ** 2))
+
+    # Spawned, not forked: forking while the repo threads hold locks can deadlock the workers
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    with pool, ThreadPoolExecutor(parallel_repos, thread_name_prefix="miner") as threads:
+        futures = {}
+        for name, url in repos.items():
+            mine = partial(mine_repo, name, pool=pool, budget=budget, manifest=manifest,
+                           shard_dir=shard_dir, chunk_files=chunk_files)
+            futures[threads.submit(_mine_source, name, url, mirrors, data_dir, offline, mine)] = name
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Error mining {futures[future]}: {e}")
+
+    # Basic Stats
+    print("\n--- Mining Stats ---")
+    total = vulnerable = 0
+    for name in repos:
+        state = manifest.get(name)
+        if state:
+            print(f"{name:<22} {state['status']:<8} {state['rows']:>8} files {state['vulnerable']:>8} vulnerable")
+            total += state["rows"]
+            vulnerable += state["vulnerable"]
+    if not total:
         print("No data mined.")
+        return
+    print(f"Total Samples: {total} ({vulnerable} potentially vulnerable)")
+    merge_shards(manifest, list(repos), shard_dir, output)
+    print(f"\nMined dataset saved to {output}")
 
 if __name__ == "__main__":
-    run_miner()
+    parser = argparse.ArgumentParser(description="Mine and weakly label source files from open-source repositories.")
+    parser.add_argument("--offline", action="store_true", help="Don't fetch; mine the copies already in data/mined_repos")
+    parser.add_argument("--workers", type=int, help="Labelling processes (default: one per CPU)")
+    parser.add_argument("--parallel-repos", type=int, default=PARALLEL_REPOS)
+    parser.add_argument("--memory-mb", type=float, default=MEMORY_BUDGET_MB, help="Source bytes in flight at most")
+    parser.add_argument("--chunk-files", type=int, default=CHUNK_FILES, help="Files per shard")
+    parser.add_argument("--repos", nargs="+", choices=sorted(REPOS), help="Only these repositories")
+    parser.add_argument("--mirror-max-gb", type=float, default=MIRROR_MAX_GB, help="Size limit of data/mined_repos")
+    args = parser.parse_args()
+    selected = {name: REPOS[name] for name in args.repos} if args.repos else REPOS
+    run_miner(selected, workers=args.workers, parallel_repos=args.parallel_repos, memory_mb=args.memory_mb,
+              chunk_files=args.chunk_files, offline=args.offline, mirror_max_gb=args.mirror_max_gb)
@@ -0,0 +1,166 @@
+import os
+import sys
+import glob
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sample.dataset_store import iter_batches, dataset_columns, is_parquet, write_dataset, code_hash, HASH_COLUMN
+from sample.repo_miner import SHARD_DIR, COLUMNS
+
+# Balanced training sets from corpora larger than RAM: one pass over the
+# dataset shards keeps a reservoir per stratum (class x language x source).
+# A row's place in its reservoir is decided by a seeded hash of its code, so
+# the sample does not depend on shard order and the same seed always gives
+# the same rows. Only reservoir members ever have their code read.
+
+STRATA = ["is_vulnerable", "language", "source"]
+KEY_COLUMN = "_key"
+VULNERABLE_PER_STRATUM = 2000
+SAFE_PER_STRATUM = 2000
+# Same cap as train_model.balance_rows: at most 1.2 safe samples per vulnerable one
+SAFE_RATIO = 1.2
+SEED = 42
+OUTPUT_PATH = "data/balanced_sample.parquet"
+
+def sample_keys(hashes, seed=SEED):
+    """Uniform, seeded 64-bit sort key of each row, from its code_hash."""
+    # hash_array ignores hash_key for numbers, so the seed is mixed into the input
+    salt = pd.util.hash_array(np.array([seed], dtype=np.uint64))[0]
+    return pd.util.hash_array(np.asarray(hashes, dtype=np.uint64) ^ salt)
+
+def expand_paths(paths):
+    """Dataset files: Parquet/CSV files as given, directories expanded to their shards (sorted)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True)))
+        elif os.path.exists(path):
+            files.append(path)
+    return files
+
+def iter_label_batches(path):
+    """
+    Yields (labels, read_payload) per row group (Parquet) or chunk (CSV):
+    labels has the strata, cwe_id and code_hash; read_payload(positions)
+    returns the code (and the miner's stored features) of those rows of the
+    batch as a DataFrame. Parquet payload is only read on request.
+    """
+    available = dataset_columns(path)
+    label_columns = [c for c in STRATA + ["cwe_id"] if c in available]
+    payload = [c for c in COLUMNS if c in available and c not in label_columns]
+    if is_parquet(path) and HASH_COLUMN in available:
+        parquet = pq.ParquetFile(path)
+        for group in range(parquet.num_row_groups):
+            labels = parquet.read_row_group(group, columns=label_columns + [HASH_COLUMN]).to_pandas()
+            yield labels, lambda positions, group=group: parquet.read_row_group(
+                group, columns=payload).take(positions).to_pandas()
+        return
+    for batch in iter_batches(path, label_columns + payload):
+        batch = batch.reset_index(drop=True)
+        rest = batch[payload]
+        labels = batch[label_columns].assign(**{HASH_COLUMN: code_hash(rest["code"])})
+        yield labels, lambda positions, rest=rest: rest.iloc[positions].reset_index(drop=True)
+
+def _normalise(labels):
+    """Strata as plain columns; datasets without a language or source column count as "unknown"."""
+    labels = labels.copy()
+    for column in STRATA + ["cwe_id"]:
+        if column not in labels.columns:
+            labels[column] = "unknown" if column != "cwe_id" else "None"
+        elif column != "is_vulnerable":
+            labels[column] = labels[column].astype(object).fillna("unknown")
+    labels["is_vulnerable"] = labels["is_vulnerable"].astype(np.int8)
+    return labels
+
+class StratifiedReservoir:
+    """
+    Bottom-k reservoir per stratum: each stratum keeps the rows with the
+    smallest seeded keys, `vulnerable` or `safe` of them depending on the
+    class. Identical snippets share a key; they are kept once per stratum
+    while streaming and once overall by sample().
+    """
+    def __init__(self, vulnerable=VULNERABLE_PER_STRATUM, safe=SAFE_PER_STRATUM, seed=SEED):
+        self.caps = {1: vulnerable, 0: safe}
+        self.seed = seed
+        self.rows = None
+        self.seen = 0
+
+    def offer(self, labels, read_payload):
+        """Considers one batch; reads the code (payload) of the rows that enter a reservoir."""
+        self.seen += len(labels)
+        batch = labels.assign(**{KEY_COLUMN: sample_keys(labels[HASH_COLUMN], self.seed), "_pos": np.arange(len(labels))})
+        merged = batch if self.rows is None else pd.concat([self.rows.assign(_pos=-1), batch], ignore_index=True)
+        # Deduplicated within a stratum only: dropping a copy because another
+        # stratum holds it would make each reservoir depend on shard order
+        merged = merged.sort_values([KEY_COLUMN] + STRATA).drop_duplicates(STRATA + [HASH_COLUMN])
+        rank = merged.groupby(STRATA, sort=False, observed=True).cumcount()
+        merged = merged[rank.to_numpy() < merged["is_vulnerable"].map(self.caps).to_numpy()]
+        entering = merged["_pos"].to_numpy() >= 0
+        if entering.any():
+            positions = merged["_pos"].to_numpy()[entering]
+            order = np.argsort(positions)
+            payload = read_payload(positions[order])
+            payload.index = merged.index[entering][order]
+            entered = merged[entering].drop(columns=payload.columns, errors="ignore").join(payload)
+            merged = pd.concat([merged[~entering], entered])
+        self.rows = merged.drop(columns="_pos")
+
+    def sample(self, ratio=SAFE_RATIO):
+        """
+        The balanced set: every reservoir row, with the safe class capped at
+        `ratio` times the vulnerable one (smallest keys kept), in key order.
+        A snippet held by several strata (the same code in several repos) is
+        kept once, in the first of them by value, never by arrival order.
+        """
+        if self.rows is None:
+            return pd.DataFrame(columns=COLUMNS)
+        rows = self.rows.sort_values([KEY_COLUMN] + STRATA).drop_duplicates(HASH_COLUMN)
+        vulnerable = int((rows["is_vulnerable"] == 1).sum())
+        if ratio is not None and vulnerable:
+            safe_rank = (rows["is_vulnerable"] == 0).cumsum()
+            rows = rows[(rows["is_vulnerable"] == 1) | (safe_rank <= int(vulnerable * ratio))]
+        return rows.reindex(columns=COLUMNS).reset_index(drop=True)
+
+    def summary(self):
+        """Rows held per stratum."""
+        if self.rows is None:
+            return pd.DataFrame(columns=STRATA + ["rows"])
+        return self.rows.groupby(STRATA, observed=True).size().rename("rows").reset_index()
+
+def build_balanced_sample(paths=(SHARD_DIR,), vulnerable=VULNERABLE_PER_STRATUM, safe=SAFE_PER_STRATUM,
+                          seed=SEED, ratio=SAFE_RATIO, output=None):
+    """
+    One streaming pass over the dataset files in `paths` (shard directories,
+    Parquet or CSV). Memory is bounded by the reservoir sizes, not the corpus.
+    Returns the balanced DataFrame (and writes it to `output` if given).
+    """
+    files = expand_paths(paths)
+    if not files:
+        raise FileNotFoundError(f"No dataset files in {list(paths)}")
+    reservoir = StratifiedReservoir(vulnerable, safe, seed)
+    for path in files:
+        for labels, read_payload in iter_label_batches(path):
+            reservoir.offer(_normalise(labels), read_payload)
+    df = reservoir.sample(ratio)
+    print(f"Streamed {reservoir.seen} rows from {len(files)} files into {len(reservoir.summary())} strata: "
+          f"Safe={int((df['is_vulnerable'] == 0).sum())}, Vulnerable={int(df['is_vulnerable'].sum())}")
+    if output:
+        write_dataset(df, output)
+        print(f"✅ Balanced sample saved to {output}")
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build a balanced training sample in one streaming pass.")
+    parser.add_argument("paths", nargs="*", default=[SHARD_DIR], help="Shard directories or dataset files")
+    parser.add_argument("--vulnerable", type=int, default=VULNERABLE_PER_STRATUM, help="Reservoir size per vulnerable stratum")
+    parser.add_argument("--safe", type=int, default=SAFE_PER_STRATUM, help="Reservoir size per safe stratum")
+    parser.add_argument("--ratio", type=float, default=SAFE_RATIO, help="Max safe/vulnerable ratio of the result")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+    build_balanced_sample(args.paths, args.vulnerable, args.safe, args.seed, args.ratio, args.output)
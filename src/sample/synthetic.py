@@ -0,0 +1,354 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from concurrent.futures import ProcessPoolExecutor
+
+# Add src to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modify.rules import get_dangerous_details
+from sample.dataset_store import write_dataset
+from sample.repo_miner import SHARD_DIR, MANIFEST_FILE, MinerManifest, _part_path
+
+# Seeded synthetic corpora for tests, benchmarks and load tests, built offline.
+# Every file is several functions assembled from per-language pools of lines;
+# a vulnerable file has one line swapped for a dangerous sink. All sampling is
+# done with numpy and the text is joined with Arrow kernels, so there is no
+# Python loop per snippet. Labels agree with the rule engine by construction.
+
+SEED = 42
+LANGUAGE_MIX = {".py": 0.4, ".c": 0.25, ".java": 0.2, ".js": 0.1, ".go": 0.05}
+VULNERABLE_RATE = 0.2
+# Mean functions per file and lines per function (both Poisson, at least 1)
+FUNCTIONS = 4
+LINES = 6
+ROWS_PER_PART = 65536
+FILES_PER_DIR = 256
+SOURCE = "synthetic"
+
+VERBS = ["load", "parse", "build", "read", "write", "handle", "render", "check", "compute", "fetch",
+         "store", "merge", "scan", "format", "encode", "decode", "open", "close", "apply", "resolve"]
+NOUNS = ["config", "buffer", "request", "user", "session", "record", "packet", "token", "node", "entry",
+         "header", "payload", "cache", "index", "path", "message", "frame", "table", "stream", "item"]
+DIRS = ["core", "util", "net", "io", "api", "db", "auth", "cli", "web", "model"]
+
+# Per language: file header and footer, function opening (before and after
+# the name) and closing, safe body lines and dangerous sink lines.
+LANGUAGES = {
+    ".py": {
+        "header": "import os\nimport json\nimport logging\n\nlogger = logging.getLogger(__name__)\n\n",
+        "footer": "\n",
+        "open": ["def ", "(value, options=None):"],
+        "close": "    return result",
+        "lines": [
+            "    result = []",
+            "    options = options or {}",
+            "    size = len(value)",
+            "    name = str(value).strip()",
+            "    logger.debug('processing %s', name)",
+            "    items = [x for x in value if x]",
+            "    total = sum(items) if items else 0",
+            "    path = os.path.join('data', name)",
+            "    text = json.dumps(options)",
+            "    result = {'name': name, 'size': size}",
+            "    if not value:\n        return None",
+            "    for key in sorted(options):\n        logger.info('option %s', key)",
+        ],
+        "sinks": [
+            "    result = eval(value)",
+            "    os.system(value)",
+            "    result = pickle.loads(value)",
+            "    subprocess.call(value, shell=True)",
+            "    result = yaml.load(value)",
+            "    query = 'SELECT * FROM users WHERE name = ' + value",
+        ],
+    },
+    ".c": {
+        "header": "#include <stdio.h>\n#include <stdlib.h>\n#include <string.h>\n\n",
+        "footer": "\n",
+        "open": ["int ", "(const char *input, size_t len) {"],
+        "close": "    return 0;\n}",
+        "lines": [
+            "    char buffer[256];",
+            "    size_t count = 0;",
+            "    int status = -1;",
+            "    strncpy(buffer, input, sizeof(buffer) - 1);",
+            "    buffer[sizeof(buffer) - 1] = '\\0';",
+            "    snprintf(buffer, sizeof(buffer), \"%zu\", len);",
+            "    count = strlen(buffer);",
+            "    if (input == NULL) {\n        return -1;\n    }",
+            "    for (size_t i = 0; i < len; i++) {\n        count += input[i] != 0;\n    }",
+            "    memset(buffer, 0, sizeof(buffer));",
+            "    status = count > 0 ? 0 : 1;",
+        ],
+        "sinks": [
+            "    strcpy(buffer, input);",
+            "    gets(buffer);",
+            "    system(input);",
+            "    sprintf(buffer, \"%s\", input);",
+        ],
+    },
+    ".java": {
+        "header": "import java.util.List;\nimport java.util.ArrayList;\n\npublic class Service {\n\n",
+        "footer": "\n}\n",
+        "open": ["    public int ", "(String input, int limit) {"],
+        "close": "        return 0;\n    }",
+        "lines": [
+            "        List<String> items = new ArrayList<>();",
+            "        int count = 0;",
+            "        String name = input.trim();",
+            "        items.add(name);",
+            "        count = items.size();",
+            "        StringBuilder builder = new StringBuilder();",
+            "        builder.append(name).append(limit);",
+            "        if (input == null) {\n            return -1;\n        }",
+            "        for (String item : items) {\n            count += item.length();\n        }",
+            "        PreparedStatement ps = conn.prepareStatement(\"SELECT * FROM users WHERE id = ?\");",
+        ],
+        "sinks": [
+            "        Runtime.getRuntime().exec(input);",
+            "        ResultSet rs = stmt.executeQuery(\"SELECT * FROM users WHERE id = \" + input);",
+            "        MessageDigest md = MessageDigest.getInstance(\"MD5\");",
+            "        Random random = new Random();",
+        ],
+    },
+    ".js": {
+        "header": "'use strict';\n\nconst path = require('path');\n\n",
+        "footer": "\n",
+        "open": ["function ", "(input, options) {"],
+        "close": "  return result;\n}",
+        "lines": [
+            "  let result = null;",
+            "  const name = String(input).trim();",
+            "  const size = name.length;",
+            "  const file = path.join('data', name);",
+            "  options = options || {};",
+            "  result = { name, size };",
+            "  element.textContent = name;",
+            "  if (!input) {\n    return null;\n  }",
+            "  for (const key of Object.keys(options)) {\n    console.log(key);\n  }",
+        ],
+        "sinks": [
+            "  element.innerHTML = input;",
+            "  document.write(input);",
+            "  result = eval(input);",
+        ],
+    },
+    ".go": {
+        "header": "package service\n\nimport (\n\t\"fmt\"\n\t\"strings\"\n)\n\n",
+        "footer": "\n",
+        "open": ["func ", "(input string, limit int) (int, error) {"],
+        "close": "\treturn 0, nil\n}",
+        "lines": [
+            "\tcount := 0",
+            "\tname := strings.TrimSpace(input)",
+            "\tcount += len(name)",
+            "\tlabel := fmt.Sprintf(\"%s-%d\", name, limit)",
+            "\tparts := strings.Split(label, \"-\")",
+            "\tif input == \"\" {\n\t\treturn 0, fmt.Errorf(\"empty input\")\n\t}",
+            "\tfor _, part := range parts {\n\t\tcount += len(part)\n\t}",
+        ],
+        "sinks": [
+            "\tquery := fmt.Sprintf(\"SELECT * FROM users WHERE id = %s\", input)",
+            "\tptr := unsafe.Pointer(&count)",
+        ],
+    },
+}
+
+def _cwe(line):
+    """cwe_id the miner gives a snippet whose only finding is `line` (see repo_miner.label_file)."""
+    return ";".join(sorted({f.get("cwe", "N/A") for f in get_dangerous_details(line)})) or "None"
+
+def _pools(languages):
+    """
+    Flat Arrow pool of every language's lines then sinks, each entry's cwe_id
+    ("None" for safe lines) and every language's offset and size in the pool.
+    """
+    lines, sinks, cwes = [], [], []
+    line_start, line_count, sink_start, sink_count = [], [], [], []
+    for ext in languages:
+        spec = LANGUAGES[ext]
+        line_start.append(len(lines))
+        line_count.append(len(spec["lines"]))
+        lines.extend(spec["lines"])
+        sink_start.append(len(sinks))
+        sink_count.append(len(spec["sinks"]))
+        sinks.extend(spec["sinks"])
+        cwes.extend(_cwe(sink) for sink in spec["sinks"])
+    # Sinks come after the safe lines, so one index array addresses both
+    pool = pa.array(lines + sinks, pa.string())
+    return (pool, np.array(["None"] * len(lines) + cwes, dtype=object), np.array(line_start), np.array(line_count),
+            len(lines) + np.array(sink_start), np.array(sink_count))
+
+def _pick(rng, start, count):
+    """A uniform index in [start, start + count) per element (vectorised)."""
+    return start + (rng.random(len(start)) * count).astype(np.int64)
+
+def _joined(offsets, values, separator):
+    """Joins `values` in the groups delimited by `offsets` (Arrow list kernel)."""
+    return pc.binary_join(pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), values), separator)
+
+def _counts(rng, mean, n):
+    return np.maximum(rng.poisson(max(mean - 1, 0), n) + 1, 1)
+
+def generate_table(rows, seed=SEED, languages=LANGUAGE_MIX, vulnerable=VULNERABLE_RATE, functions=FUNCTIONS,
+                   lines=LINES, source=SOURCE):
+    """
+    `rows` synthetic source files as an Arrow table with the miner's label
+    columns (code, is_vulnerable, cwe_id, source, language). `languages` maps
+    extensions to their share; exactly round(rows * vulnerable) files get one
+    sink. `functions` and `lines` are the mean functions per file and body
+    lines per function. The same seed always gives the same table.
+    """
+    rng = np.random.default_rng(seed)
+    extensions = [ext for ext, share in languages.items() if share > 0]
+    unknown = set(extensions) - set(LANGUAGES)
+    if unknown:
+        raise ValueError(f"Unsupported languages {sorted(unknown)}; choose from {sorted(LANGUAGES)}")
+    weights = np.array([languages[ext] for ext in extensions], dtype=float)
+    pool, pool_cwes, line_start, line_count, sink_start, sink_count = _pools(extensions)
+    specs = [LANGUAGES[ext] for ext in extensions]
+
+    language = rng.choice(len(extensions), rows, p=weights / weights.sum())
+    is_vulnerable = rng.permutation(rows) < int(round(rows * vulnerable))
+    n_functions = _counts(rng, functions, rows)
+    function_file = np.repeat(np.arange(rows), n_functions)
+    function_language = language[function_file]
+    n_lines = _counts(rng, lines, len(function_file))
+    line_language = np.repeat(function_language, n_lines)
+    line_index = _pick(rng, line_start[line_language], line_count[line_language])
+
+    # One line of one function of every vulnerable file becomes a sink
+    function_offsets = np.r_[0, np.cumsum(n_functions)]
+    line_offsets = np.r_[0, np.cumsum(n_lines)]
+    targets = np.flatnonzero(is_vulnerable)
+    target_function = function_offsets[targets] + (rng.random(len(targets)) * n_functions[targets]).astype(np.int64)
+    target_line = line_offsets[target_function] + (rng.random(len(targets)) * n_lines[target_function]).astype(np.int64)
+    sink = _pick(rng, sink_start[language[targets]], sink_count[language[targets]])
+    line_index[target_line] = sink
+
+    bodies = _joined(line_offsets, pool.take(pa.array(line_index)), "\n")
+    names = pc.binary_join_element_wise(
+        pa.array(VERBS).take(pa.array(rng.integers(len(VERBS), size=len(function_file)))),
+        pa.array(NOUNS).take(pa.array(rng.integers(len(NOUNS), size=len(function_file)))),
+        pc.cast(pa.array(rng.integers(10 ** 6, size=len(function_file))), pa.string()), "_")
+    per_language = lambda key, i=None: pa.array([s[key] if i is None else s[key][i] for s in specs], pa.string())
+    by_function = pa.array(function_language)
+    bodies = pc.binary_join_element_wise(
+        per_language("open", 0).take(by_function), names, per_language("open", 1).take(by_function), "\n",
+        bodies, "\n", per_language("close").take(by_function), "")
+    by_file = pa.array(language)
+    code = pc.binary_join_element_wise(
+        per_language("header").take(by_file), _joined(function_offsets, bodies, "\n\n"),
+        per_language("footer").take(by_file), "")
+
+    sink_cwe = np.full(rows, "None", dtype=object)
+    sink_cwe[targets] = pool_cwes[sink]
+    return pa.table({
+        "code": code,
+        "is_vulnerable": pa.array(is_vulnerable.astype(np.int8)),
+        "cwe_id": pa.array(sink_cwe, pa.string()),
+        "source": pa.array(np.full(rows, source, dtype=object), pa.string()),
+        "language": pa.array(np.array(extensions, dtype=object)[language], pa.string()),
+    })
+
+def generate_frame(rows, seed=SEED, **kwargs):
+    """generate_table as a DataFrame."""
+    return generate_table(rows, seed, **kwargs).to_pandas()
+
+def write_part(root, name, part, rows, seed, kwargs):
+    """Process-pool task: generates and writes one shard; returns its vulnerable count."""
+    # Each part has its own seed: the corpus does not depend on the write order
+    table = generate_table(rows, seed, source=name, **kwargs)
+    write_dataset(table.to_pandas(), _part_path(root, name, part))
+    return int(pc.sum(table.column("is_vulnerable")).as_py() or 0)
+
+def write_shards(root=SHARD_DIR, rows=100000, repos=1, seed=SEED, rows_per_part=ROWS_PER_PART, workers=None, **kwargs):
+    """
+    Writes `rows` synthetic files as a mined corpus: <root>/synthetic-NNN/part-NNNNN.parquet
+    (repo_miner's layout), split evenly over `repos` repositories, on
+    `workers` processes, and records them as finished in the miner's
+    manifest. Memory per worker is bounded by `rows_per_part`. Returns the
+    paths written.
+    """
+    tasks = []
+    for r, repo_rows in enumerate(np.diff(np.linspace(0, rows, repos + 1).astype(np.int64))):
+        for part, start in enumerate(range(0, repo_rows, rows_per_part)):
+            tasks.append((f"{SOURCE}-{r:03d}", part, int(min(rows_per_part, repo_rows - start)), [seed, r, part]))
+    workers = min(workers or os.cpu_count() or 1, max(len(tasks), 1))
+    names, parts, sizes, seeds = zip(*tasks) if tasks else ((),) * 4
+    if workers <= 1:
+        vulnerable = [write_part(root, *task, kwargs) for task in tasks]
+    else:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            vulnerable = list(pool.map(write_part, [root] * len(tasks), names, parts, sizes, seeds, [kwargs] * len(tasks)))
+
+    os.makedirs(root, exist_ok=True)
+    manifest = MinerManifest(os.path.join(root, MANIFEST_FILE))
+    totals = pd.DataFrame({"name": names, "rows": sizes, "vulnerable": vulnerable}).groupby("name")
+    for name, repo in totals:
+        manifest.update(name, fingerprint=f"{SOURCE}-{seed}", chunk_files=rows_per_part, files=int(repo["rows"].sum()),
+                        parts=len(repo), rows=int(repo["rows"].sum()), vulnerable=int(repo["vulnerable"].sum()),
+                        status="done")
+    return [_part_path(root, name, part) for name, part in zip(names, parts)]
+
+def write_tree(root, files=10000, seed=SEED, files_per_dir=FILES_PER_DIR, **kwargs):
+    """
+    Writes `files` synthetic source files under `root` as a fake repository
+    (<root>/<dir>/<dir>_NNN/module_NNNNNN.<ext>, at most `files_per_dir` per
+    directory) that repo_miner can mine offline. Returns the files' labels
+    with their relative path in place of the code.
+    """
+    table = generate_table(files, seed, source=os.path.basename(os.path.abspath(root)), **kwargs)
+    leaf = np.arange(files) // files_per_dir
+    directories = pd.Series(np.array(DIRS, dtype=object)[leaf % len(DIRS)]) + "/" + \
+        pd.Series(np.array(DIRS, dtype=object)[leaf // len(DIRS) % len(DIRS)]) + "_" + pd.Series(leaf).map("{:03d}".format)
+    paths = directories + "/module_" + pd.Series(np.arange(files)).map("{:06d}".format) + \
+        table.column("language").to_pandas()
+    for directory in directories.unique():
+        os.makedirs(os.path.join(root, directory), exist_ok=True)
+    for path, code in zip(paths, table.column("code").to_pylist()):
+        with open(os.path.join(root, path), "w", encoding="utf-8") as f:
+            f.write(code)
+    return table.drop_columns(["code"]).to_pandas().assign(path=paths)
+
+def parse_mix(text):
+    """'.py=2,.c=1' (or 'py=2,c=1') -> {'.py': 2.0, '.c': 1.0}."""
+    mix = {}
+    for item in text.split(","):
+        ext, _, share = item.partition("=")
+        mix["." + ext.strip().lstrip(".")] = float(share or 1)
+    return mix
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic source corpora offline.")
+    parser.add_argument("kind", choices=["shards", "tree"], help="Parquet shards (mined layout) or a directory of source files")
+    parser.add_argument("output", nargs="?", help=f"Shard root (default {SHARD_DIR}) or tree root")
+    parser.add_argument("--rows", type=int, default=100000, help="Files to generate")
+    parser.add_argument("--repos", type=int, default=1, help="Repositories the shards are split over")
+    parser.add_argument("--workers", type=int, help="Shards generated in parallel (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--languages", type=parse_mix, default=LANGUAGE_MIX, help="Language mix, e.g. py=2,c=1,java=1")
+    parser.add_argument("--vulnerable", type=float, default=VULNERABLE_RATE, help="Share of files with a vulnerability")
+    parser.add_argument("--functions", type=float, default=FUNCTIONS, help="Mean functions per file")
+    parser.add_argument("--lines", type=float, default=LINES, help="Mean body lines per function")
+    args = parser.parse_args()
+
+    options = dict(languages=args.languages, vulnerable=args.vulnerable, functions=args.functions, lines=args.lines)
+    start = time.perf_counter()
+    if args.kind == "shards":
+        root = args.output or SHARD_DIR
+        paths = write_shards(root, args.rows, args.repos, args.seed, workers=args.workers, **options)
+        print(f"✅ {args.rows} synthetic files in {len(paths)} shards under {root} ({time.perf_counter() - start:.1f} s)")
+    else:
+        if not args.output:
+            parser.error("tree needs an output directory")
+        labels = write_tree(args.output, args.rows, args.seed, **options)
+        print(f"✅ {len(labels)} synthetic files ({int(labels['is_vulnerable'].sum())} vulnerable) "
+              f"under {args.output} ({time.perf_counter() - start:.1f} s)")
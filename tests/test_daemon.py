@@ -0,0 +1,129 @@
+import io
+import os
+import sys
+import socket
+import threading
+import numpy as np
+import pytest
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.model.bundle import write_bundle
+from src.model.predict import load_model
+from src.model.daemon import ScanDaemon
+from src.model import scan_client
+
+SOURCES = {
+    "unsafe.c": "int main(int argc, char **argv) {\n  char buf[8];\n  strcpy(buf, argv[1]);\n  return 0;\n}\n",
+    "safe.py": "def add(a, b):\n    return a + b\n",
+}
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    texts = list(SOURCES.values()) * 10
+    vectorizer = TfidfVectorizer(token_pattern=r'\b\w+\b').fit(texts)
+    X = np.hstack([vectorizer.transform(texts).toarray(), np.random.RandomState(0).rand(len(texts), 3)])
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, [1, 0] * 10)
+    model_dir = tmp_path / "models"
+    model_dir.mkdir()
+    write_bundle(model, vectorizer, str(model_dir / "model.bundle"))
+    for name, source in SOURCES.items():
+        (tmp_path / name).write_text(source)
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv(scan_client.SOCKET_ENV, str(tmp_path / "scan.sock"))
+    return str(model_dir)
+
+def scan(argv, model_dir, capsys):
+    capsys.readouterr()
+    exit_code = scan_client.main(argv, model_dir)
+    captured = capsys.readouterr()
+    return exit_code, captured.out, captured.err
+
+def test_daemon_replies_match_in_process_scans(workspace, capsys):
+    loads = []
+    def counting_loader(model_dir):
+        loads.append(model_dir)
+        return load_model(model_dir)
+
+    daemon = ScanDaemon(os.environ[scan_client.SOCKET_ENV], workspace, idle_timeout=30, loader=counting_loader)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    for _ in range(100):
+        if os.path.exists(daemon.socket_path) and daemon.running:
+            break
+        thread.join(0.05)
+
+    for argv in (["unsafe.c"], ["safe.py"], ["."], ["missing.c"]):
+        expected = scan(argv + ["--no-daemon"], workspace, capsys)
+        got = scan(argv + ["--no-autostart"], workspace, capsys)
+        assert got == expected
+    assert len(loads) == 1
+
+    scan(["--stop"], workspace, capsys)
+    thread.join(5)
+    assert not thread.is_alive()
+    assert not os.path.exists(daemon.socket_path)
+
+def test_client_falls_back_to_in_process_scan(workspace, capsys, monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO(SOURCES["unsafe.c"]))
+    exit_code, out, err = scan(["-", "--no-autostart"], workspace, capsys)
+    assert exit_code == 0
+    assert "[VULNERABLE] <stdin>" in out and "strcpy" in out
+    assert "scanning in-process" in err
+
+def test_a_daemon_still_warming_up_keeps_its_socket(workspace):
+    socket_path = os.environ[scan_client.SOCKET_ENV]
+    first = ScanDaemon(socket_path, workspace)
+    server = first._bind() # Bound but not answering pings yet, as during warm-up
+    inode = os.stat(socket_path).st_ino
+    assert ScanDaemon(socket_path, workspace)._bind() is None
+    assert os.stat(socket_path).st_ino == inode
+    first._unbind(server)
+
+    # A socket left behind by a daemon that died is replaced
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()
+    second = ScanDaemon(socket_path, workspace)
+    server = second._bind()
+    assert server is not None
+    second._unbind(server)
+
+def test_client_only_talks_to_its_own_users_daemon(workspace, capsys, monkeypatch):
+    socket_path = os.environ[scan_client.SOCKET_ENV]
+    daemon = ScanDaemon(socket_path, workspace)
+    server = daemon._bind()
+    # The socket now looks like another user's: no scan is sent and no daemon started over it
+    for module in (scan_client, sys.modules["model.scan_client"]): # daemon.py imports it without src.
+        monkeypatch.setattr(module, "_current_uid", lambda: os.getuid() + 1)
+    monkeypatch.setattr(scan_client, "start_daemon", lambda *args: pytest.fail("started a daemon"))
+    exit_code, out, err = scan(["unsafe.c"], workspace, capsys)
+    assert exit_code == 0 and "[VULNERABLE]" in out
+    assert "belongs to another user" in err and "scanning in-process" in err
+    daemon._unbind(server)
+
+    # Nor does a daemon remove it
+    leftover = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    leftover.bind(socket_path)
+    leftover.close()
+    with pytest.raises(PermissionError):
+        ScanDaemon(socket_path, workspace)._bind()
+    assert os.path.exists(socket_path)
+
+def test_socket_path_is_per_user_and_works_without_getuid(workspace, capsys, monkeypatch, tmp_path):
+    monkeypatch.delenv(scan_client.SOCKET_ENV)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "run"))
+    assert os.path.dirname(scan_client.default_socket_path(workspace)) == str(tmp_path / "run" / "vulnscan")
+
+    # Windows: no os.getuid, only the in-process scan
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.delattr(os, "getuid")
+    monkeypatch.setattr(scan_client.getpass, "getuser", lambda: "someone")
+    assert os.path.basename(scan_client.socket_dir()) == "vulnscan-someone"
+    exit_code, out, _ = scan(["unsafe.c", "--no-daemon"], workspace, capsys)
+    assert exit_code == 0 and "[VULNERABLE]" in out
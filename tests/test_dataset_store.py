@@ -0,0 +1,69 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.sample import data_loader
+from src.sample.dataset_store import migrate_csv, write_dataset, read_dataset, iter_batches, describe, HASH_COLUMN
+from src.model.train_model import load_training_data
+
+def make_frame(n=300):
+    rng = np.random.RandomState(0)
+    return pd.DataFrame({
+        "code": [f"int f{i}() {{ {'strcpy(a, b);' if i % 7 == 0 else 'return 0;'} }}" for i in range(n)],
+        "is_vulnerable": (np.arange(n) % 7 == 0).astype(int),
+        "cwe_id": np.where(np.arange(n) % 7 == 0, "CWE-120", "None"),
+        "source": rng.choice(["flask", "redis"], n),
+        "language": rng.choice([".py", ".c"], n),
+    })
+
+def test_migrated_parquet_projects_columns_and_rows(tmp_path):
+    df = make_frame()
+    df.to_csv(tmp_path / "data.csv", index=False)
+    path = migrate_csv(str(tmp_path / "data.csv"), batch_rows=128)
+
+    info = describe(path)
+    assert info["rows"] == len(df) and [g["rows"] for g in info["row_groups"]] == [128, 128, 44]
+    labels = read_dataset(path, ["is_vulnerable", "cwe_id"])
+    assert list(labels.columns) == ["is_vulnerable", "cwe_id"] and isinstance(labels["cwe_id"].dtype, pd.CategoricalDtype)
+    assert (labels["is_vulnerable"].to_numpy() == df["is_vulnerable"].to_numpy()).all()
+    rows = [0, 127, 128, 299]
+    assert read_dataset(path, ["code"], rows=rows)["code"].tolist() == df["code"].iloc[rows].tolist()
+    assert sum(len(batch) for batch in iter_batches(path, ["code"], batch_rows=50)) == len(df)
+    # The CSV and the Parquet copy hash the code identically
+    assert (read_dataset(str(tmp_path / "data.csv"), [HASH_COLUMN]) == read_dataset(path, [HASH_COLUMN])).all().all()
+
+def test_label_only_loading_never_reads_code(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    base = make_frame(40)[["code", "is_vulnerable", "cwe_id"]]
+    base.to_csv("data/dataset.csv", index=False)
+    mined = make_frame(300)
+    write_dataset(pd.concat([mined, mined.head(10)]), "data/mined_dataset.parquet")
+
+    full = data_loader.load_data()
+    assert len(full) == 300 # The base rows and the repeated rows are duplicates
+
+    requested = []
+    real_read = data_loader.read_dataset
+    def spy(path, columns=None, rows=None):
+        requested.append((path, tuple(columns or ())))
+        return real_read(path, columns, rows)
+    # train_model imports the loader as sample.data_loader
+    for module in (data_loader, sys.modules["sample.data_loader"]):
+        monkeypatch.setattr(module, "read_dataset", spy)
+
+    labels = data_loader.load_data(columns=["is_vulnerable", "cwe_id"])
+    assert (labels["is_vulnerable"].to_numpy() == full["is_vulnerable"].to_numpy()).all()
+    assert all("code" not in columns for path, columns in requested if path.endswith(".parquet"))
+
+    requested.clear()
+    train = load_training_data()
+    assert train["is_vulnerable"].sum() == full["is_vulnerable"].sum()
+    assert len(train) == full["is_vulnerable"].sum() + int(full["is_vulnerable"].sum() * 1.2)
+    assert set(train["code"]) <= set(full["code"])
+    # Code is only read for the selected rows
+    assert [c for p, c in requested if p.endswith(".parquet") and "code" in c] == [("code",)]
@@ -0,0 +1,63 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.modify import dedup
+from src.modify.dedup import MinHashIndex, near_duplicate_clusters
+from src.modify.preprocessing import split_dataset
+from src.sample import data_loader
+from src.sample.dataset_store import write_dataset, code_hash
+
+def make_file(seed, n_functions=30):
+    rng = np.random.RandomState(seed)
+    names = rng.choice(["buf", "len", "src", "dst", "ctx", "node"], n_functions)
+    return "\n".join(f"int f{seed}_{i}(int {name}) {{ return {name} * {rng.randint(100)}; }}"
+                     for i, name in enumerate(names))
+
+def variants(seed):
+    """A file, a copy with another license header and a copy with one line edited."""
+    base = make_file(seed)
+    return [base, "/* Copyright (c) 2024 Vendor. MIT License. */\n" + base, base.replace(f"f{seed}_3(", f"g{seed}_3(")]
+
+def test_clusters_near_copies_and_indexes_incrementally(tmp_path, monkeypatch):
+    codes = variants(1) + variants(2) + ["x = 1", ""]
+    clusters = near_duplicate_clusters(codes)
+    assert list(clusters) == [0, 0, 0, 3, 3, 3, 6, 7]
+
+    index = MinHashIndex()
+    index.add(code_hash(codes[:5]), codes[:5])
+    index.save(str(tmp_path / "index.npz"))
+
+    signed = []
+    real = dedup.minhash_signatures
+    monkeypatch.setattr(dedup, "minhash_signatures", lambda codes, *a: signed.append(len(codes)) or real(codes, *a))
+    index = MinHashIndex.load(str(tmp_path / "index.npz"))
+    # Only the snippets the index has not seen are signed, and they join the existing clusters
+    assert index.add(code_hash(codes), codes) == 3 and signed == [3]
+    assert list(index.clusters_of(code_hash(codes))) == [0, 0, 0, 3, 3, 3, 6, 7]
+
+    cluster, score = index.query([variants(2)[0] + "\nint extra(void);", make_file(9)])
+    assert cluster[0] == 3 and score[0] >= dedup.THRESHOLD and cluster[1] == -1
+
+def test_load_data_drops_or_groups_near_duplicates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data")
+    codes = [code for seed in range(20) for code in variants(seed)]
+    df = pd.DataFrame({"code": codes, "is_vulnerable": np.arange(len(codes)) // 3 % 2, "cwe_id": "None"})
+    df.head(6).to_csv("data/dataset.csv", index=False)
+    write_dataset(df.assign(source="repo", language=".c"), "data/mined_dataset.parquet")
+
+    assert len(data_loader.load_data()) == 60
+    kept = data_loader.load_data(near_duplicates="drop")
+    assert kept["code"].tolist() == codes[::3]
+    assert os.path.exists(dedup.INDEX_PATH)
+
+    grouped = data_loader.load_data(columns=["is_vulnerable"], near_duplicates="group")
+    assert list(grouped.columns) == ["is_vulnerable", "cluster"] and grouped["cluster"].nunique() == 20
+    X_train, X_test, _, _ = split_dataset(grouped[["is_vulnerable"]], grouped["is_vulnerable"], groups=grouped["cluster"])
+    # Every cluster lies wholly on one side of the split
+    assert not set(grouped["cluster"].iloc[X_train.index]) & set(grouped["cluster"].iloc[X_test.index])
@@ -0,0 +1,141 @@
+import os
+import json
+import sys
+import subprocess
+import numpy as np
+import pytest
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.sample.git_objects import list_blobs, CatFileBatch, iter_blob_sources, resolve_commit
+from src.model.predict import scan_directory, is_source_path, predict_content
+from src.assess.scan_repo import scan_git_tree, scan_external_repo
+from src.assess.result_cache import ResultCache
+
+FILES = {
+    "src/unsafe.c": "int main(int argc, char **argv) {\n  char buf[8];\n  strcpy(buf, argv[1]);\n}\n",
+    "src/app.py": "import os\n\ndef run(cmd):\n    return eval(cmd)\n",
+    "lib/util.js": "function add(a, b) { return a + b; }\n",
+    "node_modules/dep/index.js": "document.write(x);\n",
+    "README.md": "# demo\n",
+}
+
+def git(repo, *args):
+    return subprocess.run(["git", "-C", str(repo), "-c", "user.name=test", "-c", "user.email=test@example.com"]
+                          + list(args), check=True, capture_output=True, text=True).stdout
+
+@pytest.fixture
+def repos(tmp_path):
+    work = tmp_path / "work"
+    for name, source in FILES.items():
+        (work / name).parent.mkdir(parents=True, exist_ok=True)
+        (work / name).write_text(source)
+    # Internal files are skipped by both scans
+    (work / "tools").mkdir()
+    (work / "tools" / "train_model.py").write_text("import pickle\n")
+    git(tmp_path, "init", "-q", str(work))
+    git(work, "add", "-A")
+    git(work, "commit", "-q", "-m", "first")
+    first = git(work, "rev-parse", "HEAD").strip()
+    (work / "src" / "unsafe.c").write_text("int main(void) { return 0; }\n")
+    git(work, "commit", "-q", "-am", "fix")
+    bare = tmp_path / "bare.git"
+    git(tmp_path, "clone", "-q", "--bare", str(work), str(bare))
+    return work, bare, first
+
+@pytest.fixture
+def fitted():
+    texts = list(FILES.values()) * 4
+    vectorizer = TfidfVectorizer(token_pattern=r'\b\w+\b').fit(texts)
+    X = np.hstack([vectorizer.transform(texts).toarray(), np.random.RandomState(0).rand(len(texts), 3)])
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, [1, 1, 0, 1, 0] * 4)
+    return model, vectorizer
+
+def test_blobs_are_read_from_the_object_database(repos):
+    _, bare, first = repos
+    blobs = list_blobs(str(bare), first, include=is_source_path)
+    assert sorted(path for path, _, _ in blobs) == ["lib/util.js", "src/app.py", "src/unsafe.c"]
+
+    with CatFileBatch(str(bare)) as batch:
+        for path, oid, size in blobs:
+            data = batch.read(oid)
+            assert data.decode() == FILES[path] and len(data) == size
+        with pytest.raises(KeyError):
+            batch.read("0" * 40)
+
+    # Later commits are read without checking anything out
+    head = dict((path, data) for path, _, data in iter_blob_sources(str(bare), "HEAD", include=is_source_path))
+    assert head["src/unsafe.c"] == b"int main(void) { return 0; }\n"
+    assert resolve_commit(str(bare)) != first
+
+def test_git_tree_scan_matches_directory_scan(repos, fitted, tmp_path, monkeypatch):
+    work, bare, _ = repos
+    model, vectorizer = fitted
+    monkeypatch.chdir(work)
+    from_disk = {r["file"]: r for r in scan_directory(".", model, vectorizer)}
+    monkeypatch.chdir(tmp_path)
+    from_objects = scan_git_tree(str(bare), "HEAD", model, vectorizer)
+
+    assert {r["file"] for r in from_objects} == {os.path.relpath(p) for p in from_disk}
+    for result in from_objects:
+        expected = from_disk[os.path.join(".", result["file"])]
+        assert (result["status"], result["confidence"]) == (expected["status"], expected["confidence"])
+        assert len(result["blob"]) == 40
+
+def test_remote_scan_leaves_no_temp_directory(repos, fitted, tmp_path, tmp_path_factory, monkeypatch):
+    _, bare, _ = repos
+    monkeypatch.setenv("VULNSCAN_MIRRORS", str(tmp_path_factory.mktemp("mirrors")))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("src.assess.scan_repo.load_model", lambda: fitted)
+    before = set(os.listdir(tmp_path))
+
+    results = scan_external_repo(f"file://{bare}", open_report=False)
+    assert sorted(r["file"] for r in results) == ["lib/util.js", "src/app.py", "src/unsafe.c"]
+    assert set(os.listdir(tmp_path)) - before == {"report_bare.json", "report_bare.html"}
+
+def test_unreadable_local_revision_is_reported(repos, fitted, tmp_path, monkeypatch, capsys):
+    work, _, _ = repos
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("src.assess.scan_repo.load_model", lambda: fitted)
+    assert scan_external_repo(str(work), rev="no-such-branch", open_report=False, use_cache=False) is None
+    assert "❌ Error: Failed to read repository" in capsys.readouterr().out
+    assert not os.path.exists(tmp_path / "report_work.json")
+
+def test_result_cache_reuses_blobs_across_commits(repos, fitted, tmp_path, monkeypatch):
+    work, _, first = repos
+    model, vectorizer = fitted
+    calls = []
+    def counting(content, model, vectorizer):
+        calls.append(content)
+        return predict_content(content, model, vectorizer)
+
+    cache_path = str(tmp_path / "cache.sqlite")
+    with ResultCache("v1", cache_path) as cache:
+        old = scan_git_tree(str(work), first, model, vectorizer, counting, cache=cache)
+        assert len(calls) == 3 and not any(r["cached"] for r in old)
+        # The next commit only changes unsafe.c: the two other blobs are reused
+        new = scan_git_tree(str(work), "HEAD", model, vectorizer, counting, cache=cache)
+        assert len(calls) == 4
+        assert {r["file"]: r["cached"] for r in new} == {"lib/util.js": True, "src/app.py": True, "src/unsafe.c": False}
+        fresh = {r["file"]: r for r in scan_git_tree(str(work), "HEAD", model, vectorizer)}
+        for result in new:
+            assert (result["status"], result["confidence"]) == (fresh[result["file"]]["status"], fresh[result["file"]]["confidence"])
+            assert result["details"]["dangerous_calls"] == fresh[result["file"]]["details"]["dangerous_calls"]
+
+    # Another model version never sees these results
+    with ResultCache("v2", cache_path) as cache:
+        assert cache.get_many(r["blob"] for r in new) == {}
+        assert cache.stats() == {"v1": 4}
+        assert cache.prune() == 4
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("src.assess.scan_repo.load_model", lambda: fitted)
+    monkeypatch.setattr("src.assess.scan_repo.model_version", lambda: "v1")
+    scan_external_repo(str(work), open_report=False, cache_path=cache_path)
+    scan_external_repo(str(work), open_report=False, cache_path=cache_path)
+    with open(tmp_path / "report_work.json") as f:
+        assert json.load(f)["cache"] == {"reused": 3, "computed": 0}
@@ -0,0 +1,106 @@
+import os
+import sys
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sklearn.ensemble import RandomForestClassifier
+
+from src.sample.data_loader import generate_synthetic_data
+from src.modify.preprocessing import preprocess_data, extract_features
+from src.model.linear_model import fit_linear_model, LinearScorer
+from src.model.registry import compute_model_version
+from src.model.incremental import (update_models, shift_numeric_features, featurise_frame, save_holdout,
+                                   load_holdout, extend_vocabulary, oov_terms, VocabularyDriftError)
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    np.random.seed(0)
+    X_train, X_test, y_train, y_test = preprocess_data(generate_synthetic_data(num_samples=80))
+    X_train_vec, _ = extract_features(X_train, X_test, sparse=True)
+    joblib.dump(RandomForestClassifier(n_estimators=10, random_state=0).fit(X_train_vec.toarray(), y_train),
+                "models/rf_model.pkl")
+    joblib.dump(fit_linear_model(X_train_vec, y_train), "models/linear_model.pkl")
+    save_holdout(X_test["code"], y_test, "models")
+    return str(tmp_path / "models")
+
+def served_version(model_dir):
+    return compute_model_version(os.path.join(model_dir, "rf_model.pkl"), os.path.join(model_dir, "tfidf_vectorizer.pkl"))
+
+def test_update_grows_forest_and_tracks_slices(model_dir):
+    first = update_models(generate_synthetic_data(num_samples=60), "repo-a", model_dir, trees=5)
+    assert first["promoted"] and first["n_estimators"] == 15
+    assert served_version(model_dir) == first["version"]
+    assert first["holdout"]["source"] == "training split"
+
+    second = update_models(generate_synthetic_data(num_samples=60), "repo-b", model_dir, trees=5)
+    assert second["parent"] == first["version"]
+    assert [s["name"] for s in second["slices"]] == ["base", "repo-a", "repo-b"]
+    assert joblib.load(os.path.join(model_dir, "rf_model.pkl")).n_estimators == 20
+    assert joblib.load(os.path.join(model_dir, "linear_model.pkl")).n_seen > first["slices"][1]["rows"]
+
+def test_holdout_from_a_slice_needs_enough_rows(model_dir):
+    os.remove(os.path.join(model_dir, "holdout.pkl"))
+    with pytest.raises(ValueError, match="minimum"):
+        update_models(generate_synthetic_data(num_samples=60), "small", model_dir, trees=5)
+    assert load_holdout(model_dir) == (None, None)
+
+    result = update_models(generate_synthetic_data(num_samples=200), "repo-a", model_dir, trees=5,
+                           max_accuracy_drop=1.0)
+    holdout, source = load_holdout(model_dir)
+    assert source == result["holdout"]["source"] == "repo-a"
+    assert len(holdout) == result["holdout"]["rows"] == 40
+
+def test_failed_holdout_check_keeps_served_model(model_dir):
+    before = served_version(model_dir)
+    result = update_models(generate_synthetic_data(num_samples=60), "repo-a", model_dir, trees=5,
+                           max_accuracy_drop=-1.0)
+    assert not result["promoted"]
+    assert served_version(model_dir) == before
+    assert os.path.isdir(os.path.join(model_dir, "versions", result["version"]))
+
+def test_single_class_slice_is_refused(model_dir):
+    before = served_version(model_dir)
+    safe_only = generate_synthetic_data(num_samples=60, vulnerable=0.0)
+    with pytest.raises(ValueError, match="every class"):
+        update_models(safe_only, "safe-only", model_dir, trees=5)
+    assert served_version(model_dir) == before
+
+def test_worse_linear_update_keeps_parent_weights(model_dir, monkeypatch):
+    parent = joblib.load(os.path.join(model_dir, "linear_model.pkl"))
+    # An update that flips every decision
+    monkeypatch.setattr(LinearScorer, "partial_fit", lambda self, X, y: LinearScorer(
+        -self.coef, -self.intercept, self.classes_, kind=self.kind, scale=self.scale, n_seen=self.n_seen))
+    result = update_models(generate_synthetic_data(num_samples=60), "repo-a", model_dir, trees=5)
+    assert result["promoted"] and not result["linear"]["updated"]
+    assert result["linear"]["accuracy"] < result["linear"]["parent_accuracy"]
+    np.testing.assert_array_equal(joblib.load(os.path.join(model_dir, "linear_model.pkl")).coef, parent.coef)
+
+def test_vocabulary_policies(model_dir):
+    words = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+    drift = pd.DataFrame({
+        "code": [" ".join(np.random.RandomState(i).choice(words, 12)) for i in range(40)],
+        "is_vulnerable": [0, 1] * 20
+    })
+    with pytest.raises(VocabularyDriftError):
+        update_models(drift, "drift", model_dir, vocab_policy="freeze")
+
+    result = update_models(drift, "drift", model_dir, vocab_policy="extend", trees=5, max_accuracy_drop=1.0)
+    assert set(result["new_terms"]) == set(words)
+    assert joblib.load(os.path.join(model_dir, "rf_model.pkl")).n_features_in_ == result["vocabulary_size"] + 3
+
+def test_shifted_forest_scores_widened_rows_identically(model_dir):
+    forest = joblib.load(os.path.join(model_dir, "rf_model.pkl"))
+    vectorizer = joblib.load(os.path.join(model_dir, "tfidf_vectorizer.pkl"))
+    df = generate_synthetic_data(num_samples=30)
+    expected = forest.predict_proba(featurise_frame(df, vectorizer).toarray())
+
+    texts = ["brand new tokens here", "brand new tokens again"]
+    wider, new_terms = extend_vocabulary(vectorizer, texts, oov_terms(vectorizer, texts)[1])
+    shift_numeric_features(forest, len(vectorizer.vocabulary_), len(new_terms))
+    np.testing.assert_array_equal(forest.predict_proba(featurise_frame(df, wider).toarray()), expected)
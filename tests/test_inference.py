@@ -0,0 +1,224 @@
+import os
+import sys
+import numpy as np
+from scipy import sparse
+import pytest
+import joblib
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.tree import DecisionTreeClassifier
+
+from src.model.shared_model import export_shared_model, load_shared_model
+from src.model.compiled_forest import CompiledForest
+from src.model.bundle import write_bundle, load_bundle, read_header, stale_bundle, compute_model_version, BundleError, ALIGNMENT
+from src.modify.static_vectorizer import StaticVectorizer
+from src.model.compress import compact_forest, compress_model, prune_tree
+from src.model.linear_model import fit_linear_model
+from src.model.predict import predict_content, load_model, active_artifact, set_active_artifact, iter_source_files
+from src.modify.rules import get_dangerous_details
+from src.model.cascade import CascadeModel, cascade_predict_content
+
+DOCS = [
+    "strcpy ( dest , src ) ; return 0 ;",
+    "strncpy ( dest , src , sizeof ( dest ) ) ;",
+    "query = 'SELECT * FROM users WHERE name = ' + user",
+    "cursor . execute ( query , ( user , ) )",
+    "os . system ( cmd )",
+    "subprocess . run ( cmd , shell = False )",
+] * 10
+
+@pytest.fixture
+def fitted():
+    rng = np.random.RandomState(0)
+    vectorizer = TfidfVectorizer(max_features=50, token_pattern=r'\b\w+\b').fit(DOCS)
+    X = np.hstack([vectorizer.transform(DOCS).toarray(), rng.rand(len(DOCS), 3)])
+    y = np.array([1, 0, 1, 0, 1, 0] * 10)
+    model = RandomForestClassifier(n_estimators=15, random_state=0).fit(X, y)
+    return model, vectorizer, X
+
+def test_shared_model_matches_sklearn(fitted, tmp_path):
+    model, vectorizer, X = fitted
+    export_shared_model(model, vectorizer, str(tmp_path), version="v1")
+
+    shared_model, shared_vectorizer, version = load_shared_model(str(tmp_path))
+    assert version == "v1"
+    assert isinstance(shared_model.threshold, np.memmap)
+    np.testing.assert_allclose(shared_model.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(shared_model.predict(X), model.predict(X))
+    assert (shared_vectorizer.transform(DOCS) != vectorizer.transform(DOCS)).nnz == 0
+
+def test_bundle_round_trip_and_validation(fitted, tmp_path):
+    model, vectorizer, X = fitted
+    path = str(tmp_path / "model.bundle")
+    write_bundle(model, vectorizer, path, version="v1", metadata={"n_train": len(X)})
+
+    bundled, bundled_vectorizer, header = load_bundle(path)
+    assert header["version"] == "v1" and header["metadata"]["n_train"] == len(X)
+    assert all(info["offset"] % ALIGNMENT == 0 for info in header["arrays"].values())
+    assert not bundled.threshold.flags.writeable
+    np.testing.assert_allclose(bundled.predict_proba(X), model.predict_proba(X))
+    assert bundled_vectorizer.vocabulary_ == vectorizer.vocabulary_
+
+    # A vocabulary that no longer matches the schema hash is refused
+    data = bytearray(open(path, "rb").read())
+    at = read_header(bytes(data))[1] + header["arrays"]["vocabulary"]["offset"]
+    data[at:at + 4] = "Z".encode("utf-32-le")
+    open(path, "wb").write(bytes(data))
+    with pytest.raises(BundleError, match="schema"):
+        load_bundle(path)
+
+    open(path, "wb").write(bytes(data[:len(data) // 2]))
+    with pytest.raises(BundleError):
+        load_bundle(path)
+
+def test_load_model_serves_the_active_artifact(fitted, tmp_path):
+    model, vectorizer, X = fitted
+    model_dir = str(tmp_path)
+    joblib.dump(model, os.path.join(model_dir, "pipeline.pkl"))
+    # A pipeline left over from an earlier train_pipeline.py run, then newer pickles
+    os.utime(os.path.join(model_dir, "pipeline.pkl"), (1, 1))
+    joblib.dump(model, os.path.join(model_dir, "rf_model.pkl"))
+    joblib.dump(vectorizer, os.path.join(model_dir, "tfidf_vectorizer.pkl"))
+    assert active_artifact(model_dir) == "pickles"
+    assert load_model(model_dir)[1] is not None
+
+    write_bundle(model, vectorizer, os.path.join(model_dir, "model.bundle"))
+    set_active_artifact("pipeline", model_dir)
+    assert load_model(model_dir)[1] is None
+    set_active_artifact("bundle", model_dir)
+    assert type(load_model(model_dir)[0]).__name__ == "CompiledForest"
+
+    # A pointer to a deleted artifact falls back to the newest one present
+    os.remove(os.path.join(model_dir, "model.bundle"))
+    assert active_artifact(model_dir) == "pickles"
+
+def test_bundle_exported_from_older_pickles_is_not_served(fitted, tmp_path, capsys):
+    model, vectorizer, X = fitted
+    model_dir = str(tmp_path)
+    sources = [os.path.join(model_dir, "rf_model.pkl"), os.path.join(model_dir, "tfidf_vectorizer.pkl")]
+    joblib.dump(model, sources[0])
+    joblib.dump(vectorizer, sources[1])
+    write_bundle(model, vectorizer, os.path.join(model_dir, "model.bundle"),
+                 source_version=compute_model_version(*sources))
+    set_active_artifact("bundle", model_dir)
+    assert stale_bundle(model_dir) is None and active_artifact(model_dir) == "bundle"
+    # Touched but unchanged pickles keep the bundle
+    os.utime(sources[0], (2e9, 2e9))
+    assert stale_bundle(model_dir) is None
+
+    # Pickles retrained without re-exporting the bundle
+    joblib.dump(RandomForestClassifier(n_estimators=3, random_state=1).fit(X, [0, 1] * 30), sources[0])
+    os.utime(sources[0], (2e9, 2e9))
+    capsys.readouterr()
+    assert "exported from model" in stale_bundle(model_dir)
+    assert active_artifact(model_dir) == "pickles"
+    assert "serving the pickles instead" in capsys.readouterr().err
+    assert load_model(model_dir)[0].n_estimators == 3
+
+@pytest.mark.parametrize("params", [{}, {"sublinear_tf": True}, {"binary": True, "norm": "l1"}, {"lowercase": False}])
+def test_static_vectorizer_matches_sklearn(params):
+    texts = DOCS + ["STRCPY ( a , b ) strcpy strcpy", "unknown words only", ""]
+    vectorizer = TfidfVectorizer(token_pattern=r'\b\w+\b', **params).fit(DOCS)
+    static = StaticVectorizer(vectorizer.get_feature_names_out(), vectorizer.idf_, vectorizer.get_params())
+
+    np.testing.assert_allclose(static.transform_dense(texts), vectorizer.transform(texts).toarray(), atol=1e-12)
+    assert static.vocabulary_ == vectorizer.vocabulary_
+
+def test_compiled_forest_matches_sklearn():
+    rng = np.random.RandomState(0)
+    X = rng.rand(300, 20)
+    y = (X[:, 0] + rng.rand(300) * 0.5 > 0.7).astype(int)
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+    compiled = CompiledForest.from_model(model)
+
+    X_new = rng.rand(97, 20)
+    np.testing.assert_array_equal(compiled.apply(X_new), model.apply(X_new) + compiled.roots)
+    np.testing.assert_allclose(compiled.predict_proba(X_new), model.predict_proba(X_new))
+    np.testing.assert_allclose(compiled.predict_proba(X_new[:1]), model.predict_proba(X_new[:1]))
+    np.testing.assert_array_equal(compiled.predict(X_new), model.predict(X_new))
+
+@pytest.mark.parametrize("ccp_alpha", [0.001, 0.02])
+def test_post_hoc_pruning_matches_sklearn_ccp_alpha(ccp_alpha):
+    rng = np.random.RandomState(0)
+    X = rng.rand(400, 10)
+    y = (X[:, 0] + rng.rand(400) * 0.6 > 0.8).astype(int)
+    full = DecisionTreeClassifier(random_state=0).fit(X, y)
+    expected = DecisionTreeClassifier(random_state=0, ccp_alpha=ccp_alpha).fit(X, y)
+
+    full.tree_ = prune_tree(full.tree_, ccp_alpha)
+    assert full.tree_.node_count == expected.tree_.node_count
+    np.testing.assert_array_equal(full.predict_proba(X), expected.predict_proba(X))
+
+def test_compressed_forest_variants():
+    rng = np.random.RandomState(0)
+    X = rng.rand(300, 20)
+    y = (X[:, 0] + rng.rand(300) * 0.5 > 0.7).astype(int)
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+    X_new = rng.rand(97, 20).astype(np.float32)
+
+    # float32 thresholds are rounded down, so every split still goes the same way
+    compact = compact_forest(model)
+    assert compact.threshold.dtype == np.float32
+    np.testing.assert_array_equal(compact.apply(X_new), model.apply(X_new) + compact.roots)
+    np.testing.assert_allclose(compact.predict_proba(X_new), model.predict_proba(X_new), atol=1e-6)
+
+    small = compress_model(model, X[:100], y[:100], n_trees=10, max_depth=4)
+    assert len(small.estimators_) == 10 and len(model.estimators_) == 25
+    assert max(estimator.tree_.max_depth for estimator in small.estimators_) <= 4
+    assert (small.predict(X) == y).mean() > 0.8
+
+@pytest.mark.parametrize("kind", ["logreg", "sgd"])
+def test_linear_scorer_scores_sparse_rows(fitted, kind):
+    _, vectorizer, X = fitted
+    X_sparse = sparse.csr_matrix(X)
+    y = np.array([1, 0, 1, 0, 1, 0] * 10)
+    scorer = fit_linear_model(X_sparse, y, kind)
+
+    proba = scorer.predict_proba(X_sparse)
+    np.testing.assert_allclose(proba, scorer.predict_proba(X))
+    np.testing.assert_allclose(proba.sum(axis=1), 1.0)
+    assert (scorer.predict(X_sparse) == y).mean() > 0.9
+
+    pred, prob, _ = predict_content("strcpy ( dest , src ) ;", scorer, vectorizer)
+    assert pred in (0, 1) and 0.0 <= prob <= 1.0
+
+def test_cascade_routes_files_to_the_deciding_tier(fitted):
+    model, vectorizer, X = fitted
+    y = np.array([1, 0, 1, 0, 1, 0] * 10)
+    linear = fit_linear_model(sparse.csr_matrix(X), y)
+
+    # Critical rule finding: no model runs
+    _, prob, details = cascade_predict_content("eval(user_input)", CascadeModel(linear, model), vectorizer)
+    assert details["tier"] == "rules" and prob == 1.0
+
+    # An empty band trusts the linear model, a full band always asks the forest
+    trusting = CascadeModel(linear, model, band=(0.5, 0.5))
+    _, prob, details = cascade_predict_content(DOCS[1], trusting, vectorizer)
+    assert details["tier"] == "linear"
+
+    doubting = CascadeModel(linear, model, band=(0.0, 1.0))
+    _, prob, details = cascade_predict_content(DOCS[1], doubting, vectorizer)
+    assert details["tier"] == "forest"
+    _, expected, _ = predict_content(DOCS[1], model, vectorizer)
+    assert prob == pytest.approx(expected)
+
+    # Separable data: the calibrated linear model is confident, so only a wide band routes rows to the forest
+    proba, tiers = CascadeModel(linear, model, band=(0.0, 0.5)).score(sparse.csr_matrix(X))
+    assert set(tiers) == {"linear", "forest"}
+    np.testing.assert_allclose(proba[tiers == "forest"], model.predict_proba(X[tiers == "forest"])[:, 1])
+    np.testing.assert_allclose(proba[tiers == "linear"], linear.predict_proba(X[tiers == "linear"])[:, 1])
+
+def test_ci_self_scan_targets_trip_no_rules():
+    # The security_scan workflow runs predict.py over src/ and fails on any [VULNERABLE]
+    src = os.path.join(os.path.dirname(__file__), "..", "src")
+    flagged = {}
+    for path in iter_source_files(src):
+        with open(path, encoding="utf-8") as f:
+            findings = get_dangerous_details(f.read())
+        if findings:
+            flagged[os.path.relpath(path, src)] = [(d["rule_id"], d["line"]) for d in findings]
+    assert flagged == {}
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+import pytest
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+
+import src.assess.app as app_module
+from src.assess.jobs import JobManager
+from tests.test_service import served, wait_for
+
+FILES = {
+    "app.py": "import os\ndef run(cmd):\n    os.system(cmd)\n    eval(cmd)\n",
+    "lib/util.c": "int add(int a, int b) { return a + b; }\n",
+    "lib/copy.c": "void copy(char *d, char *s) { strcpy(d, s); }\n",
+    "README.md": "not scanned\n",
+}
+
+def make_git_repo(path, files=FILES):
+    """Creates a local git repository with one commit containing `files`."""
+    for name, content in files.items():
+        full = os.path.join(path, name)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "w") as f:
+            f.write(content)
+    git = ["git", "-C", str(path), "-c", "user.name=test", "-c", "user.email=test@example.com"]
+    subprocess.run(["git", "init", "-q", str(path)], check=True)
+    subprocess.run(git + ["add", "-A"], check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "initial"], check=True)
+    return str(path)
+
+@pytest.fixture
+def job_root(served, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module.job_manager, "allowed_root", os.path.realpath(tmp_path))
+    return str(tmp_path)
+
+def test_job_scans_local_path(job_root, tmp_path):
+    repo = make_git_repo(tmp_path / "repo")
+    client = TestClient(app_module.app)
+
+    job = client.post("/jobs", json={"target": repo}).json()
+    assert wait_for(lambda: client.get(f"/jobs/{job['job_id']}").json()["status"] == "completed")
+
+    body = client.get(f"/jobs/{job['job_id']}", params={"results": True}).json()
+    assert body["progress"]["files_done"] == body["progress"]["files_total"] == 3
+    assert body["model_version"] == app_module.registry.get().version
+    assert sorted(r["file"] for r in body["results"]) == ["app.py", "lib/copy.c", "lib/util.c"]
+
+def test_job_clones_git_url_and_streams_events(job_root, tmp_path):
+    repo = make_git_repo(tmp_path / "repo")
+    client = TestClient(app_module.app)
+
+    job = client.post("/jobs", json={"target": f"file://{repo}"}).json()
+    with client.stream("GET", f"/jobs/{job['job_id']}/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        stream = "".join(response.iter_text())
+
+    assert stream.count("event: result") == 3
+    assert "event: progress" in stream
+    assert stream.rstrip().split("\n\n")[-1].split("\n")[1] == "event: done"
+    assert client.get(f"/jobs/{job['job_id']}").json()["status"] == "completed"
+
+def test_job_rejects_unknown_target(job_root):
+    client = TestClient(app_module.app)
+    assert client.post("/jobs", json={"target": "/does/not/exist"}).status_code == 400
+
+def test_local_targets_stay_inside_job_root(served, tmp_path):
+    repo = make_git_repo(tmp_path / "repo")
+    outside = make_git_repo(tmp_path / "outside")
+    manager = JobManager(app_module.registry.get)
+    # No root configured: no local path at all, as a path or as a file:// URL
+    for target in (repo, f"file://{repo}"):
+        with pytest.raises(ValueError, match="JOB_ROOT"):
+            manager.validate_target(target)
+
+    manager = JobManager(app_module.registry.get, allowed_root=str(tmp_path / "repo"))
+    manager.validate_target(repo)
+    manager.validate_target(f"file://{repo}")
+    for target in (outside, f"file://{outside}", "file:///etc", f"file://{repo}/../outside"):
+        with pytest.raises(ValueError):
+            manager.validate_target(target)
+
+def test_jobs_are_capped_and_cancellable(served, tmp_path):
+    repo = make_git_repo(tmp_path / "repo", {f"f{i}.c": "int x;\n" for i in range(20)})
+    release = threading.Event()
+
+    def slow_scan(content, model, vectorizer):
+        release.wait(5)
+        return 0, 0.1, {"dangerous_calls": []}
+
+    manager = JobManager(app_module.registry.get, max_running=1, scan_content=slow_scan, allowed_root=str(tmp_path))
+    first = manager.submit(repo)
+    second = manager.submit(repo)
+    assert wait_for(lambda: first.status == "running")
+    assert second.status == "queued"
+
+    # Cancelling the queued job finishes it without running
+    manager.cancel(second.id)
+    assert second.status == "cancelled" and second.files_done == 0
+
+    # Cancelling the running job stops it before the next file
+    manager.cancel(first.id)
+    release.set()
+    assert wait_for(lambda: first.status == "cancelled")
+    assert first.files_done < first.files_total
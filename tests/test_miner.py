@@ -0,0 +1,91 @@
+import os
+import sys
+import json
+import subprocess
+import pandas as pd
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.sample.mirror_cache import MirrorCache
+from src.sample.repo_miner import run_miner, mine_files, mine_git_tree, label_file, MANIFEST_FILE, MANIFEST_VERSION
+from src.modify import preprocessing
+from src.modify.feature_pipeline import add_snippet_features, snippet_features, FEATURE_COLUMNS
+from src.modify.rules import RULESET_VERSION
+
+VULNERABLE = "import os\n\ndef run(cmd):\n    # Runs a shell command for the user\n    return os.system(cmd)\n"
+SAFE = "def add(a, b):\n    # Adds two numbers and returns the result\n    return a + b\n"
+
+def make_files(path, n):
+    for i in range(n):
+        target = path / f"pkg{i % 2}" / f"mod{i}.py"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text((VULNERABLE if i % 3 == 0 else SAFE) + f"# file {i}\n")
+    (path / "tests").mkdir()
+    (path / "tests" / "test_x.py").write_text(VULNERABLE) # Test directories are not mined
+
+def mtimes(shard_dir, name):
+    folder = os.path.join(shard_dir, name)
+    return {f: os.stat(os.path.join(folder, f)).st_mtime_ns for f in os.listdir(folder)}
+
+def test_offline_miner_shards_and_resumes(tmp_path):
+    data_dir, shard_dir, output = tmp_path / "mined_repos", str(tmp_path / "shards"), str(tmp_path / "mined.parquet")
+    # An old-style checkout, and a mirror of a file:// remote, both already on disk
+    make_files(data_dir / "alpha", 7)
+    remote = tmp_path / "remote"
+    make_files(remote, 5)
+    git = ["git", "-C", str(remote), "-c", "user.name=test", "-c", "user.email=test@example.com"]
+    subprocess.run(["git", "init", "-q", str(remote)], check=True)
+    subprocess.run(git + ["add", "-A"], check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "initial"], check=True)
+    repos = {"alpha": "https://invalid.example/alpha.git", "beta": f"file://{remote}"}
+    with MirrorCache(data_dir).mirror(repos["beta"]) as mirror:
+        expected = mine_files(str(data_dir / "alpha"), "alpha") + mine_git_tree(mirror, "beta")
+
+    options = dict(data_dir=str(data_dir), shard_dir=shard_dir, output=output, workers=2,
+                   chunk_files=2, memory_mb=0.0001, offline=True)
+    run_miner(repos, **options)
+    mined = pd.read_parquet(output)
+    assert sorted(mined["code"]) == sorted(row["code"] for row in expected)
+    assert mined["is_vulnerable"].sum() == sum(row["is_vulnerable"] for row in expected)
+    assert (mined["ruleset_version"] == RULESET_VERSION).all() and (mined["dangerous_calls"] == mined["is_vulnerable"]).all()
+    with open(os.path.join(shard_dir, MANIFEST_FILE)) as f:
+        manifest = json.load(f)["repos"]
+    assert {name: (m["status"], m["parts"]) for name, m in manifest.items()} == {"alpha": ("done", 4), "beta": ("done", 3)}
+
+    # Simulate a crash in beta after its first shard
+    manifest["beta"].update(status="partial", parts=1)
+    with open(os.path.join(shard_dir, MANIFEST_FILE), "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "repos": manifest}, f)
+    os.remove(os.path.join(shard_dir, "beta", "part-00002.parquet"))
+    before = {name: mtimes(shard_dir, name) for name in repos}
+    run_miner(repos, **options)
+    after = {name: mtimes(shard_dir, name) for name in repos}
+
+    assert after["alpha"] == before["alpha"] # Finished: skipped
+    assert after["beta"]["part-00000.parquet"] == before["beta"]["part-00000.parquet"] # Resumed after it
+    assert after["beta"]["part-00001.parquet"] != before["beta"]["part-00001.parquet"]
+    assert sorted(pd.read_parquet(output)["code"]) == sorted(mined["code"])
+
+def test_featurisers_reuse_stored_rule_findings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rows = [label_file(code + f"# file {i}\n", "repo", ".py") for i, code in enumerate([VULNERABLE, SAFE] * 3)]
+    df = pd.DataFrame(rows)
+    assert json.loads(df["findings"][0]) == [["R002", 5]] and json.loads(df["rule_counts"][0]) == {"R002": 1}
+    expected = pd.DataFrame([snippet_features(code) for code in df["code"]])[FEATURE_COLUMNS]
+
+    calls = []
+    real = preprocessing.get_dangerous_details
+    # feature_pipeline imports the module as modify.preprocessing
+    for module in (preprocessing, sys.modules["modify.preprocessing"]):
+        monkeypatch.setattr(module, "get_dangerous_details", lambda code: calls.append(code) or real(code))
+    # Rows mined with another rule set are recomputed; the rest reuse what the miner stored
+    df.loc[0, "ruleset_version"] = "0ld"
+    features = add_snippet_features(df)[FEATURE_COLUMNS]
+    assert calls == [df["code"][0]]
+    assert (features.to_numpy(dtype=object) == expected.to_numpy(dtype=object)).all()
+
+    calls.clear()
+    X_train, X_test, _, _ = preprocessing.preprocess_data(df.copy())
+    X_train_vec, _ = preprocessing.extract_features(X_train, X_test)
+    assert calls == [df["code"][0]] and X_train_vec.shape[1] >= 3
@@ -0,0 +1,110 @@
+import os
+import sys
+import subprocess
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.sample.mirror_cache import MirrorCache
+from src.sample.git_objects import resolve_commit
+from src.sample.repo_miner import mine_git_tree, _mine_source
+
+def git(repo, *args):
+    return subprocess.run(["git", "-C", str(repo), "-c", "user.name=test", "-c", "user.email=test@example.com"]
+                          + list(args), check=True, capture_output=True, text=True).stdout
+
+def make_remote(path, files):
+    path.mkdir(parents=True)
+    for name, source in files.items():
+        (path / name).write_text(source)
+    git(path, "init", "-q")
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "initial")
+    return f"file://{path}"
+
+SOURCE = "import os\n\ndef run(cmd):\n    # Runs a shell command for the user\n    return os.system(cmd)\n"
+
+def test_mirror_is_cloned_once_then_fetched(tmp_path):
+    url = make_remote(tmp_path / "remote", {"app.py": SOURCE})
+    cache = MirrorCache(tmp_path / "cache")
+    with cache.mirror(url) as path:
+        first = resolve_commit(path)
+        open(os.path.join(path, "marker"), "w").close()
+
+    (tmp_path / "remote" / "util.py").write_text(SOURCE.replace("run", "call"))
+    git(tmp_path / "remote", "add", "-A")
+    git(tmp_path / "remote", "commit", "-q", "-m", "second")
+    with cache.mirror(url) as again:
+        # Same mirror, updated in place by fetch rather than cloned again
+        assert again == path and os.path.exists(os.path.join(again, "marker"))
+        assert resolve_commit(again) == git(tmp_path / "remote", "rev-parse", "HEAD").strip() != first
+        rows = mine_git_tree(again, "remote")
+    assert sorted(row["is_vulnerable"] for row in rows) == [1, 1]
+
+    with cache.worktree(url, first) as checkout:
+        assert sorted(os.listdir(checkout)) == [".git", "app.py"]
+    assert not os.path.exists(checkout)
+    assert git(path, "worktree", "list").count("\n") == 1
+
+def test_eviction_is_lru_and_skips_mirrors_in_use(tmp_path):
+    urls = [make_remote(tmp_path / name, {"app.py": SOURCE}) for name in ("a", "b", "c")]
+    cache = MirrorCache(tmp_path / "cache")
+    for url in urls:
+        with cache.mirror(url):
+            pass
+    with cache.mirror(urls[0], refresh=False):
+        pass # a is now the most recently used
+    names = [os.path.basename(cache.path(url)) for url in urls]
+    assert [e["name"] for e in cache.entries()] == [names[1], names[2], names[0]]
+
+    total = sum(e["size"] for e in cache.entries())
+    assert cache.evict(total - 1) == [names[1]]
+    with cache.mirror(urls[2], refresh=False):
+        # c is locked by this reader: only a can go
+        assert cache.evict(0) == [names[0]]
+    assert [e["name"] for e in cache.entries()] == [names[2]]
+
+def test_mirrors_skip_hosting_refs_and_miner_mirrors_are_shallow(tmp_path):
+    remote = tmp_path / "remote"
+    url = make_remote(remote, {"app.py": SOURCE})
+    git(remote, "tag", "v1")
+    git(remote, "branch", "feature")
+    (remote / "util.py").write_text(SOURCE)
+    git(remote, "add", "-A")
+    git(remote, "commit", "-q", "-m", "second")
+    git(remote, "update-ref", "refs/pull/1/head", "HEAD~1")
+
+    cache = MirrorCache(tmp_path / "cache")
+    with cache.mirror(url) as path:
+        refs = git(path, "for-each-ref", "--format=%(refname)").split()
+    assert "refs/tags/v1" in refs and "refs/heads/feature" in refs
+    assert not any(ref.startswith("refs/pull/") for ref in refs)
+    # A mirror cloned with --mirror before: narrowed on its next fetch
+    subprocess.run(["git", "clone", "--mirror", "-q", url, cache.path(url) + ".new"], check=True)
+    os.rename(cache.path(url), str(tmp_path / "old"))
+    os.rename(cache.path(url) + ".new", cache.path(url))
+    with cache.mirror(url) as path:
+        assert sorted(git(path, "for-each-ref", "--format=%(refname)").split()) == sorted(refs)
+
+    shallow = MirrorCache(tmp_path / "miner", depth=1)
+    for _ in range(2): # clone, then fetch
+        with shallow.mirror(url) as path:
+            assert git(path, "rev-parse", "--is-shallow-repository").strip() == "true"
+            assert git(path, "rev-list", "--count", "HEAD").strip() == "1"
+            branch = git(remote, "symbolic-ref", "HEAD").strip()
+            assert git(path, "for-each-ref", "--format=%(refname)").split() == [branch]
+            assert len(mine_git_tree(path, "remote")) == 2
+
+def test_miner_keeps_the_mirror_locked_from_fetch_to_the_end_of_mining(tmp_path):
+    url = make_remote(tmp_path / "remote", {"app.py": SOURCE})
+    cache = MirrorCache(tmp_path / "cache")
+    mirror_calls = []
+    real_mirror = cache.mirror
+    cache.mirror = lambda *args, **kwargs: mirror_calls.append(args) or real_mirror(*args, **kwargs)
+
+    def mine(path):
+        # Another miner thread evicting everything it can while this one mines
+        assert MirrorCache(tmp_path / "cache").evict(0) == []
+        return mine_git_tree(path, "remote")
+    rows = _mine_source("remote", url, cache, str(tmp_path / "data"), False, mine)
+    assert len(rows) == 1 and len(mirror_calls) == 1
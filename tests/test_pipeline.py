@@ -10,7 +10,19 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.sample.data_loader import load_data, generate_synthetic_data
 from src.modify.preprocessing import clean_code, preprocess_data, extract_features
 from src.model.train_model import train_models
-from src.model.predict import predict_file
+from src.model.predict import predict_file, predict_content
+from src.modify.feature_pipeline import add_snippet_features, build_pipeline, FEATURE_COLUMNS
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import GridSearchCV
+
+class CountingTfidf(TfidfVectorizer):
+    fits = 0
+
+    def fit_transform(self, raw_documents, y=None):
+        CountingTfidf.fits += 1
+        return super().fit_transform(raw_documents, y)
 
 def test_clean_code():
     raw_code = "int main() { // comment \n return 0; }"
@@ -60,3 +72,22 @@ def test_model_training_and_prediction(tmp_path):
     assert pred in [0, 1]
     assert 0.0 <= prob <= 1.0
     assert isinstance(details, dict)
+
+def test_cached_pipeline_fits_vectorizer_once_per_fold(tmp_path):
+    df = add_snippet_features(generate_synthetic_data(num_samples=60))
+    X, y = df[FEATURE_COLUMNS], df['is_vulnerable']
+
+    pipeline = build_pipeline(RandomForestClassifier(n_estimators=5, random_state=0), memory=str(tmp_path / "cache"))
+    pipeline.set_params(features__tfidf=CountingTfidf(token_pattern=r'\b\w+\b'))
+    grid = GridSearchCV(pipeline, {"clf__max_depth": [2, None], "clf__min_samples_split": [2, 4]}, cv=2, n_jobs=1)
+
+    CountingTfidf.fits = 0
+    grid.fit(X, y)
+    # 2 folds + the final refit, shared by all 4 candidates
+    assert CountingTfidf.fits == 3
+
+    # The saved pipeline scores raw source on its own (no separate vectorizer)
+    best = grid.best_estimator_.set_params(memory=None)
+    pred, prob, details = predict_content("strcpy(dest, src);", best, None)
+    assert pred in [0, 1] and 0.0 <= prob <= 1.0
+    assert details["dangerous_calls"]
@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+import pandas as pd
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.sample.relabel import rule_hits, relabel_frame, relabel
+from src.sample.repo_miner import label_file, MinerManifest, MANIFEST_FILE
+from src.sample.dataset_store import write_dataset
+from src.modify.rules import get_dangerous_details, RULESET_VERSION
+
+SNIPPETS = [
+    "import os\nos.system(cmd)\nresult = eval(expr)\n",
+    "query = 'SELECT * FROM t WHERE id=' + uid\npassword = 'hunter2'",
+    "def add(a, b):\n    return a + b\n",
+    "strcpy(dst, src); strcpy(a, b);\ngets(buf);",
+    "nombre = 'SELECT * FROM café WHERE x=' + ñ\n# comentario: contraseña",
+    # Whitespace that Python's \s matches and RE2's does not
+    "new\x0bRandom()",
+    "ValidateInput\x0b=\x0bfalse",
+    "password\x1c=\"abc\"",
+    "",
+]
+
+def test_bulk_hits_match_the_rule_engine():
+    counts, (snippets, lines, rules) = rule_hits(SNIPPETS + [None])
+    assert counts.shape[0] == len(SNIPPETS) + 1 and counts[len(SNIPPETS)].sum() == 0
+    relabelled = relabel_frame(pd.DataFrame({"code": SNIPPETS}))
+    for i, code in enumerate(SNIPPETS):
+        findings = get_dangerous_details(code)
+        assert json.loads(relabelled["findings"][i]) == [[f["rule_id"], f["line"]] for f in findings]
+        assert relabelled["dangerous_calls"][i] == len(findings) == counts[i].sum()
+        row = label_file(code.ljust(60), "repo", ".py")
+        assert relabelled["is_vulnerable"][i] == row["is_vulnerable"] and relabelled["cwe_id"][i] == row["cwe_id"]
+
+def test_relabels_stale_shards_once(tmp_path):
+    shard_dir = str(tmp_path / "shards")
+    rows = pd.DataFrame([label_file(code.ljust(60), "repo", ".py") for code in SNIPPETS])
+    stale = rows.assign(is_vulnerable=0, cwe_id="None", findings="[]", ruleset_version="0ld")
+    for part in range(2):
+        write_dataset(stale.iloc[part::2], os.path.join(shard_dir, "repo", f"part-{part:05d}.parquet"))
+    MinerManifest(os.path.join(shard_dir, MANIFEST_FILE)).update("repo", parts=2, rows=len(rows), vulnerable=0)
+
+    results = relabel([shard_dir], workers=1, shard_dir=shard_dir)
+    assert sum(s["changed"] for s in results) == rows["is_vulnerable"].sum()
+    relabelled = pd.concat([pd.read_parquet(os.path.join(shard_dir, "repo", f"part-{p:05d}.parquet")) for p in range(2)])
+    assert sorted(relabelled["findings"]) == sorted(rows["findings"])
+    assert (relabelled["ruleset_version"] == RULESET_VERSION).all()
+    manifest = MinerManifest(os.path.join(shard_dir, MANIFEST_FILE))
+    assert manifest.get("repo")["vulnerable"] == rows["is_vulnerable"].sum()
+
+    # Up to date: nothing is rewritten
+    assert all(s["skipped"] for s in relabel([shard_dir], workers=1, shard_dir=shard_dir))
@@ -0,0 +1,63 @@
+import os
+import sys
+import json
+import numpy as np
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sklearn.ensemble import RandomForestClassifier
+
+from src.model.search import successive_halving_search, plan_rungs
+
+PARAMS = {'max_depth': [1, None], 'min_samples_split': [2, 5], 'class_weight': ['balanced', None]}
+
+def make_data(n=240, seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.rand(n, 8)
+    y = (X[:, 0] + 0.3 * rng.rand(n) > 0.6).astype(int)
+    return X, y
+
+def test_plan_rungs_ends_at_max_resources():
+    assert plan_rungs(36, 20, 1000, 3) == [37, 111, 333, 999]
+    # Few candidates: the first rung starts higher instead of wasting rungs
+    assert plan_rungs(8, 10, 300, 2) == [37, 74, 148, 296]
+
+def test_halving_search_resumes_from_results_file(tmp_path):
+    X, y = make_data()
+    results = str(tmp_path / "search.jsonl")
+    estimator = RandomForestClassifier(n_estimators=5, random_state=0)
+
+    first = successive_halving_search(estimator, PARAMS, X, y, factor=2, cv=3, results_path=results, n_jobs=1)
+    assert first["completed"] and first["n_reused"] == 0
+    with open(results) as f:
+        lines = f.readlines()
+    assert len(lines) == first["n_fitted"] == 8 + 4 + 2 + 1
+
+    # Simulate a crash after three candidates, in the middle of writing the fourth
+    with open(results, "w") as f:
+        f.writelines(lines[:3])
+        f.write(lines[3][:20])
+
+    resumed = successive_halving_search(estimator, PARAMS, X, y, factor=2, cv=3, results_path=results, n_jobs=1)
+    assert resumed["n_reused"] == 3
+    assert resumed["n_fitted"] == first["n_fitted"] - 3
+    assert resumed["best_params"] == first["best_params"]
+    # The fragment was cut, not glued to the next record: every candidate is on disk now
+    again = successive_halving_search(estimator, PARAMS, X, y, factor=2, cv=3, results_path=results, n_jobs=1)
+    assert again["n_fitted"] == 0 and again["n_reused"] == first["n_fitted"]
+    assert all(json.loads(line) for line in open(results))
+
+    # A different setup never picks up these results
+    other = successive_halving_search(estimator, PARAMS, X, y, factor=3, cv=3, results_path=results, n_jobs=1)
+    assert other["n_reused"] == 0
+
+def test_halving_on_trees_returns_full_forest(tmp_path):
+    X, y = make_data()
+    params = dict(PARAMS, n_estimators=[100, 200])
+    result = successive_halving_search(RandomForestClassifier(random_state=0), params, X, y,
+                                       resource="n_estimators", min_resources=4, max_resources=16,
+                                       factor=2, cv=3, results_path=str(tmp_path / "trees.jsonl"), n_jobs=1)
+    assert result["best_params"]["n_estimators"] == 16
+    records = [json.loads(line) for line in open(tmp_path / "trees.jsonl")]
+    assert sorted({r["n_resources"] for r in records}) == [4, 8, 16]
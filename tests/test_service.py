@@ -0,0 +1,229 @@
+import os
+import sys
+import time
+import threading
+import joblib
+import numpy as np
+import pytest
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from src.sample.data_loader import generate_synthetic_data
+from src.modify.preprocessing import preprocess_data, extract_features
+import src.assess.app as app_module
+from src.model.bundle import write_bundle, compute_model_version
+from src.model.predict import set_active_artifact
+from src.assess.scheduling import RateLimiter, FairScheduler, api_key_id
+
+VULN_SOURCE = b"int main(int argc, char **argv) { char buf[8]; strcpy(buf, argv[1]); return 0; }"
+
+def train_artifacts(model_dir, n_estimators=5, seed=0):
+    """Trains a tiny model in the current directory and copies it to model_dir."""
+    df = generate_synthetic_data(num_samples=40)
+    X_train, X_test, y_train, y_test = preprocess_data(df)
+    X_train_vec, X_test_vec = extract_features(X_train, X_test)
+    rf = RandomForestClassifier(n_estimators=n_estimators, random_state=seed)
+    rf.fit(X_train_vec, y_train)
+    os.makedirs(model_dir, exist_ok=True)
+    joblib.dump(rf, os.path.join(model_dir, "rf_model.pkl"))
+    joblib.dump(joblib.load("models/tfidf_vectorizer.pkl"), os.path.join(model_dir, "tfidf_vectorizer.pkl"))
+
+def make_training_matrix(n_features):
+    rng = np.random.RandomState(1)
+    X = rng.rand(30, n_features)
+    y = np.array([0, 1] * 15)
+    return X, y
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+@pytest.fixture
+def served(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    model_dir = str(tmp_path / "served")
+    train_artifacts(model_dir)
+    registry = app_module.registry
+    monkeypatch.setattr(registry, "model_dir", model_dir)
+    monkeypatch.setattr(registry, "_active", None)
+    registry.load()
+    return model_dir
+
+def test_scan_reports_model_version(served):
+    client = TestClient(app_module.app)
+    response = client.post("/scan", files={"file": ("vuln.c", VULN_SOURCE)})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["model_version"] == app_module.registry.get().version
+    assert body["status"] in ("SAFE", "VULNERABLE")
+
+def test_hot_reload_swaps_version(served):
+    client = TestClient(app_module.app)
+    old_version = client.get("/admin/model").json()["model_version"]
+
+    # Ship a retrained model into the served directory
+    rf = joblib.load(os.path.join(served, "rf_model.pkl"))
+    rf.set_params(n_estimators=7)
+    rf.fit(*make_training_matrix(rf.n_features_in_))
+    joblib.dump(rf, os.path.join(served, "rf_model.pkl"))
+
+    assert client.post("/admin/reload").status_code == 202
+    assert wait_for(lambda: client.get("/admin/model").json()["model_version"] != old_version)
+
+    body = client.post("/scan", files={"file": ("vuln.c", VULN_SOURCE)}).json()
+    assert body["model_version"] != old_version
+
+def test_service_serves_the_active_artifact(served):
+    client = TestClient(app_module.app)
+    pickles_version = client.get("/admin/model").json()["model_version"]
+    bundle_path = os.path.join(served, "model.bundle")
+    write_bundle(joblib.load(os.path.join(served, "rf_model.pkl")),
+                 joblib.load(os.path.join(served, "tfidf_vectorizer.pkl")), bundle_path)
+    set_active_artifact("bundle", served)
+    # The pointer is watched like the artifacts themselves
+    assert os.path.getmtime(os.path.join(served, "ACTIVE")) in app_module.registry._artifact_mtimes()
+
+    assert app_module.registry.load() == compute_model_version(bundle_path)
+    assert type(app_module.registry.get().model).__name__ == "CompiledForest"
+    assert client.post("/scan", files={"file": ("vuln.c", VULN_SOURCE)}).json()["model_version"] != pickles_version
+
+    set_active_artifact("pickles", served)
+    assert app_module.registry.load() == pickles_version
+
+def test_concurrent_reload_requests_start_one_load(served, monkeypatch):
+    registry = app_module.registry
+    release, loads = threading.Event(), []
+    registry_module = sys.modules["model.registry"] # app.py imports it without the src. prefix
+    real = registry_module.load_artifacts
+    def slow_load(*args):
+        loads.append(args)
+        release.wait(5)
+        return real(*args)
+    monkeypatch.setattr(registry_module, "load_artifacts", slow_load)
+
+    class SlowFlag(type(registry)):
+        # Reading the flag yields to other threads, as a preempted check-then-set would
+        @property
+        def reloading(self):
+            value = self.__dict__.get("_slow_flag", False)
+            time.sleep(0.01)
+            return value
+        @reloading.setter
+        def reloading(self, value):
+            self.__dict__["_slow_flag"] = value
+    monkeypatch.setattr(registry, "__class__", SlowFlag)
+
+    started = []
+    threads = [threading.Thread(target=lambda: started.append(registry.reload_async())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert started.count(True) == 1
+    release.set()
+    assert wait_for(lambda: not registry.reloading and registry._reload_lock.acquire(blocking=False))
+    registry._reload_lock.release()
+    assert len(loads) == 1
+
+def test_invalid_model_keeps_serving_previous(served):
+    client = TestClient(app_module.app)
+    old_version = app_module.registry.get().version
+
+    # A vectorizer with a different vocabulary no longer matches the model
+    small_vectorizer = TfidfVectorizer(max_features=5).fit(["alpha beta gamma delta epsilon zeta"])
+    joblib.dump(small_vectorizer, os.path.join(served, "tfidf_vectorizer.pkl"))
+
+    client.post("/admin/reload")
+    assert wait_for(lambda: not app_module.registry.reloading and app_module.registry.last_error)
+    assert "features" in app_module.registry.last_error
+    assert client.get("/admin/model").json()["model_version"] == old_version
+    assert client.post("/scan", files={"file": ("vuln.c", VULN_SOURCE)}).status_code == 200
+
+def test_metrics_endpoint(served):
+    client = TestClient(app_module.app)
+    for _ in range(2):
+        assert client.post("/scan", files={"file": ("vuln.c", VULN_SOURCE)}).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'scanner_requests_total{endpoint="/scan",status="200"}' in text
+    for stage in ("upload_read", "featurisation", "rule_scan", "inference"):
+        assert f'scanner_stage_duration_seconds_count{{stage="{stage}"}}' in text
+    assert 'scanner_cache_lookups_total{result="hit"}' in text
+    assert f'scanner_model_info{{version="{app_module.registry.get().version}"}} 1' in text
+    assert 'scanner_predicted_probability_bucket{le="+Inf"}' in text
+    assert "scanner_queue_depth 0" in text
+
+def test_rate_limit_returns_429(served, monkeypatch):
+    monkeypatch.setattr(app_module, "rate_limiter", RateLimiter(rate=0.01, burst=2))
+    monkeypatch.setattr(app_module, "KNOWN_CLIENTS", {api_key_id("team-a"), api_key_id("team-b")})
+    client = TestClient(app_module.app)
+    headers = {"X-API-Key": "team-a"}
+    codes = [client.post("/scan", files={"file": ("vuln.c", VULN_SOURCE)}, headers=headers).status_code
+             for _ in range(3)]
+    assert codes == [200, 200, 429]
+
+    # Another client still has its own bucket
+    other = client.post("/scan", files={"file": ("vuln.c", VULN_SOURCE)}, headers={"X-API-Key": "team-b"})
+    assert other.status_code == 200
+
+    throttled = client.post("/scan", files={"file": ("vuln.c", VULN_SOURCE)}, headers=headers)
+    assert int(throttled.headers["retry-after"]) >= 1
+    assert f'scanner_throttled_total{{client="{api_key_id("team-a")}",endpoint="/scan"}} 2' in client.get("/metrics").text
+
+    # Unconfigured keys count as the caller's IP: a new key per request shares one bucket
+    codes = [client.post("/scan", files={"file": ("vuln.c", VULN_SOURCE)}, headers={"X-API-Key": f"random-{i}"}).status_code
+             for i in range(3)]
+    assert codes == [200, 200, 429]
+
+def test_rate_limiter_drops_idle_buckets():
+    limiter = RateLimiter(rate=1000, burst=1, sweep_seconds=0)
+    for i in range(100):
+        limiter.check(f"ip:10.0.0.{i}")
+    time.sleep(0.01)
+    limiter.check("ip:10.0.1.1")
+    assert len(limiter._buckets) <= 1
+
+def test_fair_scheduler_interleaves_clients():
+    scheduler = FairScheduler(slots=1)
+    order = []
+    blocker = threading.Event()
+
+    def hold():
+        with scheduler.acquire("warmup"):
+            blocker.wait(5)
+
+    def work(client):
+        with scheduler.acquire(client):
+            order.append(client)
+
+    threads = [threading.Thread(target=hold)]
+    threads[0].start()
+    assert wait_for(lambda: scheduler.waiting == 0 and scheduler._free == 0)
+
+    # A heavy client queues first, a light one arrives afterwards
+    for client in ["heavy"] * 6 + ["light"] * 2:
+        t = threading.Thread(target=work, args=(client,))
+        t.start()
+        threads.append(t)
+        expected = len(threads) - 1
+        assert wait_for(lambda: scheduler.waiting == expected)
+
+    blocker.set()
+    for t in threads:
+        t.join(5)
+
+    # FIFO would serve "light" last; fair queuing serves it within the first rounds
+    assert order.index("light") <= 1
+    assert [i for i, c in enumerate(order) if c == "light"] == [order.index("light"), order.index("light") + 2]
@@ -0,0 +1,29 @@
+import os
+import sys
+import subprocess
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Cumulative import time allowed for the scanning entry point (measured ~0.1 s)
+STARTUP_BUDGET_SECONDS = 0.5
+# Training-only dependencies that must not load before the first scan
+HEAVY_MODULES = {"sklearn", "pandas", "scipy", "joblib", "matplotlib", "shap"}
+
+def import_times(module):
+    """Runs `python -X importtime -c 'import <module>'` and returns {module: cumulative seconds}."""
+    env = dict(os.environ, PYTHONPATH=os.path.join(PROJECT_ROOT, "src"))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, env=env, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+def test_scanner_imports_only_what_inference_needs():
+    times = import_times("model.predict")
+    heavy = sorted({name.split(".")[0] for name in times} & HEAVY_MODULES)
+    assert not heavy, f"model.predict imports {heavy} at start-up"
+    assert times["model.predict"] < STARTUP_BUDGET_SECONDS
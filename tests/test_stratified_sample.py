@@ -0,0 +1,79 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.sample import stratified_sample
+from src.sample.stratified_sample import StratifiedReservoir, build_balanced_sample, expand_paths, sample_keys
+from src.sample.dataset_store import write_dataset, code_hash
+
+def write_shards(root, repos=("flask", "redis", "curl"), rows=700):
+    rng = np.random.RandomState(0)
+    frames = []
+    for r, repo in enumerate(repos):
+        vulnerable = rng.rand(rows) < 0.1
+        df = pd.DataFrame({
+            "code": [f"// {repo}\nint f{i}() {{ return {i}; }}" for i in range(rows)],
+            "is_vulnerable": vulnerable.astype(int),
+            "cwe_id": np.where(vulnerable, "CWE-120", "None"),
+            "source": repo,
+            "language": rng.choice([".c", ".py"], rows),
+        })
+        for part in range(2):
+            write_dataset(df.iloc[part::2], os.path.join(root, repo, f"part-{part:05d}.parquet"))
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True)
+
+def test_reservoirs_are_capped_balanced_and_seeded(tmp_path):
+    full = write_shards(str(tmp_path / "shards"))
+    sample = build_balanced_sample([str(tmp_path / "shards")], vulnerable=10, safe=40, seed=7)
+
+    per_stratum = sample.groupby(["is_vulnerable", "language", "source"]).size()
+    assert per_stratum.loc[1].max() <= 10 and per_stratum.loc[0].max() <= 40
+    assert len(per_stratum) == len(full.groupby(["is_vulnerable", "language", "source"]))
+    vulnerable = int(sample["is_vulnerable"].sum())
+    assert (sample["is_vulnerable"] == 0).sum() == int(vulnerable * 1.2)
+    # Rows keep their own code and labels
+    merged = sample.merge(full, on="code", suffixes=("", "_full"))
+    assert len(merged) == len(sample) and (merged["is_vulnerable"] == merged["is_vulnerable_full"]).all()
+
+    # Same seed, shards in another order (and as CSV): same sample; another seed: another one
+    full.to_csv(tmp_path / "all.csv", index=False)
+    reordered = build_balanced_sample(list(reversed(expand_paths([str(tmp_path / "shards")]))), 10, 40, seed=7)
+    from_csv = build_balanced_sample([str(tmp_path / "all.csv")], 10, 40, seed=7)
+    assert reordered.equals(sample) and from_csv["code"].tolist() == sample["code"].tolist()
+    other = build_balanced_sample([str(tmp_path / "shards")], 10, 40, seed=8)
+    assert set(other["code"]) != set(sample["code"])
+
+def test_code_is_only_read_for_reservoir_members(tmp_path, monkeypatch):
+    write_shards(str(tmp_path / "shards"), rows=2000)
+    read = []
+    real = stratified_sample.iter_label_batches
+    def spy(path):
+        for labels, read_code in real(path):
+            yield labels, lambda positions, read_code=read_code: read.append(len(positions)) or read_code(positions)
+    monkeypatch.setattr(stratified_sample, "iter_label_batches", spy)
+
+    sample = build_balanced_sample([str(tmp_path / "shards")], vulnerable=5, safe=5)
+    assert sum(read) < 6000 / 10 and len(sample) <= 3 * 2 * 5 * 2
+
+def test_shared_snippets_do_not_depend_on_shard_order():
+    # Y sorts before X, so with one vulnerable row per stratum repo A keeps Y and repo B keeps X
+    codes = pd.Series([f"strcpy(buf, arg{i});" for i in range(20)])
+    y, x = codes[np.argsort(sample_keys(code_hash(codes)))[:2]]
+    def shard(source, code):
+        df = pd.DataFrame({"code": code, "is_vulnerable": 1, "cwe_id": "CWE-120", "source": source, "language": ".c"})
+        labels = df.drop(columns="code").assign(**{stratified_sample.HASH_COLUMN: code_hash(df["code"])})
+        return labels, lambda positions: df[["code"]].iloc[positions].reset_index(drop=True)
+
+    samples = []
+    for order in (["A", "B"], ["B", "A"]):
+        reservoir = StratifiedReservoir(vulnerable=1, safe=1)
+        for source in order:
+            reservoir.offer(*shard(source, [x, y] if source == "A" else [x]))
+        samples.append(reservoir.sample(ratio=None))
+    assert samples[0].equals(samples[1])
+    assert dict(zip(samples[0]["source"], samples[0]["code"])) == {"A": y, "B": x}
@@ -0,0 +1,42 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Add project root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.sample.synthetic import generate_frame, write_shards, write_tree
+from src.sample.relabel import relabel_frame
+from src.sample.repo_miner import MinerManifest, MANIFEST_FILE, list_repo_files, label_file
+from src.sample.stratified_sample import expand_paths
+
+def test_seeded_files_match_the_rule_engine():
+    df = generate_frame(2000, seed=3, languages={".py": 3, ".c": 1, ".go": 1}, vulnerable=0.3, functions=5, lines=4)
+    assert df.equals(generate_frame(2000, seed=3, languages={".py": 3, ".c": 1, ".go": 1}, vulnerable=0.3,
+                                    functions=5, lines=4))
+    assert not df["code"].equals(generate_frame(2000, seed=4)["code"])
+    assert df["is_vulnerable"].sum() == 600 and set(df["language"]) == {".py", ".c", ".go"}
+    assert (df["language"] == ".py").mean() > 0.5 and df["code"].nunique() == len(df)
+    # Multi-function files whose labels are what the miner's rules would give them
+    assert df["code"].str.count(r"\ndef ").where(df["language"] == ".py").mean() > 4
+    relabelled = relabel_frame(df)
+    assert (relabelled["is_vulnerable"] == df["is_vulnerable"]).all() and (relabelled["cwe_id"] == df["cwe_id"]).all()
+
+def test_writes_mined_shards_and_fake_trees(tmp_path):
+    root = str(tmp_path / "shards")
+    paths = write_shards(root, rows=1000, repos=2, rows_per_part=300, workers=1, vulnerable=0.1)
+    assert len(paths) == len(expand_paths([root])) == 4
+    manifest = MinerManifest(os.path.join(root, MANIFEST_FILE))
+    state = manifest.get("synthetic-001")
+    assert state["status"] == "done" and state["rows"] == 500 and state["parts"] == 2
+    shards = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+    assert len(shards) == 1000 and shards["is_vulnerable"].sum() == manifest.get("synthetic-000")["vulnerable"] + state["vulnerable"]
+
+    labels = write_tree(str(tmp_path / "repo"), files=300, seed=1, files_per_dir=32, languages={".java": 1, ".js": 1})
+    _, files = list_repo_files(str(tmp_path / "repo"))
+    assert sorted(path for path, _ in files) == sorted(labels["path"])
+    path = labels["path"][labels["is_vulnerable"] == 1].iloc[0]
+    with open(tmp_path / "repo" / path) as f:
+        row = label_file(f.read(), "repo", os.path.splitext(path)[1])
+    assert row["is_vulnerable"] == 1 and row["cwe_id"] == labels.set_index("path").loc[path, "cwe_id"]